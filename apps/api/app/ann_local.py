@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import os
+from typing import Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore
+
+
+# In-process IVF index over show embeddings for deployments without pgvector (SQLite, the
+# default). It ships inside the catalog artifact (catalog_artifact.py), whose arrays API
+# workers memory-map, so the index is shared page cache rather than per-process copies.
+LOCAL_ANN_RECALL_TARGET = float(os.getenv("LOCAL_ANN_RECALL_TARGET", "0.95"))
+# Below this many shows a single list (exact search) is already sub-millisecond.
+_EXACT_MAX = 2048
+# Arrays persisted per index, one .npy each so they can be opened with mmap_mode="r".
+_ARRAYS = ("ids", "mat", "centroids", "order", "offsets", "ids_sorted", "sorted_rows")
+
+
+class IVFIndex:
+    """Inverted-file index on L2-normalised vectors: k-means centroids, vectors stored
+    grouped by list, search scans the `nprobe` lists whose centroids are closest."""
+
+    def __init__(self, ids, mat, centroids, order, offsets, generation: int, nprobe: int, ids_sorted=None, sorted_rows=None):
+        self.ids = ids
+        self.mat = mat
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.generation = int(generation)
+        self.nprobe = int(nprobe)
+        # id -> row via binary search over a sorted copy: no per-process dict to build or hold
+        if ids_sorted is None:
+            sorted_rows = np.argsort(ids, kind="stable")
+            ids_sorted = ids[sorted_rows]
+        self.ids_sorted = ids_sorted
+        self.sorted_rows = sorted_rows
+
+    def __len__(self) -> int:
+        return int(self.mat.shape[0])
+
+    @classmethod
+    def build(cls, ids: Sequence[str], vectors, generation: int, nlist: int | None = None, seed: int = 0) -> "IVFIndex":
+        mat = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        mat = mat / norms
+        n = mat.shape[0]
+        if nlist is None:
+            nlist = 1 if n <= _EXACT_MAX else int(np.sqrt(n))
+        nlist = max(1, min(int(nlist), n or 1))
+        centroids = _kmeans(mat, nlist, seed) if n else np.zeros((1, mat.shape[1] if mat.ndim == 2 else 384), dtype=np.float32)
+        assign = np.argmax(mat @ centroids.T, axis=1) if n else np.zeros(0, dtype=np.int64)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.searchsorted(assign[order], np.arange(len(centroids) + 1))
+        idx = cls(np.asarray(list(ids), dtype=str), mat, centroids, order, offsets, generation, nprobe=len(centroids))
+        if len(centroids) > 1:
+            idx.nprobe = idx.tune_nprobe(LOCAL_ANN_RECALL_TARGET)
+        return idx
+
+    def row(self, show_id) -> int | None:
+        key = str(show_id)
+        i = int(np.searchsorted(self.ids_sorted, key))
+        if i < len(self.ids_sorted) and self.ids_sorted[i] == key:
+            return int(self.sorted_rows[i])
+        return None
+
+    def vector(self, show_id) -> "np.ndarray | None":
+        r = self.row(show_id)
+        return None if r is None else self.mat[r]
+
+    def search(self, q, k: int, nprobe: int | None = None) -> list[tuple[str, float]]:
+        """Top-k (show_id, cosine) for query vector q."""
+        if not len(self):
+            return []
+        q = np.asarray(q, dtype=np.float32)
+        qn = float(np.linalg.norm(q)) or 1.0
+        q = q / qn
+        p = min(int(nprobe or self.nprobe), len(self.centroids))
+        if p >= len(self.centroids):
+            # Full scan straight off the (possibly memory-mapped) matrix, no gather copy
+            rows = np.arange(len(self))
+            sims = self.mat @ q
+        else:
+            lists = np.argpartition(-(self.centroids @ q), p - 1)[:p]
+            rows = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+            sims = self.mat[rows] @ q
+        k = min(int(k), len(rows))
+        if k <= 0:
+            return []
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return [(str(self.ids[rows[t]]), float(sims[t])) for t in top]
+
+    def exact(self, q, k: int) -> list[tuple[str, float]]:
+        return self.search(q, k, nprobe=len(self.centroids))
+
+    def recall(self, k: int = 10, samples: int = 100, nprobe: int | None = None, seed: int = 0) -> float:
+        """Mean recall@k of search() against brute force, using stored vectors as queries."""
+        if not len(self):
+            return 1.0
+        rng = np.random.default_rng(seed)
+        qs = rng.choice(len(self), size=min(samples, len(self)), replace=False)
+        hits = 0
+        total = 0
+        for r in qs:
+            want = {i for i, _ in self.exact(self.mat[r], k)}
+            got = {i for i, _ in self.search(self.mat[r], k, nprobe=nprobe)}
+            hits += len(want & got)
+            total += len(want)
+        return hits / max(1, total)
+
+    def tune_nprobe(self, target: float, k: int = 10) -> int:
+        """Smallest nprobe (doubling) whose recall@k reaches the target."""
+        p = 1
+        while p < len(self.centroids):
+            if self.recall(k=k, nprobe=p) >= target:
+                return p
+            p *= 2
+        return len(self.centroids)
+
+    def save(self, directory: str) -> dict:
+        """Write each array as its own .npy under `directory`; returns manifest fields."""
+        os.makedirs(directory, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f"ann_{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        return {"generation": self.generation, "nprobe": self.nprobe, "shows": len(self), "nlist": len(self.centroids)}
+
+    @classmethod
+    def load(cls, directory: str, generation: int, nprobe: int, mmap: bool = True) -> "IVFIndex":
+        mode = "r" if mmap else None
+        arrs = {name: np.load(os.path.join(directory, f"ann_{name}.npy"), mmap_mode=mode, allow_pickle=False) for name in _ARRAYS}
+        return cls(
+            arrs["ids"], arrs["mat"], arrs["centroids"], arrs["order"], arrs["offsets"], generation, nprobe,
+            ids_sorted=arrs["ids_sorted"], sorted_rows=arrs["sorted_rows"],
+        )
+
+
+def _kmeans(mat, k: int, seed: int, iters: int = 10):
+    rng = np.random.default_rng(seed)
+    n = mat.shape[0]
+    sample = mat[rng.choice(n, size=min(n, 256 * k), replace=False)]
+    cent = sample[rng.choice(len(sample), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(sample @ cent.T, axis=1)
+        for c in range(k):
+            members = sample[assign == c]
+            if len(members):
+                v = members.sum(axis=0)
+                cent[c] = v / (np.linalg.norm(v) or 1.0)
+    return cent
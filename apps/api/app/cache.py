@@ -27,8 +27,9 @@ def _now() -> float:
     return time.time()
 
 
-def make_key(email: str, for_: str, intent: str, like_id: str | None, seed: int | None) -> str:
-    return f"{email}|{for_}|{intent}|{like_id or '-'}|{seed if seed is not None else '-'}"
+def make_key(email: str, for_: str, intent: str, like_id: str | None, seed: int | None, gen: int | None = None) -> str:
+    # gen = active embedding generation: entries from before a cutover are simply never hit again
+    return f"{email}|{for_}|{intent}|{like_id or '-'}|{seed if seed is not None else '-'}|g{gen if gen is not None else '-'}"
 
 
 def _redis() -> Redis | None:
@@ -110,3 +111,21 @@ def invalidate_for_email(email: str):
     dead = [k for k in list(_CACHE.keys()) if k.startswith(prefix)]
     for k in dead:
         _CACHE.pop(k, None)
+
+
+def invalidate_all():
+    """Drop every cached slate (e.g. after vectors changed within the active generation).
+    Without Redis this only reaches the calling process; other processes age out by TTL."""
+    r = _redis()
+    if r is not None:
+        try:
+            cursor = 0
+            while True:
+                cursor, keys = r.scan(cursor=cursor, match="recs:cache:*", count=100)
+                if keys:
+                    r.delete(*keys)
+                if cursor == 0:
+                    break
+        except Exception:
+            pass
+    _CACHE.clear()
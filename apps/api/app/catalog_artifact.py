@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None  # type: ignore
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from .settings import settings
+from .ann_local import IVFIndex
+from .jitter import jitter_table
+from .neighbors import top_neighbors
+from .embeddings_util import _combine, _tokens_from_metadata, _vec_for_token, active_generation
+
+
+# Versioned catalog artifact published by the recsys worker:
+#   <LOCAL_ARTIFACT_DIR>/<version>/  manifest.json, ann_*.npy (float32 matrix, ids, IVF lists), features.npy,
+#                                    nbr_rows.npy / nbr_scores.npy (item-to-item neighbours, see neighbors.py)
+#   <LOCAL_ARTIFACT_DIR>/CURRENT     name of the live version, replaced atomically
+# API workers np.load(..., mmap_mode="r") every array, so N processes share one page-cache
+# copy and opening a version costs a few open() calls. Readers re-check CURRENT every
+# _RELOAD_CHECK_S and swap their reference; the previous version is kept for in-flight readers.
+# Versions are only built by the worker (embedding cutover / in-place update) and, in SQLite
+# mode, once at startup (db.init_db), one publisher at a time under <dir>/.publish.lock.
+LOCAL_ARTIFACT_DIR = os.getenv("LOCAL_ARTIFACT_DIR", os.path.join(settings.data_dir, "catalog"))
+_RELOAD_CHECK_S = 10.0
+_MAX_CREATORS = 4
+
+def feature_dtype(words: dict[str, int] | None = None):
+    """Packed per-show features. Tag masks are one uint64 (bit i = manifest vocab[i]) or, for
+    vocabularies past 64 entries, `words[kind]` uint64 words, low bits first."""
+    words = words or {}
+
+    def mask(name: str, kind: str):
+        w = int(words.get(kind, 1))
+        return (name, "<u8") if w <= 1 else (name, "<u8", (w,))
+
+    return np.dtype([
+        ("episode_length", "<i2"),
+        ("seasons", "<i2"),
+        ("age_rating", "i1"),  # -1 = unknown
+        mask("genre_mask", "genres"),
+        mask("warning_mask", "warnings"),
+        mask("flag_mask", "flags"),
+        ("creators", "<i4", (_MAX_CREATORS,)),  # manifest["creators"] ids, -1 padded
+    ])
+
+
+FEATURE_DTYPE = feature_dtype() if np is not None else None
+
+
+_AU_AGE = {"G": 0, "PG": 8, "M": 15, "MA15+": 15, "MA15": 15, "R18+": 18, "R18": 18}
+
+
+def _age_from_meta(meta: dict) -> int:
+    try:
+        if meta.get("age_rating") is not None:
+            return int(meta.get("age_rating"))
+    except Exception:
+        pass
+    return _AU_AGE.get(str(meta.get("au_rating") or "").upper().replace(" ", ""), -1)
+
+
+def _length_from_meta(meta: dict) -> int:
+    """As recs._episode_length scores it: a missing length is 60 minutes, 0 stays 0."""
+    length = meta.get("episode_length")
+    return 60 if length is None else int(length)
+
+
+def _vocab(values) -> list[str]:
+    return sorted({str(v) for vs in values for v in (vs or [])})
+
+
+def _mask(items, pos: dict[str, int]) -> int:
+    m = 0
+    for it in items or []:
+        b = pos.get(str(it))
+        if b is not None:
+            m |= 1 << b
+    return m
+
+
+def _words(mask: int, n: int):
+    if n <= 1:
+        return mask
+    return [(mask >> (64 * j)) & 0xFFFFFFFFFFFFFFFF for j in range(n)]
+
+
+def mask_int(value) -> int:
+    """A packed mask field (one uint64 or several words) as a Python int."""
+    words = np.asarray(value, dtype=np.uint64).ravel().tolist()
+    return sum(int(w) << (64 * j) for j, w in enumerate(words))
+
+
+def pack_features(rows: list[tuple[dict, list, list]]) -> tuple["np.ndarray", dict]:
+    """Pack (meta, warnings, flags) per show into feature_dtype() plus the vocabularies."""
+    metas = [m or {} for m, _, _ in rows]
+    vocab = {
+        "genres": _vocab(m.get("genres") for m in metas),
+        "creators": _vocab(m.get("creators") for m in metas),
+        "warnings": _vocab(w for _, w, _ in rows),
+        "flags": _vocab(f for _, _, f in rows),
+    }
+    pos = {k: {v: i for i, v in enumerate(vs)} for k, vs in vocab.items()}
+    words = {k: max(1, -(-len(vocab[k]) // 64)) for k in ("genres", "warnings", "flags")}
+    out = np.zeros(len(rows), dtype=feature_dtype(words))
+    for i, (meta, (_, warns, flags)) in enumerate(zip(metas, rows)):
+        out[i]["episode_length"] = _length_from_meta(meta)
+        out[i]["seasons"] = int(meta.get("seasons", 1) or 1)
+        out[i]["age_rating"] = _age_from_meta(meta)
+        out[i]["genre_mask"] = _words(_mask(meta.get("genres"), pos["genres"]), words["genres"])
+        out[i]["warning_mask"] = _words(_mask(warns, pos["warnings"]), words["warnings"])
+        out[i]["flag_mask"] = _words(_mask(flags, pos["flags"]), words["flags"])
+        cids = [pos["creators"][str(c)] for c in (meta.get("creators") or [])][:_MAX_CREATORS]
+        out[i]["creators"] = cids + [-1] * (_MAX_CREATORS - len(cids))
+    return out, vocab
+
+
+class CatalogArtifact:
+    def __init__(self, version: str, manifest: dict, index: IVFIndex, features, nbr_rows=None, nbr_scores=None):
+        self.version = version
+        self.manifest = manifest
+        self.generation = int(manifest["generation"])
+        self.index = index
+        self.features = features
+        self.nbr_rows = nbr_rows
+        self.nbr_scores = nbr_scores
+
+    @classmethod
+    def open(cls, root: str, version: str) -> "CatalogArtifact":
+        d = os.path.join(root, version)
+        with open(os.path.join(d, "manifest.json")) as f:
+            manifest = json.load(f)
+        index = IVFIndex.load(d, manifest["generation"], manifest["nprobe"], mmap=True)
+        features = np.load(os.path.join(d, "features.npy"), mmap_mode="r", allow_pickle=False)
+        nbr_rows = nbr_scores = None
+        if os.path.exists(os.path.join(d, "nbr_rows.npy")):  # absent in versions published before neighbours
+            nbr_rows = np.load(os.path.join(d, "nbr_rows.npy"), mmap_mode="r", allow_pickle=False)
+            nbr_scores = np.load(os.path.join(d, "nbr_scores.npy"), mmap_mode="r", allow_pickle=False)
+        # Seedless tiebreak jitter is tabulated up front (seeded tables on first use, see jitter.py)
+        jitter_table(version, index.ids)
+        return cls(version, manifest, index, features, nbr_rows, nbr_scores)
+
+    def neighbors(self, show_id) -> list[tuple[str, float]] | None:
+        """Precomputed best-first (show_id, score) neighbours, or None if unknown."""
+        r = self.index.row(show_id)
+        if r is None or self.nbr_rows is None:
+            return None
+        ids = self.index.ids
+        return [(str(ids[n]), float(sc)) for n, sc in zip(self.nbr_rows[r].tolist(), self.nbr_scores[r].tolist())]
+
+    def show_features(self, show_id) -> dict | None:
+        """Decoded packed features for one show (same row as its embedding)."""
+        r = self.index.row(show_id)
+        if r is None:
+            return None
+        f = self.features[r]
+        voc = self.manifest["vocab"]
+
+        def bits(field, names: list[str]) -> set[str]:
+            mask = mask_int(field)
+            return {n for i, n in enumerate(names) if mask >> i & 1}
+
+        return {
+            "episode_length": int(f["episode_length"]),
+            "seasons": int(f["seasons"]),
+            "age_rating": None if int(f["age_rating"]) < 0 else int(f["age_rating"]),
+            "genres": bits(f["genre_mask"], voc["genres"]),
+            "warnings": bits(f["warning_mask"], voc["warnings"]),
+            "flags": bits(f["flag_mask"], voc["flags"]),
+            "creators": {voc["creators"][c] for c in f["creators"].tolist() if c >= 0},
+        }
+
+
+def _read_current(root: str) -> str | None:
+    try:
+        with open(os.path.join(root, "CURRENT")) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _read_manifest(root: str, version: str) -> dict | None:
+    try:
+        with open(os.path.join(root, version, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _catalog_key(session: Session, generation: int) -> list[str]:
+    """JSON-able fingerprint of what a version is built from: shows (count, latest update) and
+    the generation's show embeddings. Availability is not an input, so offer writes keep it."""
+    from .models import EmbeddingShow, Show  # type: ignore
+    shows = session.exec(select(func.count(Show.id), func.max(Show.updated_at))).first()
+    embs = session.exec(select(func.count()).select_from(EmbeddingShow).where(EmbeddingShow.generation == generation)).one()
+    return [str(v) for v in (*tuple(shows or ()), embs)]
+
+
+@contextmanager
+def _publish_lock(root: str):
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".publish.lock"), "w") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def publish(session: Session, generation: int | None = None, root: str | None = None) -> dict:
+    """Build a new version from the catalog, then flip CURRENT to it."""
+    root = root or LOCAL_ARTIFACT_DIR
+    gen = generation if generation is not None else active_generation(session)
+    with _publish_lock(root):
+        return _publish_locked(session, gen, root)
+
+
+def ensure_published(session: Session, root: str | None = None) -> dict | None:
+    """Publish unless CURRENT already holds the active generation built from the current
+    shows and embeddings. SQLite mode (no worker) calls this at startup."""
+    if np is None:
+        return None
+    root = root or LOCAL_ARTIFACT_DIR
+    gen = active_generation(session)
+    with _publish_lock(root):
+        version = _read_current(root)
+        manifest = _read_manifest(root, version) if version else None
+        if manifest is not None and int(manifest["generation"]) == gen and manifest.get("catalog") == _catalog_key(session, gen):
+            return None
+        return _publish_locked(session, gen, root)
+
+
+def _publish_locked(session: Session, gen: int, root: str) -> dict:
+    from .models import EmbeddingShow, Show  # type: ignore
+    catalog = _catalog_key(session, gen)
+    rows = session.exec(
+        select(Show.id, Show.meta, Show.warnings, Show.flags, EmbeddingShow.emb)
+        .outerjoin(EmbeddingShow, (EmbeddingShow.show_id == Show.id) & (EmbeddingShow.generation == gen))
+    ).all()
+    ids = [str(r[0]) for r in rows]
+    vecs = [emb or _combine([_vec_for_token(t) for t in _tokens_from_metadata(meta)]) for _, meta, _, _, emb in rows]
+    index = IVFIndex.build(ids, vecs if vecs else np.zeros((0, 384)), gen)
+    features, vocab = pack_features([(meta, warns, flags) for _, meta, warns, flags, _ in rows])
+
+    version = f"g{gen}-{int(time.time() * 1000)}"
+    tmp = os.path.join(root, f".{version}.tmp")
+    os.makedirs(tmp, exist_ok=True)
+    info = index.save(tmp)
+    np.save(os.path.join(tmp, "features.npy"), features)
+    nbr_rows, nbr_scores = top_neighbors(index.mat, features["genre_mask"], features["episode_length"])
+    np.save(os.path.join(tmp, "nbr_rows.npy"), nbr_rows)
+    np.save(os.path.join(tmp, "nbr_scores.npy"), nbr_scores)
+    manifest = {**info, "version": version, "vocab": vocab, "catalog": catalog, "dim": int(index.mat.shape[1]) if index.mat.ndim == 2 else 384}
+    with open(os.path.join(tmp, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(root, version))
+
+    previous = _read_current(root)
+    cur_tmp = os.path.join(root, f".CURRENT.{os.getpid()}")
+    with open(cur_tmp, "w") as f:
+        f.write(version)
+    os.replace(cur_tmp, os.path.join(root, "CURRENT"))
+    # Keep the version just replaced; processes that still map older files keep their pages.
+    for name in os.listdir(root):
+        if name not in (version, previous, "CURRENT") and not name.startswith("."):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    invalidate()
+    return {k: manifest[k] for k in ("version", "generation", "shows", "nlist", "nprobe")}
+
+
+_current: tuple[float, CatalogArtifact] | None = None  # (next CURRENT check, artifact)
+
+
+def current_artifact(session: Session) -> CatalogArtifact | None:
+    """Artifact for the active generation, or None. Never builds one: a newer version is
+    picked up at the next CURRENT check, and until then the loaded one keeps being served."""
+    global _current
+    if np is None:
+        return None
+    now = time.time()
+    gen = active_generation(session)
+    if _current is not None and _current[0] > now and _current[1].generation == gen:
+        return _current[1]
+    art = _current[1] if _current is not None else None
+    version = _read_current(LOCAL_ARTIFACT_DIR)
+    if version is not None and (art is None or art.version != version):
+        try:
+            art = CatalogArtifact.open(LOCAL_ARTIFACT_DIR, version)
+        except Exception:
+            pass  # keep serving the version already loaded
+    if art is None or art.generation != gen:
+        _current = None
+        return None
+    _current = (now + _RELOAD_CHECK_S, art)
+    return art
+
+
+def invalidate() -> None:
+    global _current
+    _current = None
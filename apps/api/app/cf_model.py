@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore
+
+from .settings import settings
+
+
+# Item-item collaborative filtering model, built nightly by services/recsys/cf.py from
+# ratings (and Serializd history) and published like the catalog artifact:
+#   <CF_MODEL_DIR>/<version>/  manifest.json, ids.npy, ids_sorted.npy, sorted_rows.npy,
+#                              nbr.npy (int32 n x K, -1 padded), sim.npy (float16 n x K)
+#   <CF_MODEL_DIR>/CURRENT     name of the live version
+# Per request the engine walks the K neighbours of each rated show: O(ratings x K).
+CF_MODEL_DIR = os.getenv("CF_MODEL_DIR", os.path.join(settings.data_dir, "cf"))
+CF_K = int(os.getenv("CF_K", "30"))
+# Shrinks similarities backed by few co-raters: sim * co / (co + CF_SHRINK)
+CF_SHRINK = float(os.getenv("CF_SHRINK", "10"))
+CF_MIN_SUPPORT = int(os.getenv("CF_MIN_SUPPORT", "2"))
+# Bound on the user-row expansion of one block of items (co-rating pairs); the block's
+# accumulation is sparse over those pairs, so this alone caps the job's peak memory.
+CF_BLOCK_PAIRS = int(os.getenv("CF_BLOCK_PAIRS", "20000000"))
+_RELOAD_CHECK_S = 60.0
+
+# Rating -> interaction weight; Serializd "watched" history counts as a mild positive.
+RATING_WEIGHTS = {2: 1.0, 1: 0.25, 0: -1.0}
+HISTORY_WEIGHT = 0.5
+
+
+def build_csr(users, items, weights, n_users: int, n_items: int):
+    """CSR (indptr, indices, data) of the user x item matrix; duplicate cells are summed."""
+    users = np.asarray(users, dtype=np.int64)
+    items = np.asarray(items, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float32)
+    key = users * n_items + items
+    uniq, inv = np.unique(key, return_inverse=True)
+    data = np.bincount(inv, weights=weights).astype(np.float32)
+    rows = uniq // n_items
+    indptr = np.zeros(n_users + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_users), out=indptr[1:])
+    return indptr, (uniq % n_items).astype(np.int32), data
+
+
+def _transpose(indptr, indices, data, n_items: int):
+    rows = np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+    order = np.argsort(indices, kind="stable")
+    t_indptr = np.zeros(n_items + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=n_items), out=t_indptr[1:])
+    return t_indptr, rows[order], data[order]
+
+
+def item_item_topk(indptr, indices, data, n_items: int, k: int = CF_K,
+                   shrink: float = CF_SHRINK, min_support: int = CF_MIN_SUPPORT,
+                   block_pairs: int = CF_BLOCK_PAIRS):
+    """Top-k positive shrunk-cosine neighbours per item: (nbr int32, sim float16), n x k.
+
+    Only co-rated item pairs are materialised, so time and memory are O(sum over users of
+    their row length squared), independent of n_items^2."""
+    nbr = np.full((n_items, k), -1, dtype=np.int32)
+    sim = np.zeros((n_items, k), dtype=np.float16)
+    if n_items == 0 or k == 0:
+        return nbr, sim
+    deg = np.diff(indptr)
+    norm = np.sqrt(np.bincount(indices, weights=data.astype(np.float64) ** 2, minlength=n_items))
+    norm[norm == 0] = 1.0
+    t_indptr, t_users, t_data = _transpose(indptr, indices, data, n_items)
+    # Expansion cost per item = sum of its raters' row lengths
+    cost = np.concatenate([[0], np.cumsum(deg[t_users])])[t_indptr]
+    start = 0
+    while start < n_items:
+        stop = int(np.searchsorted(cost, cost[start] + block_pairs, side="right")) - 1
+        stop = min(n_items, max(stop, start + 1))
+        b = stop - start
+        seg = slice(t_indptr[start], t_indptr[stop])
+        u, a = t_users[seg], t_data[seg]
+        il = np.repeat(np.arange(b, dtype=np.int64), np.diff(t_indptr[start:stop + 1]))
+        cnt = deg[u]
+        total = int(cnt.sum())
+        offs = np.repeat(indptr[u] - (np.cumsum(cnt) - cnt), cnt) + np.arange(total)
+        j = indices[offs].astype(np.int64)
+        # Sparse accumulation: one cell per co-rated (item in block, item) pair
+        pairs, inv = np.unique(np.repeat(il, cnt) * n_items + j, return_inverse=True)
+        dot = np.bincount(inv, weights=np.repeat(a, cnt) * data[offs], minlength=len(pairs))
+        co = np.bincount(inv, minlength=len(pairs))
+        r, c = pairs // n_items, pairs % n_items
+        s = dot / (norm[start + r] * norm[c]) * (co / (co + shrink))
+        keep = (co >= min_support) & (c != start + r) & (s > 0)
+        r, c, s = r[keep], c[keep], s[keep]
+        # Best first per row, ties to the lower item index; rank within the row
+        order = np.lexsort((c, -s, r))
+        r, c, s = r[order], c[order], s[order]
+        rank = np.arange(len(r)) - np.searchsorted(r, r)
+        top = rank < k
+        nbr[start + r[top], rank[top]] = c[top]
+        sim[start + r[top], rank[top]] = s[top]
+        start = stop
+    return nbr, sim
+
+
+class CFModel:
+    def __init__(self, version: str, manifest: dict, ids, ids_sorted, sorted_rows, nbr, sim):
+        self.version = version
+        self.manifest = manifest
+        self.ids = ids
+        self.ids_sorted = ids_sorted
+        self.sorted_rows = sorted_rows
+        self.nbr = nbr
+        self.sim = sim
+
+    @classmethod
+    def open(cls, root: str, version: str) -> "CFModel":
+        d = os.path.join(root, version)
+        with open(os.path.join(d, "manifest.json")) as f:
+            manifest = json.load(f)
+        arrs = {n: np.load(os.path.join(d, f"{n}.npy"), mmap_mode="r", allow_pickle=False) for n in ("ids", "ids_sorted", "sorted_rows", "nbr", "sim")}
+        return cls(version, manifest, **arrs)
+
+    def row(self, show_id) -> int | None:
+        key = str(show_id)
+        i = int(np.searchsorted(self.ids_sorted, key))
+        if i < len(self.ids_sorted) and self.ids_sorted[i] == key:
+            return int(self.sorted_rows[i])
+        return None
+
+    def scores(self, rated: dict[str, float]) -> dict[str, float]:
+        """Predicted affinity for unrated shows from weighted ratings {show_id: weight}:
+        sum(w * sim) / (sum |sim| + 1), i.e. item-based CF shrunk toward 0."""
+        num: dict[int, float] = {}
+        den: dict[int, float] = {}
+        rated_rows = set()
+        for sid, w in rated.items():
+            r = self.row(sid)
+            if r is None or not w:
+                continue
+            rated_rows.add(r)
+            for j, s in zip(self.nbr[r].tolist(), self.sim[r].tolist()):
+                if j < 0:
+                    break
+                num[j] = num.get(j, 0.0) + w * s
+                den[j] = den.get(j, 0.0) + abs(s)
+        return {str(self.ids[j]): v / (den[j] + 1.0) for j, v in num.items() if j not in rated_rows}
+
+
+def profile_weights(rating_map_by_profile: dict[int, dict[str, int]]) -> dict[str, float]:
+    out: dict[str, float] = {}
+    for ratings in rating_map_by_profile.values():
+        for sid, pri in ratings.items():
+            out[sid] = out.get(sid, 0.0) + RATING_WEIGHTS.get(int(pri), 0.0)
+    return out
+
+
+def read_current(root: str = CF_MODEL_DIR) -> str | None:
+    try:
+        with open(os.path.join(root, "CURRENT")) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+_current: tuple[float, CFModel | None] | None = None  # (next CURRENT check, model)
+
+
+def current_cf_model() -> CFModel | None:
+    """Live CF model or None (no worker has published one yet)."""
+    global _current
+    if np is None:
+        return None
+    now = time.time()
+    if _current is not None and _current[0] > now:
+        return _current[1]
+    model = _current[1] if _current is not None else None
+    version = read_current()
+    if version is None:
+        model = None
+    elif model is None or model.version != version:
+        try:
+            model = CFModel.open(CF_MODEL_DIR, version)
+        except Exception:
+            model = None
+    _current = (now + _RELOAD_CHECK_S, model)
+    return model
+
+
+def invalidate() -> None:
+    global _current
+    _current = None
@@ -52,6 +52,13 @@ def init_db() -> None:
     if settings.use_sqlite:
         from . import models  # noqa: F401
         SQLModel.metadata.create_all(engine)
+        # No recsys worker publishes the catalog artifact in SQLite mode: do it once here
+        from .catalog_artifact import ensure_published
+        try:
+            with Session(engine) as session:
+                ensure_published(session)
+        except Exception:
+            pass
     _initialized = True
 
 
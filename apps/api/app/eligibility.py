@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import os
+import time
+import uuid
+from typing import Iterable
+
+from sqlmodel import Session, select
+from sqlalchemy import bindparam, func, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import load_only
+
+from .catalog_artifact import _age_from_meta, _length_from_meta
+
+
+# Candidate eligibility as set algebra over catalog-wide indexes instead of a per-show scan:
+# available shows, episode-length buckets, age-rating buckets and warning -> show postings.
+# One index per process, rebuilt when the catalog fingerprint (row counts and latest
+# updated_at of shows and availability) changes; the fingerprint is re-read every
+# ELIGIBILITY_CHECK_S.
+#
+# Catalogs too large to hold in memory push the same filters into Postgres instead, over the
+# generated feature columns from migration 0012 (ELIGIBILITY_SQL=auto|true|false; auto
+# switches at ELIGIBILITY_SQL_MIN_SHOWS). If that query fails (columns not migrated yet), the
+# in-process index serves requests and SQL is retried after ELIGIBILITY_SQL_RETRY_S.
+ELIGIBILITY_CHECK_S = float(os.getenv("ELIGIBILITY_CHECK_S", "10"))
+ELIGIBILITY_SQL = os.getenv("ELIGIBILITY_SQL", "auto").lower()
+ELIGIBILITY_SQL_MIN_SHOWS = int(os.getenv("ELIGIBILITY_SQL_MIN_SHOWS", "50000"))
+ELIGIBILITY_SQL_RETRY_S = float(os.getenv("ELIGIBILITY_SQL_RETRY_S", "300"))
+SHORT_TONIGHT_MAX_LEN = 35
+
+
+def _union(sets: Iterable[frozenset[str]]) -> frozenset[str]:
+    out: set[str] = set()
+    for s in sets:
+        out |= s
+    return frozenset(out)
+
+
+class EligibilityIndex:
+    def __init__(self, fingerprint: tuple, rows: list[tuple[str, dict, list]], available: Iterable[str]):
+        self.fingerprint = fingerprint
+        self.all_ids = frozenset(sid for sid, _, _ in rows)
+        self.available = frozenset(available) & self.all_ids
+        by_len: dict[int, set[str]] = {}
+        by_age: dict[int, set[str]] = {}  # -1 = unknown, never gated
+        postings: dict[str, set[str]] = {}
+        for sid, meta, warnings in rows:
+            meta = meta or {}
+            by_len.setdefault(_length_from_meta(meta), set()).add(sid)
+            by_age.setdefault(_age_from_meta(meta), set()).add(sid)
+            for w in warnings or []:
+                postings.setdefault(str(w), set()).add(sid)
+        self.episode_length = {k: frozenset(v) for k, v in sorted(by_len.items())}
+        self.age = {k: frozenset(v) for k, v in sorted(by_age.items())}
+        self.warnings = {k: frozenset(v) for k, v in postings.items()}
+        self._base: dict[tuple[bool, int | None], frozenset[str]] = {}
+
+    def longer_than(self, minutes: int) -> frozenset[str]:
+        return _union(v for k, v in self.episode_length.items() if k > minutes)
+
+    def above_age(self, limit: int) -> frozenset[str]:
+        return _union(v for k, v in self.age.items() if k > limit)
+
+    def with_warnings(self, warnings: Iterable[str]) -> frozenset[str]:
+        return _union(self.warnings.get(w, frozenset()) for w in warnings)
+
+    def base(self, intent: str, age_limit: int | None) -> frozenset[str]:
+        """Available shows passing the intent's length cutoff and the age limit (memoized)."""
+        key = (intent == "short_tonight", age_limit)
+        ids = self._base.get(key)
+        if ids is None:
+            ids = self.available
+            if key[0]:
+                ids = ids - self.longer_than(SHORT_TONIGHT_MAX_LEN)
+            if age_limit is not None:
+                ids = ids - self.above_age(age_limit)
+            self._base[key] = ids
+        return ids
+
+    def partition(self, intent: str, age_limit: int | None, banned: Iterable[str]) -> tuple[frozenset[str], frozenset[str]]:
+        """(safe ids, boundary violator ids) for one request."""
+        base = self.base(intent, age_limit)
+        violators = base & self.with_warnings(banned)
+        return base - violators, violators
+
+
+def _fingerprint(session: Session) -> tuple:
+    from .models import Availability, Show  # type: ignore
+    shows = session.exec(select(func.count(Show.id), func.max(Show.updated_at))).first()
+    avail = session.exec(select(func.count(Availability.id), func.max(Availability.updated_at))).first()
+    return (*tuple(shows or ()), *tuple(avail or ()))
+
+
+def build(session: Session, fingerprint: tuple | None = None) -> EligibilityIndex:
+    from .models import Availability, Show  # type: ignore
+    fp = fingerprint if fingerprint is not None else _fingerprint(session)
+    rows = [(str(sid), meta, warns) for sid, meta, warns in session.exec(select(Show.id, Show.meta, Show.warnings)).all()]
+    available = {str(sid) for sid in session.exec(select(Availability.show_id).distinct()).all()}
+    return EligibilityIndex(fp, rows, available)
+
+
+_fp: tuple[float, tuple] | None = None  # (next check, fingerprint)
+_index: EligibilityIndex | None = None
+_sql_retry_at = 0.0  # SQL path failed: in-process index until then
+
+
+def catalog_fingerprint(session: Session) -> tuple:
+    global _fp
+    now = time.time()
+    if _fp is None or _fp[0] <= now:
+        _fp = (now + ELIGIBILITY_CHECK_S, _fingerprint(session))
+    return _fp[1]
+
+
+def eligibility_index(session: Session) -> EligibilityIndex:
+    global _index
+    fp = catalog_fingerprint(session)
+    if _index is None or _index.fingerprint != fp:
+        _index = build(session, fp)
+    return _index
+
+
+def use_sql(session: Session) -> bool:
+    if ELIGIBILITY_SQL == "false" or session.get_bind().dialect.name != "postgresql":
+        return False
+    return ELIGIBILITY_SQL == "true" or int(catalog_fingerprint(session)[0] or 0) >= ELIGIBILITY_SQL_MIN_SHOWS
+
+
+_ELIGIBLE = text(
+    """
+    EXISTS (SELECT 1 FROM availability a WHERE a.show_id = shows.id)
+    AND (NOT :short OR shows.episode_length <= :max_len)
+    AND (:age IS NULL OR shows.age_rating IS NULL OR shows.age_rating <= :age)
+    """
+).bindparams(bindparam("age", type_=postgresql.INTEGER))
+
+
+def _candidate_columns():
+    """Only the Show columns scoring and the slate read; the rest stay deferred."""
+    from .models import Show  # type: ignore
+    return load_only(Show.id, Show.title, Show.year_start, Show.meta, Show.warnings, Show.flags, Show.updated_at)
+
+
+def sql_candidates(session: Session, intent: str, age_limit: int | None, banned: Iterable[str]) -> tuple[list, frozenset[str]]:
+    """Eligible shows and the boundary violators among them, filtered in Postgres."""
+    from .models import Show  # type: ignore
+    violates = Show.warnings.op("?|")(bindparam("banned", type_=postgresql.ARRAY(postgresql.TEXT)))
+    rows = session.exec(
+        select(Show, violates.label("violates")).options(_candidate_columns()).where(_ELIGIBLE),
+        params={"short": intent == "short_tonight", "max_len": SHORT_TONIGHT_MAX_LEN, "age": age_limit, "banned": sorted(banned)},
+    ).all()
+    return [s for s, _ in rows], frozenset(str(s.id) for s, v in rows if v)
+
+
+def eligible_shows(session: Session, intent: str, age_limit: int | None, banned: Iterable[str]) -> tuple[list, frozenset[str]]:
+    """(eligible shows, ids of the boundary violators among them) for one request."""
+    from .models import Show  # type: ignore
+    global _sql_retry_at
+    banned = list(banned)
+    if _sql_retry_at <= time.time() and use_sql(session):
+        try:
+            return sql_candidates(session, intent, age_limit, banned)
+        except Exception:
+            # Feature columns not migrated yet: fall back to the in-process index
+            session.rollback()
+            _sql_retry_at = time.time() + ELIGIBILITY_SQL_RETRY_S
+    safe_ids, violator_ids = eligibility_index(session).partition(intent, age_limit, banned)
+    ids = [uuid.UUID(i) for i in safe_ids | violator_ids]
+    shows = session.exec(select(Show).options(_candidate_columns()).where(Show.id.in_(ids))).all() if ids else []
+    return list(shows), violator_ids
+
+
+def invalidate() -> None:
+    global _fp, _index, _sql_retry_at
+    _fp = None
+    _index = None
+    _sql_retry_at = 0.0
@@ -2,9 +2,13 @@ from __future__ import annotations
 
 import hashlib
 import math
+import os
+import time
+from functools import lru_cache
 from typing import List
 
 from sqlmodel import Session, select
+from sqlalchemy import text
 
 
 def _tokens_from_metadata(meta: dict | None) -> list[str]:
@@ -25,17 +29,23 @@ def _tokens_from_metadata(meta: dict | None) -> list[str]:
     return toks
 
 
-def _vec_for_token(tok: str, dim: int = 384) -> list[float]:
+# Token -> vector memo. The token vocabulary (genres, creators, length buckets, regions) is
+# small and hashing is pure, so each token is hashed once per process instead of per show.
+TOKEN_VEC_CACHE = int(os.getenv("TOKEN_VEC_CACHE", "65536"))
+
+
+@lru_cache(maxsize=TOKEN_VEC_CACHE)
+def token_hash_raw(tok: str, dim: int = 384) -> tuple[float, ...]:
+    """Un-normalised hash vector for one token, values in -1..1."""
     h = hashlib.sha256(tok.encode()).digest()
-    vals: list[float] = []
-    i = 0
-    while len(vals) < dim:
-        b = h[i % len(h)]
-        v = (b / 255.0) * 2.0 - 1.0
-        vals.append(v)
-        i += 1
+    return tuple((h[i % len(h)] / 255.0) * 2.0 - 1.0 for i in range(dim))
+
+
+@lru_cache(maxsize=TOKEN_VEC_CACHE)
+def _vec_for_token(tok: str, dim: int = 384) -> tuple[float, ...]:
+    vals = token_hash_raw(tok, dim)
     norm = math.sqrt(sum(x * x for x in vals)) or 1.0
-    return [x / norm for x in vals]
+    return tuple(x / norm for x in vals)
 
 
 def _combine(vecs: list[list[float]]) -> list[float]:
@@ -50,32 +60,167 @@ def _combine(vecs: list[list[float]]) -> list[float]:
     return [x / norm for x in out]
 
 
-def rebuild_profile_embedding(session: Session, profile_id: int) -> None:
-    from .models import Rating, Show  # type: ignore
-    ratings = session.exec(select(Rating).where(Rating.profile_id == profile_id)).all()
-    vecs: list[list[float]] = []
-    for r in ratings:
-        s = session.get(Show, r.show_id)
-        if not s:
-            continue
-        toks = _tokens_from_metadata(s.metadata)
-        v = _combine([_vec_for_token(t) for t in toks])
-        w = 2.0 if r.primary == 2 else (1.0 if r.primary == 1 else -1.0)
-        vecs.append([x * w for x in v])
-    emb = _combine(vecs) if vecs else [0.0] * 384
-    session.exec(
-        """
-        INSERT INTO embeddings_profile (profile_id, emb)
-        VALUES (:pid, :arr)
-        ON CONFLICT (profile_id) DO UPDATE SET emb = EXCLUDED.emb
-        """,
-        {"pid": profile_id, "arr": emb},
-    )
-    session.exec(
-        """
-        UPDATE embeddings_profile SET emb_v = :vec::vector WHERE profile_id = :pid
-        """,
-        {"pid": profile_id, "vec": "[" + ",".join(str(x) for x in emb) + "]"},
-    )
+def _rating_weight(primary: int | None) -> float:
+    if primary is None:
+        return 0.0
+    return 2.0 if primary == 2 else (1.0 if primary == 1 else -1.0)
+
+
+def _normalize(v: list[float]) -> list[float]:
+    norm = math.sqrt(sum(x * x for x in v)) or 1.0
+    return [x / norm for x in v]
+
+
+# Active embedding generation, re-read at most every EMB_GENERATION_TTL_S seconds.
+# Anything cached from embeddings should include it in its key so it reloads once per cutover.
+_GEN_TTL_S = float(os.getenv("EMB_GENERATION_TTL_S", "30"))
+_active_gen: tuple[float, int, str | None, int | None] | None = None
+
+
+def _load_active(session: Session) -> tuple[float, int, str | None, int | None]:
+    global _active_gen
+    now = time.time()
+    if _active_gen is not None and _active_gen[0] > now:
+        return _active_gen
+    from .models import EmbeddingGeneration  # type: ignore
+    gen, method, search = 1, None, None
+    try:
+        row = session.exec(
+            select(EmbeddingGeneration.id, EmbeddingGeneration.index_method, EmbeddingGeneration.search_param)
+            .where(EmbeddingGeneration.status == "active")
+        ).first()
+        if row is not None:
+            gen, method, search = int(row[0]), row[1], row[2]
+    except Exception:
+        session.rollback()
+    _active_gen = (now + _GEN_TTL_S, gen, method, search)
+    return _active_gen
+
+
+def active_generation(session: Session) -> int:
+    return _load_active(session)[1]
+
+
+def ann_search_setting(session: Session) -> tuple[str, int] | None:
+    """(GUC, value) tuned by the index job for the active generation's show index, if any."""
+    _, _, method, search = _load_active(session)
+    if not method or not search:
+        return None
+    return ("hnsw.ef_search" if method == "hnsw" else "ivfflat.probes", int(search))
+
+
+def _live_generations(session: Session) -> list[int]:
+    """Active generation first, then any generation currently being built."""
+    from .models import EmbeddingGeneration  # type: ignore
+    active = active_generation(session)
+    try:
+        building = session.exec(select(EmbeddingGeneration.id).where(EmbeddingGeneration.status == "building")).all()
+    except Exception:
+        session.rollback()
+        building = []
+    return [active] + [int(g) for g in building if int(g) != active]
+
+
+def _write_profile(session: Session, profile_id: int, emb_sum: list[float], n_ratings: int, generation: int) -> None:
+    from .models import EmbeddingProfile  # type: ignore
+    emb = _normalize(emb_sum)
+    row = session.get(EmbeddingProfile, (profile_id, generation))
+    if row is None:
+        row = EmbeddingProfile(profile_id=profile_id, generation=generation, emb=emb)
+    row.emb = emb
+    row.emb_sum = emb_sum
+    row.n_ratings = n_ratings
+    session.add(row)
+    session.flush()
+    if session.get_bind().dialect.name == "postgresql":
+        session.exec(
+            text("UPDATE embeddings_profile SET emb_v = CAST(:vec AS vector) WHERE profile_id = :pid AND generation = :gen"),
+            params={"pid": profile_id, "gen": generation, "vec": "[" + ",".join(str(x) for x in emb) + "]"},
+        )
     session.commit()
 
+
+def show_vector(session: Session, show_id, generation: int | None = None) -> list[float] | None:
+    """Stored show embedding, or the token-hash vector when the worker has not built it yet."""
+    from .models import EmbeddingShow, Show  # type: ignore
+    gen = generation if generation is not None else active_generation(session)
+    es = session.get(EmbeddingShow, (show_id, gen))
+    if es is not None and es.emb:
+        return list(es.emb)
+    s = session.get(Show, show_id)
+    if s is None:
+        return None
+    return _combine([_vec_for_token(t) for t in _tokens_from_metadata(s.meta)])
+
+
+def _locked_profile_row(session: Session, profile_id: int, generation: int):
+    """The profile's row re-read from the database under FOR UPDATE (a no-op on SQLite), so
+    concurrent deltas queue on the row lock instead of overwriting each other's sums."""
+    from .models import EmbeddingProfile  # type: ignore
+    return session.exec(
+        select(EmbeddingProfile)
+        .where(EmbeddingProfile.profile_id == profile_id, EmbeddingProfile.generation == generation)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).first()
+
+
+def apply_rating_delta(session: Session, profile_id: int, show_id, old_primary: int | None, new_primary: int | None) -> None:
+    """Update a profile embedding for one rating insert (old=None), update, or delete (new=None).
+
+    Adds (w_new - w_old) * show_vec to the stored running sum in O(dim). The delta also lands
+    in a generation that is still being built, if it already has this profile's row. An active
+    row without a stored sum (written before sums existed) falls back to one full rebuild.
+    """
+    apply_rating_deltas(session, profile_id, [(show_id, old_primary, new_primary)])
+
+
+def apply_rating_deltas(session: Session, profile_id: int, changes: list[tuple]) -> None:
+    """apply_rating_delta for several committed (show_id, old_primary, new_primary) changes.
+
+    The rebuild fallback already reads every committed rating, so when it runs none of the
+    deltas are applied on top of it.
+    """
+    gens = _live_generations(session)
+    for gen in gens:
+        row = _locked_profile_row(session, profile_id, gen)
+        if row is None or row.emb_sum is None:
+            session.commit()
+            if gen == gens[0]:
+                rebuild_profile_embedding(session, profile_id, generation=gen)
+            continue
+        emb_sum = list(row.emb_sum)
+        n = int(row.n_ratings or 0)
+        changed = False
+        for show_id, old_primary, new_primary in changes:
+            dw = _rating_weight(new_primary) - _rating_weight(old_primary)
+            dn = (new_primary is not None) - (old_primary is not None)
+            v = show_vector(session, show_id, gen)
+            if v is None or (dw == 0.0 and dn == 0):
+                continue
+            emb_sum = [a + dw * b for a, b in zip(emb_sum, v)]
+            n += dn
+            changed = True
+        if changed:
+            _write_profile(session, profile_id, emb_sum, max(0, n), gen)
+        else:
+            session.commit()
+
+
+def rebuild_profile_embedding(session: Session, profile_id: int, generation: int | None = None) -> None:
+    """Full recompute from all of the profile's ratings (backfill / repair path)."""
+    from .models import EmbeddingShow, Rating, Show  # type: ignore
+    gen = generation if generation is not None else active_generation(session)
+    # One joined query; stored show vectors are reused and only missing ones are re-hashed.
+    rows = session.exec(
+        select(Rating.primary, Show.meta, EmbeddingShow.emb)
+        .join(Show, Show.id == Rating.show_id)
+        .outerjoin(EmbeddingShow, (EmbeddingShow.show_id == Rating.show_id) & (EmbeddingShow.generation == gen))
+        .where(Rating.profile_id == profile_id)
+    ).all()
+    emb_sum = [0.0] * 384
+    for primary, meta, emb in rows:
+        v = emb or _combine([_vec_for_token(t) for t in _tokens_from_metadata(meta)])
+        w = _rating_weight(primary)
+        emb_sum = [a + w * b for a, b in zip(emb_sum, v)]
+    _write_profile(session, profile_id, emb_sum, len(rows), gen)
@@ -1,9 +1,21 @@
 from __future__ import annotations
 
+import json
+import os
+import time
 from typing import Iterable
-from sqlmodel import Session, select
-from sqlalchemy import text
-from .models import Show
+from sqlmodel import Session
+from sqlalchemy import bindparam, text
+from .vocab import VOCAB, ShowBits
+
+
+# Recent-history adjacency is cached per set of profile refs. `job_sync_serializd` records an
+# `admin:status:serializd_history` event after inserting rows; a newer event (checked at most
+# every HISTORY_VERSION_CHECK_S) or HISTORY_CACHE_TTL_S expiry drops the cached entries.
+HISTORY_STATUS_KIND = "admin:status:serializd_history"
+HISTORY_CACHE_TTL_S = float(os.getenv("HISTORY_CACHE_TTL_S", "300"))
+HISTORY_VERSION_CHECK_S = float(os.getenv("HISTORY_VERSION_CHECK_S", "10"))
+_RECENT_LIMIT = 50
 
 
 class HistoryRecent:
@@ -20,17 +32,28 @@ class HistoryRecent:
         for r in rows or []:
             self.creators.update(r.get("creators", []) or [])
             self.genres.update(r.get("genres", []) or [])
+        # Interned once so each candidate check is two ANDs (see vocab.py)
+        self.creator_mask = VOCAB.intern("creator", self.creators)
+        self.genre_mask = VOCAB.intern("genre", self.genres)
+
+    def __bool__(self) -> bool:
+        return bool(self.creator_mask or self.genre_mask)
+
+    def adjacent_bits(self, bits: ShowBits) -> bool:
+        return bool(bits.creators & self.creator_mask or bits.genres & self.genre_mask)
 
     def is_adjacent(self, item) -> bool:
-        ic = set(getattr(item, "metadata", {}).get("creators", []) or [])
-        ig = set(getattr(item, "metadata", {}).get("genres", []) or [])
-        return bool(self.creators & ic or self.genres & ig)
+        meta = getattr(item, "meta", None)
+        if not isinstance(meta, dict):
+            meta = getattr(item, "metadata", None)
+        meta = meta if isinstance(meta, dict) else {}
+        return bool(
+            VOCAB.mask("creator", meta.get("creators") or []) & self.creator_mask
+            or VOCAB.mask("genre", meta.get("genres") or []) & self.genre_mask
+        )
 
 
-def recent_for_profiles(session: Session, profiles: list) -> "HistoryRecent":
-    """Fetch recent Serializd rows for given profiles and map to creators/genres via title match.
-    Best-effort: joins by exact Show.title; if no matches, returns empty sets.
-    """
+def _profile_refs(profiles: list) -> list[str]:
     names = []
     try:
         # Use profile names as refs when available (e.g., Ross/Wife/Son)
@@ -42,32 +65,83 @@ def recent_for_profiles(session: Session, profiles: list) -> "HistoryRecent":
                 names.append(nm)
     except Exception:
         names = []
+    return names
+
+
+def load_recent(session: Session, names: list[str]) -> "HistoryRecent":
+    """Latest Serializd rows (for `names`, or overall) joined to their shows in one query: by the
+    show_id resolved at ingest, else by exact title for rows stored before resolution. A title
+    shared by several shows (remakes) resolves to one of them, so each row counts once."""
+    where = "WHERE sh.profile_ref IN :names" if names else ""
+    q = text(f"""
+        SELECT COALESCE(s.metadata, (
+            SELECT t.metadata FROM shows t
+            WHERE recent.show_id IS NULL AND t.title = recent.title_ref
+            ORDER BY t.id
+            LIMIT 1
+        ))
+        FROM (
+            SELECT show_id, title_ref, last_seen_ts FROM serializd_history sh
+            {where}
+            ORDER BY last_seen_ts DESC
+            LIMIT {_RECENT_LIMIT}
+        ) recent
+        LEFT JOIN shows s ON s.id = recent.show_id
+    """)
+    if names:
+        q = q.bindparams(bindparam("names", expanding=True))
+    res = session.exec(q, params={"names": names} if names else {}).all()
     rows: list[dict] = []
+    for (meta,) in res:
+        if isinstance(meta, str):  # SQLite returns JSON columns as text from raw SQL
+            meta = json.loads(meta)
+        meta = meta or {}
+        rows.append({
+            "creators": meta.get("creators", []) or [],
+            "genres": meta.get("genres", []) or [],
+        })
+    return HistoryRecent(rows)
+
+
+_cache: dict[tuple, tuple[float, int | None, HistoryRecent]] = {}  # refs -> (expires, version, recent)
+_version: tuple[float, int | None] | None = None  # (next check, latest sync event id)
+
+
+def _history_version(session: Session) -> int | None:
+    global _version
+    now = time.time()
+    if _version is None or _version[0] <= now:
+        try:
+            row = session.exec(text("SELECT MAX(id) FROM events WHERE kind = :k"), params={"k": HISTORY_STATUS_KIND}).first()
+            v = row[0] if row else None
+        except Exception:
+            session.rollback()
+            v = None
+        _version = (now + HISTORY_VERSION_CHECK_S, v)
+    return _version[1]
+
+
+def recent_for_profiles(session: Session, profiles: list) -> "HistoryRecent":
+    """Recent Serializd rows for the given profiles mapped to creators/genres via title match.
+    Best-effort: rows without a matching show are skipped; if none match, returns empty sets.
+    """
+    names = _profile_refs(profiles)
+    key = tuple(sorted(names))
+    now = time.time()
+    version = _history_version(session)
+    hit = _cache.get(key)
+    if hit is not None and hit[0] > now and hit[1] == version:
+        return hit[2]
     try:
-        # Recent 50 entries overall (filter by profile_ref if names set)
-        if names:
-            q = text("""
-                SELECT sh.title_ref, sh.last_seen_ts
-                FROM serializd_history sh
-                WHERE sh.profile_ref = ANY(:names)
-                ORDER BY sh.last_seen_ts DESC
-                LIMIT 50
-            """)
-            res = session.exec(q, {"names": names}).all()
-        else:
-            q = text("SELECT title_ref, last_seen_ts FROM serializd_history ORDER BY last_seen_ts DESC LIMIT 50")
-            res = session.exec(q).all()
-        title_refs = [r[0] for r in res if r and r[0]]
-        if not title_refs:
-            return HistoryRecent([])
-        # Map titles to creators/genres
-        for t in title_refs:
-            s = session.exec(select(Show).where(Show.title == t)).first()
-            if s:
-                rows.append({
-                    "creators": (s.metadata or {}).get("creators", []) or [],
-                    "genres": (s.metadata or {}).get("genres", []) or [],
-                })
+        recent = load_recent(session, names)
     except Exception:
-        pass
-    return HistoryRecent(rows)
+        session.rollback()
+        recent = HistoryRecent([])
+    _cache[key] = (now + HISTORY_CACHE_TTL_S, version, recent)
+    return recent
+
+
+def invalidate() -> None:
+    global _version
+    _cache.clear()
+    _version = None
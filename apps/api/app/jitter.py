@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Iterable
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore
+
+
+# Deterministic tiebreak jitter, tabulated per (seed, catalog version): float64 arrays aligned
+# with the artifact's rows and bit-identical to stable_hash01. The seedless table every default
+# request uses is built when a version is opened; a seeded table is built on the seed's first
+# request. `seed` is a free request parameter, so seeded tables sit in their own small LRU and
+# cannot evict the seedless ones. Ids outside the artifact are hashed directly.
+JITTER_CACHE = int(os.getenv("JITTER_CACHE", "2"))  # seedless: catalog versions (current + previous)
+JITTER_SEED_CACHE = int(os.getenv("JITTER_SEED_CACHE", "8"))  # seeded: (seed, version) tables
+
+
+def stable_hash01(item_id: str, seed: int | None) -> float:
+    h = blake2b(digest_size=8)
+    h.update(item_id.encode())
+    if seed is not None:
+        h.update(str(seed).encode())
+    n = int.from_bytes(h.digest(), "big")
+    return (n % 10_000_000) / 10_000_000.0
+
+
+_tables: OrderedDict[str, "np.ndarray"] = OrderedDict()
+_seeded: OrderedDict[tuple[int, str], "np.ndarray"] = OrderedDict()
+
+
+def jitter_table(version: str, ids, seed: int | None = None) -> "np.ndarray":
+    """stable_hash01(id, seed) for every catalog row, LRU-cached per (seed, catalog version)."""
+    cache, key, cap = (_tables, version, JITTER_CACHE) if seed is None else (_seeded, (int(seed), version), JITTER_SEED_CACHE)
+    tbl = cache.get(key)
+    if tbl is not None:
+        cache.move_to_end(key)
+        return tbl
+    tbl = np.fromiter((stable_hash01(str(i), seed) for i in ids), dtype=np.float64, count=len(ids))
+    cache[key] = tbl
+    while len(cache) > cap:
+        cache.popitem(last=False)
+    return tbl
+
+
+def jitter_for(artifact, seed: int | None, show_ids: Iterable[str]) -> dict[str, float]:
+    """Jitter for a request's candidates: one vectorised row lookup into the (seed, version)
+    table, or a direct hash per candidate when there is no artifact."""
+    ids = [str(i) for i in show_ids]
+    out: dict[str, float] = {}
+    if artifact is not None and np is not None and ids and len(artifact.index):
+        index = artifact.index
+        tbl = jitter_table(artifact.version, index.ids, seed)
+        keys = np.asarray(ids, dtype=index.ids_sorted.dtype)
+        pos = np.searchsorted(index.ids_sorted, keys)
+        pos = np.minimum(pos, len(index.ids_sorted) - 1)
+        found = index.ids_sorted[pos] == keys
+        vals = tbl[index.sorted_rows[pos]]
+        out = {i: float(v) for i, v, ok in zip(ids, vals.tolist(), found.tolist()) if ok}
+    for i in ids:
+        if i not in out:
+            out[i] = stable_hash01(i, seed)
+    return out
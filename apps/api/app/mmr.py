@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore
+
+
+# Maximal marginal relevance over a scored pool: greedily take the item maximising
+#   lam * relevance - (1 - lam) * max cosine to the items already taken
+# Relevance is min-max scaled within the pool so lambda means the same for every request.
+# One matrix-vector product per pick keeps the running max, so a k-item slate from an
+# n-item pool costs k * n * dim flops.
+
+
+def mmr_select(relevance: Sequence[float], vectors, k: int, lam: float) -> list[int]:
+    """Pool indices in pick order; `vectors` holds L2-normalised rows (zero rows = unknown)."""
+    rel = np.asarray(relevance, dtype=np.float64)
+    n = len(rel)
+    k = min(int(k), n)
+    if k <= 0:
+        return []
+    span = float(rel.max() - rel.min())
+    rel = (rel - rel.min()) / span if span > 0 else np.zeros(n)
+    vecs = np.asarray(vectors, dtype=np.float32)
+    max_sim = np.zeros(n)
+    taken = np.zeros(n, dtype=bool)
+    out: list[int] = []
+    for _ in range(k):
+        obj = lam * rel - (1.0 - lam) * max_sim
+        obj[taken] = -np.inf
+        i = int(np.argmax(obj))
+        out.append(i)
+        taken[i] = True
+        np.maximum(max_sim, vecs @ vecs[i], out=max_sim)
+    return out
+
+
+def mmr_order(items: list, relevance: Sequence[float], vectors, k: int, lam: float) -> list:
+    """`items` with the first k positions re-ranked by MMR, the rest in their original order."""
+    head = mmr_select(relevance, vectors, k, lam)
+    chosen = set(head)
+    return [items[i] for i in head] + [x for i, x in enumerate(items) if i not in chosen]
@@ -105,20 +105,50 @@ class Rating(SQLModel, table=True):
     primary: int = Field(ge=0, le=2, description="0=BAD,1=ACCEPTABLE,2=VERY GOOD")
     nuance_tags: Optional[List[str]] = Field(default=None, sa_column_kwargs={"type_": _array_type(item_type=str)})
     note: Optional[str] = None
+    source: Optional[str] = None  # None = entered in the app; "serializd" = written by the sync
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class EmbeddingGeneration(SQLModel, table=True):
+    __tablename__ = "embedding_generations"
+    id: Optional[int] = Field(default=None, primary_key=True)
+    status: str = "building"  # building|active|retired|dropped
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    activated_at: Optional[datetime] = None
+    # Show ANN index as built (ivfflat|hnsw), its build size and the tuned probes / ef_search
+    index_method: Optional[str] = None
+    index_params: Optional[dict] = Field(default=None, sa_column=Column(JSONType))
+    index_rows: Optional[int] = None
+    search_param: Optional[int] = None
+
+
 class EmbeddingShow(SQLModel, table=True):
     __tablename__ = "embeddings_show"
     show_id: uuid.UUID = Field(foreign_key="shows.id", primary_key=True)
+    generation: int = Field(default=1, primary_key=True)
     emb: List[float] = Field(sa_column_kwargs={"type_": _array_type(item_type=float)})
+    fingerprint: Optional[str] = None
 
 
 class EmbeddingProfile(SQLModel, table=True):
     __tablename__ = "embeddings_profile"
     profile_id: int = Field(foreign_key="profiles.id", primary_key=True)
+    generation: int = Field(default=1, primary_key=True)
     emb: List[float] = Field(sa_column_kwargs={"type_": _array_type(item_type=float)})
+    # Unnormalised running sum of rating-weighted show vectors; emb = emb_sum / |emb_sum|
+    emb_sum: Optional[List[float]] = Field(default=None, sa_column_kwargs={"type_": _array_type(item_type=float)})
+    n_ratings: int = 0
+
+
+class ItemNeighbor(SQLModel, table=True):
+    __tablename__ = "item_neighbors"
+    # Top-K similar shows per show and embedding generation, best first (rank 0)
+    show_id: uuid.UUID = Field(foreign_key="shows.id", primary_key=True)
+    generation: int = Field(primary_key=True)
+    rank: int = Field(primary_key=True)
+    neighbor_id: uuid.UUID = Field(foreign_key="shows.id")
+    score: float
 
 
 class Watchlist(SQLModel, table=True):
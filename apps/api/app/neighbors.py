@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import os
+import uuid
+from typing import Iterable
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore
+
+from sqlmodel import Session, select
+from sqlalchemy import bindparam, text
+
+from .settings import settings
+from .embeddings_util import active_generation
+
+
+# Item-to-item neighbours for "more like this" anchors. Computed when the catalog artifact is
+# published (top ITEM_NEIGHBORS_K per show, stored as nbr_*.npy next to the embeddings) and
+# materialised into `item_neighbors` per embedding generation by the worker. Score blends
+# embedding similarity with the genre/episode-length heuristic the engine used before:
+#   (1 - w) * (1 + cos) / 2 + w * clip(0.2 * shared_genres - 0.02 * |dl|, 0, 1)
+ITEM_NEIGHBORS_K = int(os.getenv("ITEM_NEIGHBORS_K", "50"))
+_META_WEIGHT = 0.2
+_BLOCK = 1024
+
+
+def neighbor_score(cos: float | None, shared_genres: int, length_diff: float) -> float:
+    """One pair's neighbour score; without an embedding similarity only the heuristic counts."""
+    meta = min(1.0, max(0.0, 0.2 * shared_genres - 0.02 * abs(length_diff)))
+    if cos is None:
+        return meta
+    return (1.0 - _META_WEIGHT) * (1.0 + cos) / 2.0 + _META_WEIGHT * meta
+
+
+def top_neighbors(mat, genre_mask, episode_length, k: int = ITEM_NEIGHBORS_K):
+    """(rows, scores), each n x min(k, n-1): best-first neighbour rows per row, self excluded."""
+    n = int(mat.shape[0])
+    k = max(0, min(int(k), n - 1))
+    rows = np.zeros((n, k), dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+    if k == 0:
+        return rows, scores
+    mat = np.asarray(mat, dtype=np.float32)
+    # One uint64 per row, or n x words for genre vocabularies past 64 entries
+    words = np.asarray(genre_mask, dtype=np.uint64).reshape(n, -1)
+    genres = ((words[:, :, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)).reshape(n, -1).astype(np.float32)
+    length = np.asarray(episode_length, dtype=np.float32)
+    for start in range(0, n, _BLOCK):
+        stop = min(n, start + _BLOCK)
+        emb = (1.0 + mat[start:stop] @ mat.T) / 2.0
+        meta = np.clip(0.2 * (genres[start:stop] @ genres.T) - 0.02 * np.abs(length[start:stop, None] - length[None, :]), 0.0, 1.0)
+        sim = (1.0 - _META_WEIGHT) * emb + _META_WEIGHT * meta
+        sim[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        top = np.argpartition(-sim, k - 1, axis=1)[:, :k]
+        top_sim = np.take_along_axis(sim, top, axis=1)
+        order = np.argsort(-top_sim, axis=1, kind="stable")
+        rows[start:stop] = np.take_along_axis(top, order, axis=1)
+        scores[start:stop] = np.take_along_axis(top_sim, order, axis=1)
+    return rows, scores
+
+
+def materialize(session: Session, artifact) -> int:
+    """Replace `item_neighbors` for the artifact's generation with its neighbour arrays."""
+    gen = artifact.generation
+    session.exec(text("DELETE FROM item_neighbors WHERE generation = :g"), params={"g": gen})
+    n = 0
+    if artifact.nbr_rows is not None:
+        ids = artifact.index.ids
+        batch: list[dict] = []
+        for r in range(len(artifact.nbr_rows)):
+            for rank, (nr, sc) in enumerate(zip(artifact.nbr_rows[r].tolist(), artifact.nbr_scores[r].tolist())):
+                batch.append({"s": str(ids[r]), "g": gen, "rank": rank, "n": str(ids[nr]), "score": float(sc)})
+            if len(batch) >= 5000:
+                session.exec(text("INSERT INTO item_neighbors (show_id, generation, rank, neighbor_id, score) VALUES (:s, :g, :rank, :n, :score)"), params=batch)
+                n += len(batch)
+                batch = []
+        if batch:
+            session.exec(text("INSERT INTO item_neighbors (show_id, generation, rank, neighbor_id, score) VALUES (:s, :g, :rank, :n, :score)"), params=batch)
+            n += len(batch)
+    session.commit()
+    return n
+
+
+def neighbors_for(session: Session, show_id, k: int | None = None) -> list[tuple[str, float]]:
+    """Best-first (show_id, score) neighbours: the mapped artifact, else the table."""
+    from .catalog_artifact import current_artifact
+    from .models import ItemNeighbor  # type: ignore
+    art = current_artifact(session)
+    if art is not None and art.nbr_rows is not None:
+        out = art.neighbors(show_id)
+        if out is not None:
+            return out[:k] if k else out
+    try:
+        q = (
+            select(ItemNeighbor.neighbor_id, ItemNeighbor.score)
+            .where(ItemNeighbor.show_id == uuid.UUID(str(show_id)), ItemNeighbor.generation == active_generation(session))
+            .order_by(ItemNeighbor.rank)
+        )
+        rows = session.exec(q.limit(k) if k else q).all()
+    except Exception:
+        session.rollback()
+        return []
+    return [(str(nid), float(sc)) for nid, sc in rows]
+
+
+def available_in_region(session: Session, show_ids: Iterable[str], region: str | None = None) -> set[str]:
+    """Subset of `show_ids` watchable in `region`: availability rows for the deployment
+    region (REGION), plus JustWatch offers recorded for that region."""
+    from .models import Availability  # type: ignore
+    ids = [str(i) for i in show_ids]
+    if not ids:
+        return set()
+    region = (region or settings.region).upper()
+    out: set[str] = set()
+    if region == settings.region.upper():
+        rows = session.exec(select(Availability.show_id).where(Availability.show_id.in_([uuid.UUID(i) for i in ids])).distinct()).all()
+        out |= {str(r) for r in rows}
+    try:
+        q = text(
+            "SELECT DISTINCT s.id FROM shows s JOIN justwatch_offers o ON o.title_ref = s.title"
+            " WHERE o.region = :region AND s.id IN :ids"
+        ).bindparams(bindparam("ids", expanding=True))
+        out |= {str(r[0]) for r in session.exec(q, params={"region": region, "ids": [uuid.UUID(i) for i in ids]}).all()}
+    except Exception:
+        # No offers table (SQLite dev): availability rows only
+        session.rollback()
+    return out
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import os
+import uuid
+from datetime import timedelta
 from typing import Optional
 
 try:
@@ -12,13 +14,31 @@ from rq import Queue
 
 from .settings import settings
 
-_queue: Optional[Queue] = None
+# User-facing work goes to the high-priority queue (the historical 'recs' name);
+# bulk refresh/rebuild jobs go to the low-priority queue. Workers drain them in that order.
+QUEUE_HIGH = "recs"
+QUEUE_LOW = "recs-low"
 
+# Profile rebuilds are debounced: one delayed job per profile per window, keyed by a
+# Redis pending marker the task clears when it starts. The marker holds a per-window token
+# that suffixes the job id, so a follow-up scheduled while a rebuild runs never reuses
+# (and overwrites) the running job's id.
+REBUILD_DEBOUNCE_S = int(os.getenv("REBUILD_DEBOUNCE_S", "10"))
 
-def get_queue() -> Optional[Queue]:
-    global _queue
-    if _queue is not None:
-        return _queue
+_queues: dict[str, Queue] = {}
+
+
+def rebuild_job_id(profile_id: int, token: str) -> str:
+    return f"rebuild_profile_embedding:{profile_id}:{token}"
+
+
+def rebuild_pending_key(profile_id: int) -> str:
+    return f"recs:pending:rebuild_profile:{profile_id}"
+
+
+def get_queue(name: str = QUEUE_HIGH) -> Optional[Queue]:
+    if name in _queues:
+        return _queues[name]
     if settings.disable_redis or Redis is None:
         return None
     url = os.getenv('REDIS_URL') if not settings.redis_url else settings.redis_url
@@ -28,8 +48,70 @@ def get_queue() -> Optional[Queue]:
         return None
     try:
         conn = Redis.from_url(url)
-        _queue = Queue('recs', connection=conn)
-        return _queue
+        _queues[name] = Queue(name, connection=conn)
+        return _queues[name]
     except Exception:
         return None
 
+
+def enqueue_profile_rebuild(profile_id: int) -> bool:
+    """Schedule a debounced, deduplicated profile embedding rebuild.
+    Returns False when no queue is available, or Redis fails, so callers can rebuild inline.
+    """
+    q = get_queue(QUEUE_HIGH)
+    if q is None:
+        return False
+    # SET NX: only the first write in a window schedules a job; later ones ride along,
+    # since the job reads the profile's ratings when it runs.
+    key = rebuild_pending_key(profile_id)
+    token = uuid.uuid4().hex[:12]
+    ttl = REBUILD_DEBOUNCE_S + 300
+    try:
+        if not q.connection.set(key, token, nx=True, ex=ttl):
+            return True
+    except Exception:
+        return False
+    try:
+        q.enqueue_in(
+            timedelta(seconds=REBUILD_DEBOUNCE_S),
+            'tasks.rebuild_profile_embedding',
+            kwargs={"profile_id": profile_id},
+            job_id=rebuild_job_id(profile_id, token),
+        )
+    except Exception:
+        try:
+            q.connection.delete(key)
+        except Exception:
+            pass
+        return False
+    return True
+
+
+# Admin sync triggers (/admin/sync) are pushed, never polled: onto the low-priority RQ queue
+# when Redis is available (one pending run per source/mode, same NX-marker scheme as above),
+# otherwise as an `admin:sync:*` event row plus NOTIFY on ADMIN_TRIGGER_CHANNEL, which the
+# worker LISTENs on and claims with FOR UPDATE SKIP LOCKED.
+ADMIN_TRIGGER_CHANNEL = "admin_triggers"
+ADMIN_SYNC_TASKS = {"justwatch": "tasks.sync_justwatch", "serializd": "tasks.sync_serializd"}
+
+
+def admin_sync_pending_key(source: str, dry_run: bool) -> str:
+    return f"recs:pending:admin_sync:{source}:{int(dry_run)}"
+
+
+def enqueue_admin_sync(source: str, dry_run: bool) -> bool:
+    """Queue one sync run for `source`; a trigger while one is pending joins it.
+    Returns False when no queue is available so callers can fall back to the events table.
+    """
+    q = get_queue(QUEUE_LOW)
+    if q is None:
+        return False
+    key = admin_sync_pending_key(source, dry_run)
+    if not q.connection.set(key, 1, nx=True, ex=3600):
+        return True
+    try:
+        q.enqueue(ADMIN_SYNC_TASKS[source], kwargs={"dry_run": dry_run})
+    except Exception:
+        q.connection.delete(key)
+        raise
+    return True
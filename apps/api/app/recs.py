@@ -1,20 +1,35 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from hashlib import blake2b
 from datetime import datetime, timezone, timedelta
+import heapq
 import os
 import logging
 from statistics import mean, pstdev
 from typing import Iterable, List, Tuple
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore
+
 from sqlmodel import Session, select
 from sqlalchemy import text
 
 from .models import Availability, Profile, Rating, Show
 from .settings import settings
 from .history_adj import HistoryRecent
+from .embeddings_util import _tokens_from_metadata, active_generation, ann_search_setting, token_hash_raw
+from .vector_state import vector_state
+from .catalog_artifact import current_artifact
+from .jitter import jitter_for, stable_hash01 as _stable_hash01
 from .spoiler_lint import assert_no_spoilers, SpoilerError
+from .vocab import VOCAB, ShowBits, overlap
+from .eligibility import eligible_shows
+from .substitutes import SubstituteIndex, best_among
+from .neighbors import neighbor_score, neighbors_for
+from .cf_model import current_cf_model, profile_weights
+from .mmr import mmr_order
 
 
 @dataclass
@@ -38,64 +53,157 @@ class FitFactors:
     tag_nudge: float = 0.0
     note_nudge: float = 0.0
     history_adj: float = 0.0
+    cf: float = 0.0
+
+
+@dataclass(frozen=True)
+class PrefTables:
+    """Onboarding preferences compiled once per request into flat lookups."""
+    ep_length_max: int | None
+    seasons_max: int | None
+    avoid_cliffhangers: bool
+    avoid_dnf: bool
+    creators_like: int  # interned creator bitsets (vocab.py)
+    creators_dislike: int
+    # Active mood/pacing knobs in evaluation order: (genre mask, flag mask, min_ep_len, max_ep_len, delta).
+    # A rule fires when the episode length is in range and, if it names any tags, one matches.
+    mood_rules: tuple[tuple[int, int, int, int, float], ...]
+
+
+_ANY_LEN = (0, 10**6)
+_FLAG_CLIFFHANGER = VOCAB.intern("flag", ["cliffhanger"])
+_WARN_CLIFFHANGER = VOCAB.intern("warning", ["cliffhanger"])
+_FLAG_SLOW = VOCAB.intern("flag", ["slow"])
+
+
+def _compile_pref(pref: dict) -> PrefTables:
+    cons = pref.get("constraints") or {}
+    mood = pref.get("mood") or {}
+    humor = int(mood.get("humor", 2)); optimism = int(mood.get("optimism", 2)); tone = int(mood.get("tone", 2))
+    pacing = int(mood.get("pacing", 2)); complexity = int(mood.get("complexity", 2))
+    gm = lambda *names: VOCAB.intern("genre", names)  # noqa: E731
+    fm = lambda *names: VOCAB.intern("flag", names)  # noqa: E731
+    none = 0
+    comedy = (gm("comedy"), fm("funny"))
+    prestige = (gm("prestige", "mystery"), none)
+    rules: list[tuple[int, int, int, int, float]] = []
+    if humor >= 3:
+        rules.append((*comedy, *_ANY_LEN, 0.1))
+    if humor <= 1:
+        rules.append((*comedy, *_ANY_LEN, -0.05))
+    if optimism >= 3:
+        rules.append((gm("optimistic"), fm("optimistic", "hopeful"), *_ANY_LEN, 0.1))
+    if optimism <= 1:
+        rules.append((gm("optimistic"), fm("hopeful"), *_ANY_LEN, -0.05))
+    if tone >= 3:
+        rules.append((gm("cozy"), fm("warm"), *_ANY_LEN, 0.08))
+    # pacing: slow preference favors longer episodes; fast favors shorter
+    if pacing <= 1:
+        rules.append((none, none, 40, _ANY_LEN[1], 0.08))
+    if pacing >= 3:
+        rules.append((none, none, 0, 35, 0.08))
+    if complexity >= 3:
+        rules.append((*prestige, *_ANY_LEN, 0.06))
+    if complexity <= 1:
+        rules.append((*prestige, *_ANY_LEN, -0.06))
+    return PrefTables(
+        ep_length_max=int(cons["ep_length_max"]) if cons.get("ep_length_max") is not None else None,
+        seasons_max=int(cons["seasons_max"]) if cons.get("seasons_max") is not None else None,
+        avoid_cliffhangers=bool(cons.get("avoid_cliffhangers")),
+        avoid_dnf=bool(cons.get("avoid_dnf")),
+        creators_like=VOCAB.mask("creator", pref.get("creators_like") or []),
+        creators_dislike=VOCAB.mask("creator", pref.get("creators_dislike") or []),
+        mood_rules=tuple(rules),
+    )
+
+
+@dataclass(frozen=True)
+class ScoringContext:
+    """Per-request scoring invariants, built once before the candidate loop so that
+    per-candidate work is feature lookups and arithmetic."""
+    intent: str
+    seed: int | None
+    liked_tag_mask: int  # flag bitset of tags liked across the selected profiles
+    note_nudge: float
+    rating_prior: dict[str, float]  # show_id -> prior summed across the selected profiles
+    history_recent: HistoryRecent | None
+    tag_like_bonus: float
+    history_adj_boost: float
+    pref: PrefTables | None
+    jitter: dict[str, float]  # show_id -> seeded tiebreak jitter, from the catalog's table
+    cf: dict[str, float]  # show_id -> weighted item-item CF affinity for the selected profiles
+
+    @classmethod
+    def build(
+        cls,
+        *,
+        intent: str,
+        seed: int | None,
+        liked_tags_by_profile: dict[int, set[str]],
+        last_note_by_profile: dict[int, str],
+        rating_map_by_profile: dict[int, dict[str, int]],
+        history_recent: HistoryRecent | None,
+        pref: dict | None,
+        candidate_ids: list[str] | None = None,
+        artifact=None,
+        cf_model=None,
+    ) -> "ScoringContext":
+        # Notes keywords: one scan of the aggregated notes per request
+        nt = "\n".join([last_note_by_profile.get(pid, "") for pid in last_note_by_profile.keys()]).lower()
+        note = 0.0
+        for k, w in (settings.note_keyword_weights or {}).items():
+            if k in nt:
+                note += float(w)
+        note = max(min(note, 0.25), -0.35)
+        # Ratings priors per show, accumulated in profile order
+        weights = {2: settings.rating_weight_very_good, 1: settings.rating_weight_acceptable, 0: -settings.rating_penalty_bad}
+        prior: dict[str, float] = {}
+        for pid in rating_map_by_profile.keys():
+            for sid, pri in rating_map_by_profile[pid].items():
+                prior[sid] = prior.get(sid, 0.0) + weights.get(int(pri), 0.0)
+        return cls(
+            intent=intent,
+            seed=seed,
+            liked_tag_mask=VOCAB.mask("flag", set().union(*liked_tags_by_profile.values())) if liked_tags_by_profile else 0,
+            note_nudge=note,
+            rating_prior=prior,
+            history_recent=history_recent,
+            tag_like_bonus=settings.tag_like_bonus,
+            history_adj_boost=settings.history_adj_boost,
+            pref=_compile_pref(pref) if pref else None,
+            jitter=jitter_for(artifact, seed, candidate_ids or []),
+            cf={sid: settings.cf_weight * v for sid, v in cf_model.scores(profile_weights(rating_map_by_profile)).items()} if cf_model is not None else {},
+        )
 
 
-def _stable_hash01(item_id: str, seed: int | None) -> float:
-    h = blake2b(digest_size=8)
-    h.update(item_id.encode())
-    if seed is not None:
-        h.update(str(seed).encode())
-    n = int.from_bytes(h.digest(), "big")
-    return (n % 10_000_000) / 10_000_000.0
-
-
-def _apply_feedback(
-    *,
-    show: Show,
-    base_score: float,
-    seed: int | None,
-    liked_tags: set[str],
-    notes_text: str,
-    rating_priors: list[int],
-    history_recent: HistoryRecent | None,
-    intent: str,
-) -> tuple[float, FitFactors]:
+def _apply_feedback(*, show: Show, base_score: float, ctx: ScoringContext) -> tuple[float, FitFactors]:
     ff = FitFactors(base=base_score)
 
     # 1) Ratings prior for this item (across selected profiles)
-    for pri in rating_priors:
-        if pri == 2:
-            ff.rating_prior += settings.rating_weight_very_good
-        elif pri == 1:
-            ff.rating_prior += settings.rating_weight_acceptable
-        elif pri == 0:
-            ff.rating_prior -= settings.rating_penalty_bad
+    ff.rating_prior = ctx.rating_prior.get(str(show.id), 0.0)
 
     # 2) Tags: treat show.flags as lightweight tags
-    itags = set(show.flags or [])
-    ff.tag_nudge += len(liked_tags & itags) * settings.tag_like_bonus
+    if ctx.liked_tag_mask:
+        ff.tag_nudge += overlap(ctx.liked_tag_mask, _bits(show).flags) * ctx.tag_like_bonus
     # No explicit disliked tags in current model; keep at zero unless added later
 
-    # 3) Notes keywords
-    nt = (notes_text or "").lower()
-    for k, w in (settings.note_keyword_weights or {}).items():
-        if k in nt:
-            ff.note_nudge += float(w)
-    ff.note_nudge = max(min(ff.note_nudge, 0.25), -0.35)
+    # 3) Notes keywords (request-level)
+    ff.note_nudge = ctx.note_nudge
 
     # 4) Serializd adjacency (no-op unless provided)
-    if history_recent and history_recent.is_adjacent(show):
-        ff.history_adj += settings.history_adj_boost
-    # If we ever track completion + rewatch intent, we could subtract here
-    if intent != "rewatch":
-        # nothing to subtract without explicit completion state
-        pass
+    if ctx.history_recent and ctx.history_recent.adjacent_bits(_bits(show)):
+        ff.history_adj += ctx.history_adj_boost
+
+    # 5) Item-item CF: shows co-rated with this request's ratings
+    ff.cf = ctx.cf.get(str(show.id), 0.0)
 
     # Compose multiplicatively
-    multiplier = (1.0 + ff.rating_prior) * (1.0 + ff.tag_nudge + ff.note_nudge + ff.history_adj)
+    multiplier = (1.0 + ff.rating_prior) * (1.0 + ff.tag_nudge + ff.note_nudge + ff.history_adj + ff.cf)
     score = max(0.0, base_score * multiplier)
     # Deterministic micro-jitter for stable tiebreaks
-    score += 1e-6 * _stable_hash01(str(show.id), seed)
+    sid = str(show.id)
+    j = ctx.jitter.get(sid)
+    score += 1e-6 * (j if j is not None else _stable_hash01(sid, ctx.seed))
     return score, ff
 
 
@@ -204,16 +312,35 @@ def _episode_length(s: Show) -> int:
     return int((s.metadata or {}).get("episode_length", 60))
 
 
-def _familiarity(show: Show, liked_genres: set[str], liked_creators: set[str]) -> float:
-    g_overlap = len(_genres(show) & liked_genres)
-    c_overlap = len(_creators(show) & liked_creators)
+def _bits(s: Show) -> ShowBits:
+    """Interned genre/creator/flag/warning bitsets for a show, memoized per id and update."""
+    updated = getattr(s, "updated_at", None)
+    return VOCAB.show_bits(
+        (str(s.id), updated) if updated is not None else None,
+        lambda: (_genres(s), _creators(s), s.flags or [], s.warnings or []),
+    )
+
+
+def _as_mask(kind: str, tags: set[str] | int) -> int:
+    """Accept a tag set or a mask already interned for the request."""
+    return tags if isinstance(tags, int) else VOCAB.mask(kind, tags)
+
+
+def _banned_mask(boundaries: dict) -> int:
+    return VOCAB.mask("warning", [k for k, v in (boundaries or {}).items() if v])
+
+
+def _familiarity(show: Show, liked_genres: set[str] | int, liked_creators: set[str] | int) -> float:
+    b = _bits(show)
+    g_overlap = overlap(b.genres, _as_mask("genre", liked_genres))
+    c_overlap = overlap(b.creators, _as_mask("creator", liked_creators))
     return min(1.0, 0.15 * g_overlap + 0.3 * c_overlap)
 
 
-def _boundary_violates(show: Show, boundaries: dict) -> bool:
-    warns = set(show.warnings or [])
-    banned = {k for k, v in (boundaries or {}).items() if v}
-    return len(warns & banned) > 0
+def _boundary_violates(show: Show, boundaries: dict | int) -> bool:
+    b = _bits(show)  # interns the show's warnings before the boundary lookup
+    banned = boundaries if isinstance(boundaries, int) else _banned_mask(boundaries)
+    return bool(b.warnings & banned)
 
 
 def _availability(session: Session, show: Show) -> list[Availability]:
@@ -248,18 +375,19 @@ def _age_rating(s: Show) -> int | None:
 def _score_show(
     show: Show,
     intent: str,
-    liked_genres: set[str],
-    liked_creators: set[str],
+    liked_genres: set[str] | int,
+    liked_creators: set[str] | int,
     vec_sim: float | None = None,
     pref: dict | None = None,
 ) -> Tuple[float, list[str], float]:
-    g = _genres(show)
-    c = _creators(show)
+    b = _bits(show)
+    liked_genres = _as_mask("genre", liked_genres)
+    liked_creators = _as_mask("creator", liked_creators)
     why: list[str] = []
 
     sim = 0.0
-    g_overlap = len(g & liked_genres)
-    c_overlap = len(c & liked_creators)
+    g_overlap = overlap(b.genres, liked_genres)
+    c_overlap = overlap(b.creators, liked_creators)
     sim += 0.2 * g_overlap + 0.5 * c_overlap
     if vec_sim is not None:
         sim += 0.6 * vec_sim  # weight for vector similarity
@@ -288,70 +416,46 @@ def _score_show(
         # surprise slightly rewards novelty
         context_bonus += 0.2
 
-    # Apply onboarding preferences if provided
+    # Apply onboarding preferences if provided (raw dict, or tables compiled per request)
     if pref:
+        pt = pref if isinstance(pref, PrefTables) else _compile_pref(pref)
         el = _episode_length(show)
         seasons = int((show.metadata or {}).get("seasons", 1) or 1)
-        cons = pref.get("constraints") or {}
-        if cons.get("ep_length_max") is not None:
-            maxlen = int(cons.get("ep_length_max"))
-            if el <= maxlen:
+        if pt.ep_length_max is not None:
+            if el <= pt.ep_length_max:
                 context_bonus += 0.1
             else:
-                over = max(0, el - maxlen)
+                over = max(0, el - pt.ep_length_max)
                 penalty = min(0.3, 0.01 * over)
                 context_bonus -= penalty
                 why.append("Longer than your preferred episode length")
-        if cons.get("seasons_max") is not None:
-            smax = int(cons.get("seasons_max"))
-            if seasons <= smax:
+        if pt.seasons_max is not None:
+            if seasons <= pt.seasons_max:
                 context_bonus += 0.05
             else:
-                over_s = max(0, seasons - smax)
+                over_s = max(0, seasons - pt.seasons_max)
                 penalty = min(0.25, 0.05 * over_s)
                 context_bonus -= penalty
                 why.append("More seasons than you prefer")
-        if cons.get("avoid_cliffhangers") and ("cliffhanger" in (show.flags or []) or "cliffhanger" in (show.warnings or [])):
+        if pt.avoid_cliffhangers and (b.flags & _FLAG_CLIFFHANGER or b.warnings & _WARN_CLIFFHANGER):
             context_bonus -= 0.2
-        if cons.get("avoid_dnf"):
+        if pt.avoid_dnf:
             if seasons >= 6:
                 context_bonus -= 0.1
             if el >= 55:
                 context_bonus -= 0.1
-            if "slow" in (show.flags or []):
+            if b.flags & _FLAG_SLOW:
                 context_bonus -= 0.08
         # creators like/dislike
-        clike = set(pref.get("creators_like") or [])
-        cdis = set(pref.get("creators_dislike") or [])
-        if _creators(show) & clike:
+        if b.creators & pt.creators_like:
             context_bonus += 0.2
             why.append("From a creator you like")
-        if _creators(show) & cdis:
+        if b.creators & pt.creators_dislike:
             context_bonus -= 0.3
         # mood knobs
-        mood = pref.get("mood") or {}
-        humor = int(mood.get("humor", 2)); optimism = int(mood.get("optimism", 2)); tone = int(mood.get("tone", 2))
-        pacing = int(mood.get("pacing", 2)); complexity = int(mood.get("complexity", 2))
-        genres = _genres(show); flags = set(show.flags or [])
-        if humor >= 3 and ("comedy" in genres or "funny" in flags):
-            context_bonus += 0.1
-        if humor <= 1 and ("comedy" in genres or "funny" in flags):
-            context_bonus -= 0.05
-        if optimism >= 3 and ("optimistic" in genres or "optimistic" in flags or "hopeful" in flags):
-            context_bonus += 0.1
-        if optimism <= 1 and ("optimistic" in genres or "hopeful" in flags):
-            context_bonus -= 0.05
-        if tone >= 3 and ("cozy" in genres or "warm" in flags):
-            context_bonus += 0.08
-        # pacing: slow preference favors longer episodes; fast favors shorter
-        if pacing <= 1 and el >= 40:
-            context_bonus += 0.08
-        if pacing >= 3 and el <= 35:
-            context_bonus += 0.08
-        if complexity >= 3 and ("prestige" in genres or "mystery" in genres):
-            context_bonus += 0.06
-        if complexity <= 1 and ("prestige" in genres or "mystery" in genres):
-            context_bonus -= 0.06
+        for rg, rf, lo, hi, delta in pt.mood_rules:
+            if lo <= el <= hi and (not (rg or rf) or (b.genres & rg) or (b.flags & rf)):
+                context_bonus += delta
 
     avail_bonus = 0.1  # AU avail assumed by presence
 
@@ -365,6 +469,37 @@ def _score_show(
     return score, why, novelty
 
 
+# Extra items selected per pool beyond what picking and padding can consume.
+_POOL_RESERVE = 4
+
+
+def _comfort_key(x: Scored) -> tuple:
+    return (-x.score, x.novelty, str(x.show.id))
+
+
+def _discovery_key(x: Scored) -> tuple:
+    return (-x.score, -x.novelty, str(x.show.id))
+
+
+def _top_k(items: list[Scored], k: int, key) -> list[Scored]:
+    """Same as sorted(items, key=key)[:k]; heapq.nsmallest keeps the order of equal keys."""
+    if k >= len(items):
+        return sorted(items, key=key)
+    return heapq.nsmallest(k, items, key=key)
+
+
+def _diversify(pool: list[Scored], k: int, lam: float, index) -> list[Scored]:
+    """MMR over the pool's rows of the catalog embedding matrix (unknown shows: zero vectors)."""
+    if len(pool) <= 1:
+        return pool
+    vecs = np.zeros((len(pool), index.mat.shape[1]), dtype=np.float32)
+    for i, x in enumerate(pool):
+        r = index.row(x.show.id)
+        if r is not None:
+            vecs[i] = index.mat[r]
+    return mmr_order(pool, [x.score for x in pool], vecs, k, lam)
+
+
 def _label(score: float) -> str:
     if score >= 1.0:
         return "VERY GOOD"
@@ -407,122 +542,113 @@ def recommendations_for_profiles(
             rating_map_by_profile.setdefault(p.id, {})[str(r.show_id)] = int(r.primary)
         liked_by_profile[p.id] = (gset, cset)
 
-    # Candidate pool (safe) and also track boundary violators for substitution
-    all_shows = session.exec(select(Show)).all()
-    safe_candidates: list[Show] = []
-    violators: list[Show] = []
     # Effective age limit: strictest across selected profiles
     eff_age_limit = None
     ages = [p.age_limit for p in profiles if getattr(p, 'age_limit', None) is not None]
     if ages:
         eff_age_limit = min(int(a) for a in ages if a is not None)
+    # Candidate pool (safe) and also track boundary violators for substitution. Availability,
+    # the short_tonight length cutoff, age gating and boundaries are applied by the
+    # eligibility index (or in Postgres for large catalogs); only surviving shows are loaded.
+    all_shows, violator_ids = eligible_shows(session, intent, eff_age_limit, union_boundaries)
+    safe_candidates: list[Show] = []
+    violators: list[Show] = []
     # If SQL vector is enabled and we have a profile, pre-order candidates by ANN
     neighbor_ids: list[str] = []
-    # Auto-enable SQL ANN when we have enough data, or via flag
+    # Auto-enable SQL ANN when we have enough data, or via flag. Capability comes from the
+    # cached vector state; a profile without a stored vector just gets no ANN rows back.
     use_sql_vec_flag = os.getenv("USE_SQL_VECTOR", "false").lower() == "true"
-    use_sql_vec_auto = False
-    if profiles:
-        try:
-            # require: >100 shows with vectors and profile vector present
-            show_vec_count = session.exec(text("SELECT COUNT(*) FROM embeddings_show WHERE emb_v IS NOT NULL")).first()[0]
-            pid = profiles[0].id
-            prof_vec_ok = session.exec(text("SELECT 1 FROM embeddings_profile WHERE profile_id = :pid AND emb_v IS NOT NULL"), {"pid": pid}).first()
-            use_sql_vec_auto = (show_vec_count or 0) >= 100 and prof_vec_ok is not None
-        except Exception:
-            use_sql_vec_auto = False
+    # All embedding reads are pinned to the active generation (blue-green rebuilds)
+    gen = active_generation(session)
+    use_sql_vec_auto = vector_state(session).sql_ann_ready
     use_sql_vec = (use_sql_vec_flag or use_sql_vec_auto) and bool(profiles)
     if use_sql_vec:
         try:
             pid = profiles[0].id
+            # Transaction-local probes / ef_search as tuned for the active index
+            guc = ann_search_setting(session)
+            if guc is not None:
+                session.exec(text("SELECT set_config(:name, :val, true)"), params={"name": guc[0], "val": str(guc[1])})
             rows = session.exec(text(
                 """
                 SELECT es.show_id
                 FROM embeddings_show es, embeddings_profile ep
-                WHERE ep.profile_id = :pid AND es.emb_v IS NOT NULL AND ep.emb_v IS NOT NULL
+                WHERE ep.profile_id = :pid AND ep.generation = :gen AND es.generation = :gen
+                  AND es.emb_v IS NOT NULL AND ep.emb_v IS NOT NULL
                 ORDER BY es.emb_v <-> ep.emb_v
                 LIMIT 400
                 """
-            ), {"pid": pid}).all()
+            ), params={"pid": pid, "gen": gen}).all()
             neighbor_ids = [str(r[0]) for r in rows]
         except Exception:
             neighbor_ids = []
+    # No pgvector (SQLite default): same neighbour pre-ordering from the in-process index
+    local_idx = None
+    if not neighbor_ids and profiles:
+        art = current_artifact(session)
+        local_idx = art.index if art is not None else None
+        if local_idx is not None:
+            try:
+                row = session.exec(text("SELECT emb FROM embeddings_profile WHERE profile_id = :pid AND generation = :gen"), params={"pid": profiles[0].id, "gen": gen}).first()
+                if row and row[0]:
+                    neighbor_ids = [sid for sid, _ in local_idx.search(row[0], 400)]
+            except Exception:
+                neighbor_ids = []
     # Deterministic candidate ordering with vector-neighbor priority then ID tiebreaker
     if neighbor_ids:
-        ordered = sorted(
-            all_shows,
-            key=lambda s: (
-                (neighbor_ids.index(str(s.id)) if str(s.id) in neighbor_ids else 10**9),
-                str(s.id),
-            ),
-        )
+        rank = {sid: i for i, sid in reversed(list(enumerate(neighbor_ids)))}
+        ordered = sorted(all_shows, key=lambda s: (rank.get(str(s.id), 10**9), str(s.id)))
     else:
         ordered = sorted(all_shows, key=lambda s: str(s.id))
 
     for s in ordered:
-        if len(_availability(session, s)) == 0:
-            continue
-        if intent == "short_tonight" and _episode_length(s) > 35:
-            # still track as violator of context to allow short substitutes
-            continue
-        # Age/content gating: exclude items above effective age limit
-        if eff_age_limit is not None:
-            ar = _age_rating(s)
-            if ar is not None and ar > eff_age_limit:
-                continue
-        if _boundary_violates(s, union_boundaries):
+        if str(s.id) in violator_ids:
             violators.append(s)
-            continue
-        safe_candidates.append(s)
+        else:
+            safe_candidates.append(s)
 
     # Score all candidates first
     scored_all: list[Scored] = []
     # For initial split, approximate using aggregate likes
     agg_g = set().union(*[gc[0] for gc in liked_by_profile.values()]) if liked_by_profile else set()
     agg_c = set().union(*[gc[1] for gc in liked_by_profile.values()]) if liked_by_profile else set()
+    agg_gm = VOCAB.intern("genre", agg_g)
+    agg_cm = VOCAB.intern("creator", agg_c)
 
-    # Optional: pull profile vector (first profile) and show vectors
+    # Optional: pull profile vector (first profile). Show vectors are rows of the mapped
+    # catalog artifact; the whole generation is only loaded from SQL when there is none.
     profile_vec: list[float] | None = None
     show_vecs: dict[str, list[float]] = {}
+    vec_art = current_artifact(session)
     try:
         if profiles:
             pid = profiles[0].id
-            row = session.exec(text("SELECT emb FROM embeddings_profile WHERE profile_id = :pid"), {"pid": pid}).first()
+            row = session.exec(text("SELECT emb FROM embeddings_profile WHERE profile_id = :pid AND generation = :gen"), params={"pid": pid, "gen": gen}).first()
             if row and row[0]:
                 profile_vec = row[0]
-        rows = session.exec(text("SELECT show_id, emb FROM embeddings_show")).all()
-        for r in rows:
-            if r[1]:
-                show_vecs[str(r[0])] = r[1]
+        if vec_art is None:
+            rows = session.exec(text("SELECT show_id, emb FROM embeddings_show WHERE generation = :gen"), params={"gen": gen}).all()
+            for r in rows:
+                if r[1]:
+                    show_vecs[str(r[0])] = r[1]
     except Exception:
         profile_vec = None
         show_vecs = {}
 
-    # Fallback: compute ephemeral vectors if missing
-    def _tokens_from_meta(meta: dict | None) -> list[str]:
-        if not meta:
-            return []
-        toks: list[str] = []
-        for g in meta.get("genres", []) or []:
-            toks.append(f"genre:{g}")
-        for c in meta.get("creators", []) or []:
-            toks.append(f"creator:{c}")
-        el = meta.get("episode_length")
-        if el is not None:
-            bucket = 0 if el <= 20 else 1 if el <= 35 else 2 if el <= 45 else 3
-            toks.append(f"len:{bucket}")
-        region = meta.get("region")
-        if region:
-            toks.append(f"region:{region}")
-        return toks
+    def _show_vec(show_id) -> list[float] | None:
+        if vec_art is not None:
+            v = vec_art.index.vector(show_id)
+            return None if v is None else v.tolist()
+        return show_vecs.get(str(show_id))
 
+    # Fallback: compute ephemeral vectors if missing (token vectors are memoized process-wide)
     def _vec(toklist: list[str]) -> list[float]:
-        import hashlib, math
+        import math
         dim = 384
         out = [0.0] * dim
         for t in toklist:
-            h = hashlib.sha256(t.encode()).digest()
-            for i in range(dim):
-                out[i] += ((h[i % len(h)] / 255.0) * 2.0 - 1.0)
+            for i, x in enumerate(token_hash_raw(t, dim)):
+                out[i] += x
         norm = math.sqrt(sum(x * x for x in out)) or 1.0
         return [x / norm for x in out]
 
@@ -544,12 +670,19 @@ def recommendations_for_profiles(
         if like_id:
             anchor_show = session.get(Show, like_id)
             if anchor_show:
-                sv = show_vecs.get(str(anchor_show.id))
+                sv = _show_vec(anchor_show.id)
                 if sv:
                     anchor_vec = sv
     except Exception:
         anchor_show = None
         anchor_vec = None
+    # Anchor similarity is a lookup into the precomputed item-to-item neighbours
+    anchor_neighbors: dict[str, float] = {}
+    anchor_cap: float | None = None
+    if anchor_show is not None:
+        anchor_neighbors = dict(neighbors_for(session, anchor_show.id))
+        # Shows outside the anchor's top-K cannot outrank its K-th neighbour
+        anchor_cap = min(anchor_neighbors.values()) if anchor_neighbors else None
     # Load onboarding prefs per profile and aggregate
     from .models import Event as EventModel  # type: ignore
     prefs_per_profile: dict[int, dict] = {}
@@ -592,71 +725,68 @@ def recommendations_for_profiles(
         if avoid_dnf:
             cons_obj["avoid_dnf"] = True
         agg_pref = {"creators_like": list(likes), "creators_dislike": list(dislikes), "mood": mood_avg, "constraints": cons_obj}
+    # No stored profile embedding: build the ephemeral profile vector once per request from
+    # the first profile's ratings (one joined query), not once per candidate.
+    eph_pvec: list[float] | None = None
+    if profile_vec is None and profiles:
+        prates = session.exec(
+            select(Rating.primary, Show.meta).join(Show, Show.id == Rating.show_id).where(Rating.profile_id == profiles[0].id)
+        ).all()
+        ptoks: list[str] = []
+        for primary, meta in prates:
+            w = 2 if primary == 2 else (1 if primary == 1 else -1)
+            ptoks.extend(_tokens_from_metadata(meta) * max(1, abs(w)))
+        eph_pvec = _vec(ptoks) if ptoks else None
+    # Request-scoped scoring invariants: aggregated tags, note nudge, rating priors,
+    # settings weights, compiled preferences and recent-history adjacency
+    history_recent_obj = None
+    if safe_candidates:
+        try:
+            from .history_adj import recent_for_profiles as _recent
+            history_recent_obj = _recent(session, profiles)
+        except Exception:
+            history_recent_obj = None
+    # Intern the candidates' tags first: request tags and preferences are only looked up
+    for s in safe_candidates:
+        _bits(s)
+    ctx = ScoringContext.build(
+        intent=intent,
+        seed=seed,
+        liked_tags_by_profile=liked_tags_by_profile,
+        last_note_by_profile=last_note_by_profile,
+        rating_map_by_profile=rating_map_by_profile,
+        history_recent=history_recent_obj,
+        pref=agg_pref,
+        candidate_ids=[str(s.id) for s in safe_candidates],
+        artifact=vec_art if safe_candidates else None,
+        cf_model=current_cf_model() if safe_candidates else None,
+    )
     for s in safe_candidates:
         vec_sim = None
         if profile_vec is not None:
-            sv = show_vecs.get(str(s.id))
+            sv = _show_vec(s.id)
             if sv:
                 vec_sim = (1.0 + _cos(profile_vec, sv)) / 2.0  # scale -1..1 to 0..1
-        elif profiles:
-            # compute ephemeral vectors
-            # profile: aggregate liked ratings for first profile
-            p0 = profiles[0]
-            prates = session.exec(select(Rating).where(Rating.profile_id == p0.id)).all()
-            ptoks: list[str] = []
-            for r in prates:
-                sh = session.get(Show, r.show_id)
-                if not sh:
-                    continue
-                w = 2 if r.primary == 2 else (1 if r.primary == 1 else -1)
-                ptoks.extend(_tokens_from_meta(sh.metadata) * max(1, abs(w)))
-            pvec = _vec(ptoks) if ptoks else None
-            if pvec:
-                svec = _vec(_tokens_from_meta(s.metadata))
-                vec_sim = (1.0 + _cos(pvec, svec)) / 2.0
-        sc, why, nov = _score_show(s, intent, agg_g, agg_c, vec_sim, pref=agg_pref)
+        elif eph_pvec is not None:
+            svec = _vec(_tokens_from_metadata(s.meta))
+            vec_sim = (1.0 + _cos(eph_pvec, svec)) / 2.0
+        sc, why, nov = _score_show(s, intent, agg_gm, agg_cm, vec_sim, pref=ctx.pref)
         # Apply feedback nudges + deterministic micro-jitter
-        # Aggregate liked tags, notes, and priors across the selected profiles
-        agg_tags = set().union(*liked_tags_by_profile.values()) if liked_tags_by_profile else set()
-        notes_text = "\n".join([last_note_by_profile.get(pid, "") for pid in last_note_by_profile.keys()])
-        priors = []
-        for pid in rating_map_by_profile.keys():
-            pri = rating_map_by_profile[pid].get(str(s.id))
-            if pri is not None:
-                priors.append(int(pri))
-        # Build recent history adjacency once per request (first iteration triggers; reuse closure variable)
-        try:
-            history_recent_obj
-        except NameError:
-            try:
-                from .history_adj import recent_for_profiles as _recent
-                history_recent_obj = _recent(session, profiles)
-            except Exception:
-                history_recent_obj = None
+        sc, _ff = _apply_feedback(show=s, base_score=sc, ctx=ctx)
 
-        sc, _ff = _apply_feedback(
-            show=s,
-            base_score=sc,
-            seed=seed,
-            liked_tags=agg_tags,
-            notes_text=notes_text,
-            rating_priors=priors,
-            history_recent=history_recent_obj,
-            intent=intent,
-        )
-        
         # Anchor similarity bonus
         if anchor_show and anchor_show.id != s.id:
-            bonus = 0.0
-            if anchor_vec is not None and str(s.id) in show_vecs:
-                sim = (1.0 + _cos(anchor_vec, show_vecs[str(s.id)])) / 2.0
-                bonus += 0.25 * sim
-            else:
-                # heuristic: genres overlap and episode length proximity
-                g = len(_genres(s) & _genres(anchor_show))
-                dl = abs(_episode_length(s) - _episode_length(anchor_show))
-                bonus += max(0.0, min(0.25, 0.05 * g - 0.005 * dl))
-            sc += bonus
+            sim = anchor_neighbors.get(str(s.id))
+            if sim is None:
+                # Same blend as the precomputed neighbours (genres overlap and episode length
+                # proximity, plus embedding similarity when both vectors are loaded)
+                sv = _show_vec(s.id) if anchor_vec is not None else None
+                cos = _cos(anchor_vec, sv) if sv else None
+                g = overlap(_bits(s).genres, _bits(anchor_show).genres)
+                sim = neighbor_score(cos, g, _episode_length(s) - _episode_length(anchor_show))
+                if anchor_cap is not None:
+                    sim = min(sim, anchor_cap)
+            sc += 0.25 * sim
             why = ([f"Similar to {anchor_show.title}"] + why)[:3]
         scored_all.append(Scored(show=s, score=sc, why=why, novelty=nov, vec_sim=vec_sim, factors=_ff))
 
@@ -664,9 +794,20 @@ def recommendations_for_profiles(
     novelty_threshold = 0.6 if intent != "surprise" else 0.4
     comfort = [x for x in scored_all if x.novelty <= novelty_threshold]
     discovery = [x for x in scored_all if x.novelty > novelty_threshold]
-    # Deterministic sort with explicit tiebreakers
-    comfort.sort(key=lambda x: (-x.score, x.novelty, str(x.show.id)))
-    discovery.sort(key=lambda x: (-x.score, -x.novelty, str(x.show.id)))
+    # Deterministic order with explicit tiebreakers. At most `count` items are picked and at
+    # most `count` more padded from either pool, so only the top 2*count are selected.
+    pool_k = 2 * count + _POOL_RESERVE
+    if settings.mmr_enabled:
+        pool_k = max(pool_k, settings.mmr_pool)
+    comfort = _top_k(comfort, pool_k, _comfort_key)
+    discovery = _top_k(discovery, pool_k, _discovery_key)
+    # Optional MMR stage: the head of each pool is re-ranked against embedding similarity
+    if settings.mmr_enabled:
+        art = current_artifact(session)
+        if art is not None and len(art.index):
+            lam = float(settings.mmr_lambda.get(intent, settings.mmr_lambda.get("default", 0.7)))
+            comfort = _diversify(comfort, count, lam, art.index)
+            discovery = _diversify(discovery, count, lam, art.index)
 
     # Targets per intent
     picked: list[Scored] = []
@@ -692,14 +833,17 @@ def recommendations_for_profiles(
     family_meta: dict | None = None
     if len(profiles) > 1:
         # Build per-profile liked sets once
-        per_profile_gc = {p.id: liked_by_profile.get(p.id, (set(), set())) for p in profiles}
+        per_profile_gc = {
+            pid: (VOCAB.intern("genre", gset), VOCAB.intern("creator", cset))
+            for pid, (gset, cset) in liked_by_profile.items()
+        }
 
         # Per-candidate per-profile score map
         per_scores_map: dict[str, list[float]] = {}
         for sc in scored_all:
             scores: list[float] = []
             for p in profiles:
-                gset, cset = per_profile_gc.get(p.id, (set(), set()))
+                gset, cset = per_profile_gc.get(p.id, (0, 0))
                 ps, _, _ = _score_show(sc.show, intent, gset, cset)
                 scores.append(ps)
             per_scores_map[str(sc.show.id)] = scores
@@ -847,8 +991,9 @@ def recommendations_for_profiles(
     if len(picked) < count:
         remaining = count - len(picked)
         # Fill from whichever pool still has items, deterministically
-        extra_c = [x for x in comfort if x not in picked]
-        extra_d = [x for x in discovery if x not in picked]
+        picked_ids = {str(x.show.id) for x in picked}
+        extra_c = [x for x in comfort if str(x.show.id) not in picked_ids]
+        extra_d = [x for x in discovery if str(x.show.id) not in picked_ids]
         # For non-comfort intents, prefer discovery first to maintain variety
         if intent != "comfort" and extra_d:
             take = min(remaining, len(extra_d))
@@ -866,23 +1011,29 @@ def recommendations_for_profiles(
     if violators:
         scored_violators: list[Tuple[Show, float]] = []
         for v in violators:
-            sv, _, _ = _score_show(v, intent, agg_g, agg_c)
+            sv, _, _ = _score_show(v, intent, agg_gm, agg_cm)
             scored_violators.append((v, sv))
-        scored_violators.sort(key=lambda t: t[1], reverse=True)
-
-        def sim(a: Show, b: Show) -> float:
-            g = len(_genres(a) & _genres(b))
-            dl = abs(_episode_length(a) - _episode_length(b))
-            return g - 0.02 * dl
-
-        for v, _ in scored_violators[:2]:
-            cands = sorted(
-                [s for s in safe_candidates if s not in [sc.show for sc in picked] and s not in [sub.show for sub in substitutes]],
-                key=lambda s: sim(v, s),
-                reverse=True,
-            )
-            for s in cands[:1]:  # one alt per violator
-                scv, why, nov = _score_show(s, intent, agg_g, agg_c)
+        scored_violators = heapq.nlargest(2, scored_violators, key=lambda t: t[1])
+
+        pos_by_id = {str(c.id): i for i, c in enumerate(safe_candidates)}
+        taken = {pos_by_id[str(sc.show.id)] for sc in picked if str(sc.show.id) in pos_by_id}
+        sub_index = None
+        for v, _ in scored_violators:
+            # one alt per violator: first safe candidate with the highest similarity, looked for
+            # among its precomputed neighbours; the index over every safe candidate is built
+            # only when none of them is eligible
+            vg, vl = _bits(v).genres, _episode_length(v)
+            near = {pos_by_id[sid] for sid, _ in neighbors_for(session, v.id) if sid in pos_by_id} - taken
+            if near:
+                i = best_among(vg, vl, ((p, _bits(safe_candidates[p]).genres, _episode_length(safe_candidates[p])) for p in near))
+            else:
+                if sub_index is None:
+                    sub_index = SubstituteIndex([(_bits(c).genres, _episode_length(c)) for c in safe_candidates])
+                i = sub_index.best(vg, vl, taken)
+            if i is not None:
+                taken.add(i)
+                s = safe_candidates[i]
+                scv, why, nov = _score_show(s, intent, agg_gm, agg_cm)
                 substitutes.append(Scored(show=s, score=scv + 0.05, why=["Boundary-safe alternative"] + why, novelty=nov, vec_sim=None))
 
     # Ensure up to 2 substitutes are present by replacing from the tail
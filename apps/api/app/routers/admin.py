@@ -5,7 +5,7 @@ from sqlmodel import Session, select
 
 from ..db import engine
 from ..models import Event
-from ..queue import get_queue
+from ..queue import get_queue, enqueue_admin_sync, ADMIN_TRIGGER_CHANNEL, QUEUE_HIGH, QUEUE_LOW
 from rq.registry import StartedJobRegistry, FinishedJobRegistry, FailedJobRegistry, DeferredJobRegistry
 import requests, json
 import os
@@ -44,20 +44,20 @@ def trigger_sync(payload: SyncPayload, authorization: str | None = Header(defaul
     if payload.source not in ("justwatch", "serializd"):
         raise HTTPException(status_code=400, detail="invalid source")
     kind = f"admin:sync:{payload.source}"
-    # Enqueue via RQ for immediate processing if available
+    dry_run = bool(payload.dry_run)
+    # Exactly one delivery path per trigger: RQ when Redis is up, else event row + NOTIFY
     try:
-        q = get_queue()
-        if q:
-            if payload.source == 'justwatch':
-                q.enqueue('tasks.sync_justwatch', kwargs={"dry_run": bool(payload.dry_run)})
-            elif payload.source == 'serializd':
-                q.enqueue('tasks.sync_serializd', kwargs={"dry_run": bool(payload.dry_run)})
+        if enqueue_admin_sync(payload.source, dry_run):
+            return {"ok": True, "queued": kind, "via": "queue"}
     except Exception:
         pass
     with Session(engine) as s:
-        s.add(Event(profile_id=0, kind=kind, payload={}))
+        s.add(Event(profile_id=0, kind=kind, payload={"dry_run": dry_run}))
+        if engine.dialect.name == "postgresql":
+            # Delivered on commit, so the listener always finds the row
+            s.exec(text("SELECT pg_notify(:channel, :kind)"), params={"channel": ADMIN_TRIGGER_CHANNEL, "kind": kind})
         s.commit()
-    return {"ok": True, "queued": kind}
+    return {"ok": True, "queued": kind, "via": "events"}
 
 
 @router.post("/admin/jobs/daily_refresh")
@@ -68,7 +68,7 @@ def trigger_daily_refresh(limit: int | None = None, region: str = "AU", dry_run:
     _require_admin(authorization)
     # Prefer queue when available
     try:
-        q = get_queue()
+        q = get_queue(QUEUE_LOW)
         if q and not dry_run:
             q.enqueue('tasks.daily_refresh_top_titles', kwargs={"region": region, "limit": limit, "dry_run": False})
             return {"ok": True, "queued": True}
@@ -86,23 +86,22 @@ def trigger_daily_refresh(limit: int | None = None, region: str = "AU", dry_run:
 @router.get("/admin/queue")
 def queue_status(authorization: str | None = Header(default=None)):
     _require_admin(authorization)
-    q = get_queue()
+    q = get_queue(QUEUE_HIGH)
     if not q:
         return {"ok": False, "error": "queue unavailable"}
     try:
-        started = StartedJobRegistry(queue=q)
-        finished = FinishedJobRegistry(queue=q)
-        failed = FailedJobRegistry(queue=q)
-        deferred = DeferredJobRegistry(queue=q)
+        queues = [x for x in (q, get_queue(QUEUE_LOW)) if x is not None]
+        regs = {"started": 0, "finished": 0, "failed": 0, "deferred": 0}
+        for x in queues:
+            regs["started"] += len(StartedJobRegistry(queue=x))
+            regs["finished"] += len(FinishedJobRegistry(queue=x))
+            regs["failed"] += len(FailedJobRegistry(queue=x))
+            regs["deferred"] += len(DeferredJobRegistry(queue=x))
         return {
             "ok": True,
             "queue": {"name": q.name, "count": q.count},
-            "registries": {
-                "started": len(started),
-                "finished": len(finished),
-                "failed": len(failed),
-                "deferred": len(deferred),
-            },
+            "queues": [{"name": x.name, "count": x.count} for x in queues],
+            "registries": regs,
         }
     except Exception as e:
         return {"ok": False, "error": str(e)}
@@ -111,11 +110,11 @@ def queue_status(authorization: str | None = Header(default=None)):
 @router.post("/admin/embeddings/rebuild")
 def enqueue_rebuild_embeddings(authorization: str | None = Header(default=None)):
     _require_admin(authorization)
-    q = get_queue()
+    q = get_queue(QUEUE_LOW)
     if not q:
         raise HTTPException(status_code=503, detail="queue unavailable")
     try:
-        q.enqueue('tasks.rebuild_all_embeddings')
+        q.enqueue('tasks.rebuild_all_embeddings_fanout')
         return {"ok": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import uuid
 from typing import List, Optional, Dict
 from fastapi import APIRouter, Depends, Header, HTTPException
 from pydantic import BaseModel
@@ -7,7 +8,7 @@ from sqlmodel import Session, select
 
 from ..db import get_session
 from ..models import Profile, Rating, Event, Show
-from ..embeddings_util import rebuild_profile_embedding
+from ..embeddings_util import apply_rating_deltas
 from .utils import parse_token
 
 
@@ -56,10 +57,12 @@ def save_onboarding(payload: OnboardingPayload, session: Session = Depends(get_s
         session.add(prof)
 
     # convert loves/dislikes to ratings
+    seeded: list[Rating] = []
     for sid in payload.loves[:5]:
-        session.add(Rating(profile_id=prof.id, show_id=sid, primary=2, nuance_tags=["onboarding"], note="seed love"))
+        seeded.append(Rating(profile_id=prof.id, show_id=uuid.UUID(sid), primary=2, nuance_tags=["onboarding"], note="seed love"))
     for sid in payload.dislikes[:3]:
-        session.add(Rating(profile_id=prof.id, show_id=sid, primary=0, nuance_tags=["onboarding"], note="seed dislike"))
+        seeded.append(Rating(profile_id=prof.id, show_id=uuid.UUID(sid), primary=0, nuance_tags=["onboarding"], note="seed dislike"))
+    session.add_all(seeded)
     session.commit()
 
     # store event with creators and knobs
@@ -72,11 +75,12 @@ def save_onboarding(payload: OnboardingPayload, session: Session = Depends(get_s
     }))
     session.commit()
 
-    # rebuild embedding
+    # fold the seeded ratings into the profile embedding (one rebuild if it has no sums yet)
     try:
-        rebuild_profile_embedding(session, prof.id)
+        if seeded:
+            apply_rating_deltas(session, prof.id, [(r.show_id, None, r.primary) for r in seeded])
     except Exception:
-        pass
+        session.rollback()
 
     return {"ok": True}
 
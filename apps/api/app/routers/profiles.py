@@ -4,6 +4,7 @@ from sqlmodel import Session, select
 from ..db import get_session
 from ..models import User, Profile, ProfileName
 from ..embeddings_util import rebuild_profile_embedding
+from ..queue import enqueue_profile_rebuild
 from ..schemas import ProfileCreate, ProfileOut
 from .utils import parse_token
 from ..cache import invalidate_for_email
@@ -62,10 +63,12 @@ def create_or_update_profiles(
             session.add(prof)
         session.commit()
         session.refresh(prof)
-        try:
-            rebuild_profile_embedding(session, prof.id)
-        except Exception:
-            pass
+        # Queued when Redis is healthy, else rebuilt inline
+        if not enqueue_profile_rebuild(prof.id):
+            try:
+                rebuild_profile_embedding(session, prof.id)
+            except Exception:
+                session.rollback()
         out.append(ProfileOut(id=prof.id, name=prof.name.value, age_limit=prof.age_limit, boundaries=prof.boundaries))
     # invalidate rec cache for this user
     try:
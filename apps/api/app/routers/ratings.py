@@ -3,8 +3,7 @@ from sqlmodel import Session
 
 from ..db import get_session
 from ..models import Rating
-from ..embeddings_util import rebuild_profile_embedding
-from ..queue import get_queue
+from ..embeddings_util import apply_rating_delta
 from ..schemas import RatingCreate
 from .utils import parse_token
 from ..cache import invalidate_for_email
@@ -30,18 +29,11 @@ def post_rating(
     )
     session.add(r)
     session.commit()
-    # rebuild profile embedding to adapt recommendations quickly
+    # apply this rating to the stored profile embedding (O(dim) delta, no re-scan)
     try:
-        rebuild_profile_embedding(session, payload.profile_id)
+        apply_rating_delta(session, payload.profile_id, r.show_id, None, payload.primary)
     except Exception:
-        pass
-    # enqueue async rebuild as well
-    try:
-        q = get_queue()
-        if q:
-            q.enqueue('tasks.rebuild_profile_embedding', kwargs={"profile_id": payload.profile_id})
-    except Exception:
-        pass
+        session.rollback()
     # invalidate rec cache for this user
     email = parse_token(authorization)
     if email:
@@ -6,6 +6,7 @@ from datetime import datetime, timezone
 from sqlalchemy import text
 
 from ..db import get_session, get_redis
+from ..vector_state import vector_state
 
 
 router = APIRouter()
@@ -39,6 +40,12 @@ async def readyz():
     except Exception as e:
         checks["redis"] = {"ok": False, "error": str(e)}
 
+    try:
+        with next(get_session()) as s:
+            checks["vectors"] = {"ok": True, **vector_state(s).as_dict()}
+    except Exception as e:
+        checks["vectors"] = {"ok": False, "error": str(e)}
+
     checks["app"] = {"ok": True}
 
     overall = "ok" if all(x.get("ok") for x in checks.values()) else "degraded"
@@ -11,6 +11,7 @@ from ..schemas import RecommendationItem, Prediction
 from .utils import parse_token
 from ..recs import recommendations_for_profiles, pick_season_consistent_offer, is_stale
 from ..cache import make_key, get as cache_get, set as cache_set
+from ..embeddings_util import active_generation
 from ..metrics import RECS_STALE_RATIO, RECS_ITEMS_TOTAL, RECS_ITEMS_STALE_TOTAL
 
 router = APIRouter()
@@ -45,7 +46,7 @@ def get_recommendations(
         if p:
             profiles = [p]
 
-    cache_key = make_key(email, for_, intent, like_id, seed)
+    cache_key = make_key(email, for_, intent, like_id, seed, gen=active_generation(session))
     if not explain:
         cached = cache_get(cache_key)
         if cached is not None:
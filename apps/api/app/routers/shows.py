@@ -1,8 +1,12 @@
+import uuid
+
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select
 
 from ..db import get_session
 from ..models import Show, Availability
+from ..neighbors import available_in_region, neighbors_for
+from ..settings import settings
 
 router = APIRouter()
 
@@ -46,3 +50,25 @@ def get_show(show_id: str, session: Session = Depends(get_session)):
             for a in avails
         ],
     }
+
+
+@router.get("/shows/{show_id}/similar")
+def similar_shows(
+    show_id: str,
+    limit: int = Query(default=10, ge=1, le=50),
+    region: str | None = Query(default=None),
+    session: Session = Depends(get_session),
+):
+    """More like this: precomputed neighbours, filtered to titles watchable in `region`."""
+    show = session.get(Show, show_id)
+    if not show:
+        raise HTTPException(status_code=404, detail="Show not found")
+    nbrs = neighbors_for(session, show.id)
+    ok = available_in_region(session, [sid for sid, _ in nbrs], region)
+    keep = [(sid, sc) for sid, sc in nbrs if sid in ok][:limit]
+    titles = dict(session.exec(select(Show.id, Show.title).where(Show.id.in_([uuid.UUID(sid) for sid, _ in keep]))).all()) if keep else {}
+    return {
+        "show_id": str(show.id),
+        "region": (region or settings.region).upper(),
+        "items": [{"id": sid, "title": titles.get(uuid.UUID(sid)), "score": round(sc, 4)} for sid, sc in keep],
+    }
@@ -17,6 +17,10 @@ class Settings(BaseSettings):
     environment: str = Field("dev", alias="ENVIRONMENT")  # dev|prod
     allow_origins: str = Field("http://localhost:3000", alias="ALLOW_ORIGINS")
 
+    # Published local data (catalog artifact, CF model). Absolute, so it does not follow the
+    # working directory into the source tree; compose sets /var/lib/recs per directory.
+    data_dir: str = Field(default=os.path.join(os.path.expanduser("~"), ".local", "share", "recs"), alias="DATA_DIR")
+
     use_sqlite: bool = Field(default=True, alias="USE_SQLITE")
     disable_redis: bool = Field(default=True, alias="DISABLE_REDIS")
     database_url: str | None = Field(default=None, alias="DATABASE_URL")
@@ -46,6 +50,19 @@ class Settings(BaseSettings):
     history_adj_boost: float = Field(0.06, alias="HISTORY_ADJ_BOOST")
     history_rewatch_penalty: float = Field(0.10, alias="HISTORY_REWATCH_PENALTY")
 
+    # Item-item collaborative filtering (scaled predicted affinity in [-1, 1])
+    cf_weight: float = Field(0.10, alias="CF_WEIGHT")
+
+    # MMR diversification of the comfort/discovery pools (lambda = relevance weight per intent)
+    mmr_enabled: bool = Field(False, alias="MMR_ENABLED")
+    mmr_pool: int = Field(200, alias="MMR_POOL")
+    mmr_lambda: Dict[str, float] = {
+        "default": 0.7,
+        "comfort": 0.85,
+        "short_tonight": 0.75,
+        "surprise": 0.5,
+    }
+
     # --- Rationale & spoiler lint (phase 5) ---
     rationale_max_chars: int = Field(180, alias="RATIONALE_MAX_CHARS")
     # Keep concise; pilot premise only; no season/episode spoilers.
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Any, Iterable
+
+from sqlmodel import Session, select
+
+
+# Maps external identifiers (Serializd/JustWatch records) to show ids. Built once per sync
+# from a single query over shows, then every record resolves in memory, in order of trust:
+#   tmdb_id -> imdb_id -> (normalised title, year) -> normalised title -> fuzzy title
+# Fuzzy candidates come from a word postings index and must score >= FUZZY_CUTOFF
+# (difflib ratio on normalised titles); results are memoised per normalised title.
+FUZZY_CUTOFF = 0.88
+_MAX_POSTING = 2000  # skip words shared by this many titles ("the", "of") when others exist
+_YEAR_SUFFIX = re.compile(r"\s*\((\d{4})\)\s*$")
+
+
+def normalize_title(title: str | None) -> str:
+    """Casefolded ASCII words: 'The Office (US)' -> 'office us', 'Law & Order' -> 'law and order'."""
+    t = unicodedata.normalize("NFKD", title or "").encode("ascii", "ignore").decode().casefold()
+    t = re.sub(r"[^a-z0-9]+", " ", t.replace("&", " and ")).strip()
+    return t[4:] if t.startswith("the ") else t
+
+
+def split_year(title: str | None) -> tuple[str | None, int | None]:
+    """'Dark (2017)' -> ('Dark', 2017)."""
+    m = _YEAR_SUFFIX.search(title or "")
+    if not m:
+        return title, None
+    return title[: m.start()], int(m.group(1))
+
+
+class ShowResolver:
+    def __init__(self, rows: Iterable[tuple[Any, str, int | None, int | None, str | None]]):
+        """`rows` is (id, title, year_start, tmdb_id, imdb_id) per show."""
+        self.by_tmdb: dict[int, Any] = {}
+        self.by_imdb: dict[str, Any] = {}
+        self.by_title_year: dict[tuple[str, int], Any] = {}
+        self.by_title: dict[str, list[tuple[int | None, Any]]] = {}
+        self.by_word: dict[str, set[str]] = {}
+        self.stats = {"tmdb": 0, "imdb": 0, "title_year": 0, "title": 0, "fuzzy": 0, "unresolved": 0}
+        self._fuzzy: dict[str, str | None] = {}
+        for sid, title, year, tmdb_id, imdb_id in rows:
+            if tmdb_id is not None:
+                self.by_tmdb.setdefault(int(tmdb_id), sid)
+            if imdb_id:
+                self.by_imdb.setdefault(str(imdb_id).lower(), sid)
+            norm = normalize_title(title)
+            if not norm:
+                continue
+            if year is not None:
+                self.by_title_year.setdefault((norm, int(year)), sid)
+            self.by_title.setdefault(norm, []).append((year, sid))
+            for w in norm.split():
+                self.by_word.setdefault(w, set()).add(norm)
+
+    @classmethod
+    def load(cls, session: Session) -> "ShowResolver":
+        from .models import Show  # type: ignore
+        return cls(session.exec(select(Show.id, Show.title, Show.year_start, Show.tmdb_id, Show.imdb_id)).all())
+
+    def resolve(self, title: str | None = None, year: int | None = None,
+                tmdb_id: int | None = None, imdb_id: str | None = None):
+        """Show id for an external record, or None."""
+        sid, how = self._resolve(title, year, tmdb_id, imdb_id)
+        self.stats[how] += 1
+        return sid
+
+    def _resolve(self, title, year, tmdb_id, imdb_id):
+        if tmdb_id is not None:
+            try:
+                sid = self.by_tmdb.get(int(tmdb_id))
+            except (TypeError, ValueError):
+                sid = None
+            if sid is not None:
+                return sid, "tmdb"
+        if imdb_id and (sid := self.by_imdb.get(str(imdb_id).lower())) is not None:
+            return sid, "imdb"
+        title, suffix_year = split_year(title)
+        year = _as_year(year) or suffix_year
+        norm = normalize_title(title)
+        if not norm:
+            return None, "unresolved"
+        if year is not None and (sid := self.by_title_year.get((norm, year))) is not None:
+            return sid, "title_year"
+        if norm in self.by_title:
+            return self._pick(norm, year), "title"
+        match = self._fuzzy_title(norm)
+        if match is not None:
+            return self._pick(match, year), "fuzzy"
+        return None, "unresolved"
+
+    def _pick(self, norm: str, year: int | None):
+        """Among shows sharing a normalised title: nearest start year, else the first."""
+        cands = self.by_title[norm]
+        if year is None or len(cands) == 1:
+            return cands[0][1]
+        return min(cands, key=lambda c: abs((c[0] if c[0] is not None else 0) - year))[1]
+
+    def _fuzzy_title(self, norm: str) -> str | None:
+        if norm in self._fuzzy:
+            return self._fuzzy[norm]
+        postings = [self.by_word[w] for w in set(norm.split()) if w in self.by_word]
+        narrow = [p for p in postings if len(p) <= _MAX_POSTING]
+        cands: set[str] = set().union(*(narrow or postings)) if postings else set()
+        best: tuple[float, str] | None = None
+        sm = SequenceMatcher(autojunk=False)
+        sm.set_seq2(norm)
+        for c in sorted(cands):
+            sm.set_seq1(c)
+            if sm.real_quick_ratio() < FUZZY_CUTOFF or sm.quick_ratio() < FUZZY_CUTOFF:
+                continue
+            r = sm.ratio()
+            if r >= FUZZY_CUTOFF and (best is None or r > best[0]):
+                best = (r, c)
+        self._fuzzy[norm] = best[1] if best else None
+        return self._fuzzy[norm]
+
+
+def _as_year(v) -> int | None:
+    try:
+        return int(v) if v is not None else None
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Iterable, Sequence
+
+from .vocab import overlap
+
+
+# Boundary-safe substitutes: for a violating show, the safe candidate with the highest
+#   sim = |shared genres| - 0.02 * |episode length difference|
+# with ties going to the earliest candidate. Candidates sharing a genre come from a genre
+# inverted index; the rest can only score -0.02 * |dl|, so they are reached by walking
+# episode-length buckets outward from the violator's length and stopping at the first hit.
+# recs.py first ranks only the violator's precomputed item neighbours (best_among) and builds
+# the index over all safe candidates only when none of those neighbours is eligible.
+
+
+def genre_length_sim(genres_a: int, len_a: int, genres_b: int, len_b: int) -> float:
+    return overlap(genres_a, genres_b) - 0.02 * abs(len_a - len_b)
+
+
+def best_among(genres: int, length: int, feats: Iterable[tuple[int, int, int]]) -> int | None:
+    """Best of a few (position, genre bitset, episode length) candidates, ties to the earliest."""
+    best: tuple[float, int] | None = None
+    for i, g, el in feats:
+        key = (genre_length_sim(genres, length, g, el), -i)
+        if best is None or key > best:
+            best = key
+    return None if best is None else -best[1]
+
+
+class SubstituteIndex:
+    def __init__(self, feats: Sequence[tuple[int, int]]):
+        """`feats` is (genre bitset, episode length) per candidate, in candidate order."""
+        self.feats = list(feats)
+        self.by_genre: dict[int, list[int]] = {}
+        self.by_len: dict[int, list[int]] = {}
+        for i, (g, el) in enumerate(self.feats):
+            for bit in _bits_of(g):
+                self.by_genre.setdefault(bit, []).append(i)
+            self.by_len.setdefault(el, []).append(i)
+        self.lengths = sorted(self.by_len)
+
+    def best(self, genres: int, length: int, exclude: set[int] = frozenset()) -> int | None:
+        """Position of the most similar candidate not in `exclude`, or None."""
+        best: tuple[float, int] | None = None  # (sim, -position)
+        sharing: set[int] = set()
+        for bit in _bits_of(genres):
+            sharing.update(self.by_genre.get(bit, ()))
+        for i in sharing:
+            if i in exclude:
+                continue
+            g, el = self.feats[i]
+            key = (genre_length_sim(genres, length, g, el), -i)
+            if best is None or key > best:
+                best = key
+        # No shared genre: only the length difference counts, nearest lengths first
+        hi = bisect_left(self.lengths, length)
+        lo = hi - 1
+        while lo >= 0 or hi < len(self.lengths):
+            d_lo = length - self.lengths[lo] if lo >= 0 else None
+            d_hi = self.lengths[hi] - length if hi < len(self.lengths) else None
+            d = min(x for x in (d_lo, d_hi) if x is not None)
+            sim = 0 - 0.02 * d
+            if best is not None and sim < best[0]:
+                break
+            pos: list[int] = []
+            if d_lo == d:
+                pos += self.by_len[self.lengths[lo]]
+                lo -= 1
+            if d_hi == d:
+                pos += self.by_len[self.lengths[hi]]
+                hi += 1
+            i = min((p for p in pos if p not in exclude and p not in sharing), default=None)
+            if i is not None:
+                if best is None or (sim, -i) > best:
+                    best = (sim, -i)
+                break
+        return None if best is None else -best[1]
+
+
+def _bits_of(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
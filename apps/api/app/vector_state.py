@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+from sqlmodel import Session, select
+from sqlalchemy import text
+
+from .embeddings_util import active_generation
+
+
+# Vector-search capability, read by every recommendation request. The embedding/index jobs
+# record it as an `admin:status:vector` event after each cutover or index change; the API
+# keeps one snapshot per process and re-reads it every VECTOR_STATE_TTL_S or on a new generation.
+STATUS_KIND = "admin:status:vector"
+VECTOR_STATE_TTL_S = float(os.getenv("VECTOR_STATE_TTL_S", "300"))
+SQL_ANN_MIN_SHOWS = int(os.getenv("SQL_ANN_MIN_SHOWS", "100"))
+
+
+@dataclass(frozen=True)
+class VectorState:
+    generation: int
+    pgvector: bool
+    show_vectors: int
+    profile_vectors: int
+    show_index: bool
+    checked_at: str
+    source: str  # job|probe
+
+    @property
+    def sql_ann_ready(self) -> bool:
+        return self.pgvector and self.show_vectors >= SQL_ANN_MIN_SHOWS
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "sql_ann_ready": self.sql_ann_ready}
+
+
+_state: tuple[float, VectorState] | None = None
+
+
+def probe(session: Session, generation: int | None = None, source: str = "probe") -> VectorState:
+    """Measure capability directly (row counts, extension, index). Not for the request path."""
+    gen = generation if generation is not None else active_generation(session)
+    pgvector = False
+    show_n = prof_n = 0
+    index = False
+    try:
+        if session.get_bind().dialect.name == "postgresql":
+            pgvector = bool(session.exec(text("SELECT EXISTS(SELECT 1 FROM pg_extension WHERE extname='vector')")).first()[0])
+        if pgvector:
+            show_n = session.exec(text("SELECT COUNT(*) FROM embeddings_show WHERE generation = :g AND emb_v IS NOT NULL"), params={"g": gen}).first()[0]
+            prof_n = session.exec(text("SELECT COUNT(*) FROM embeddings_profile WHERE generation = :g AND emb_v IS NOT NULL"), params={"g": gen}).first()[0]
+            index = session.exec(text("SELECT 1 FROM pg_indexes WHERE indexname = :n"), params={"n": f"ix_embeddings_show_emb_v_g{gen}"}).first() is not None
+    except Exception:
+        session.rollback()
+    return VectorState(
+        generation=int(gen),
+        pgvector=pgvector,
+        show_vectors=int(show_n or 0),
+        profile_vectors=int(prof_n or 0),
+        show_index=index,
+        checked_at=datetime.utcnow().isoformat(),
+        source=source,
+    )
+
+
+def record(session: Session, state: VectorState) -> None:
+    """Publish a job-measured state; API processes pick it up on their next refresh."""
+    from .models import Event  # type: ignore
+    payload = asdict(state)
+    payload["timestamp"] = state.checked_at
+    session.add(Event(profile_id=0, kind=STATUS_KIND, payload=payload))
+    session.commit()
+
+
+def _latest_recorded(session: Session, generation: int) -> VectorState | None:
+    from .models import Event  # type: ignore
+    try:
+        ev = session.exec(select(Event).where(Event.kind == STATUS_KIND).order_by(Event.created_at.desc())).first()
+    except Exception:
+        session.rollback()
+        return None
+    if ev is None or int((ev.payload or {}).get("generation", -1)) != generation:
+        return None
+    p = ev.payload
+    return VectorState(
+        generation=generation,
+        pgvector=bool(p.get("pgvector")),
+        show_vectors=int(p.get("show_vectors") or 0),
+        profile_vectors=int(p.get("profile_vectors") or 0),
+        show_index=bool(p.get("show_index")),
+        checked_at=str(p.get("checked_at") or p.get("timestamp") or ""),
+        source="job",
+    )
+
+
+def vector_state(session: Session) -> VectorState:
+    """Cached capability snapshot; free on the hot path between refreshes."""
+    global _state
+    now = time.time()
+    gen = active_generation(session)
+    if _state is not None and _state[0] > now and _state[1].generation == gen:
+        return _state[1]
+    # No job has reported on this generation yet (fresh install, SQLite): measure once.
+    st = _latest_recorded(session, gen) or probe(session, gen)
+    _state = (now + VECTOR_STATE_TTL_S, st)
+    return st
+
+
+def invalidate() -> None:
+    global _state
+    _state = None
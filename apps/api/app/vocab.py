@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from typing import Callable, Iterable, NamedTuple
+
+
+# Interned tag vocabularies: genres, creators, flags and warnings map to dense integer ids
+# per process, and a show's tags become one Python int bitset per kind. Overlap counts are
+# (a & b).bit_count() and boundary checks a single AND, instead of building and
+# intersecting sets of strings per candidate.
+#
+# Only catalog vocabulary is interned (show tags via show_bits, and the constants in recs.py).
+# Request values (preferences, boundaries, rating tags) are looked up: a name no show carries
+# gets no bit, since it cannot overlap anything, and the tables stay bounded by the catalog.
+SHOW_BITS_CACHE = int(os.getenv("SHOW_BITS_CACHE", "50000"))
+
+KINDS = ("genre", "creator", "flag", "warning")
+
+
+class ShowBits(NamedTuple):
+    genres: int
+    creators: int
+    flags: int
+    warnings: int
+
+
+class Vocab:
+    """Append-only string -> bit position table."""
+
+    def __init__(self) -> None:
+        self._ids: dict[str, int] = {}
+        self.names: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def id(self, name: str) -> int:
+        i = self._ids.get(name)
+        if i is None:
+            i = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def mask(self, items: Iterable[str] | None, intern: bool = True) -> int:
+        m = 0
+        for it in items or ():
+            i = self.id(str(it)) if intern else self._ids.get(str(it))
+            if i is not None:
+                m |= 1 << i
+        return m
+
+    def decode(self, mask: int) -> set[str]:
+        return {n for i, n in enumerate(self.names) if mask >> i & 1}
+
+
+class TagVocabulary:
+    def __init__(self, max_shows: int = SHOW_BITS_CACHE) -> None:
+        self.vocabs = {k: Vocab() for k in KINDS}
+        self._shows: OrderedDict[tuple, ShowBits] = OrderedDict()
+        self._max_shows = max_shows
+
+    def mask(self, kind: str, items: Iterable[str] | None) -> int:
+        """Mask of already interned names; unknown names get no bit."""
+        return self.vocabs[kind].mask(items, intern=False)
+
+    def intern(self, kind: str, items: Iterable[str] | None) -> int:
+        """Mask for catalog vocabulary, allocating bits for new names."""
+        return self.vocabs[kind].mask(items)
+
+    def show_bits(self, key: tuple | None, loader: Callable[[], tuple[Iterable[str], Iterable[str], Iterable[str], Iterable[str]]]) -> ShowBits:
+        """Bitsets for one show, memoized by `key` (id + last update; None = not cacheable).
+        `loader` returns its (genres, creators, flags, warnings) and only runs on a miss."""
+        bits = self._shows.get(key) if key is not None else None
+        if bits is not None:
+            return bits
+        g, c, f, w = loader()
+        v = self.vocabs
+        bits = ShowBits(v["genre"].mask(g), v["creator"].mask(c), v["flag"].mask(f), v["warning"].mask(w))
+        if key is None:
+            return bits
+        self._shows[key] = bits
+        if len(self._shows) > self._max_shows:
+            self._shows.popitem(last=False)
+        return bits
+
+
+VOCAB = TagVocabulary()
+
+
+def overlap(a: int, b: int) -> int:
+    return (a & b).bit_count()
@@ -0,0 +1,144 @@
+import json
+import os
+import select
+import threading
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, create_engine
+
+from services.recsys import jobs
+
+
+def _fake_claims(monkeypatch, triggers):
+    """In-memory stand-in for the events table: (id, kind, payload) rows, claimed in id order."""
+    rows = list(triggers)
+    monkeypatch.setattr(jobs, "_engine", lambda: create_engine("sqlite://", poolclass=StaticPool))
+
+    def claim(s, skip=()):
+        pending = [r for r in rows if r[0] not in skip]
+        if not pending:
+            return None
+        _, kind, payload = pending[0]
+        return [i for i, k, p in pending if k == kind and p == payload], kind, payload
+
+    def complete(s, ids):
+        rows[:] = [r for r in rows if r[0] not in ids]
+
+    monkeypatch.setattr(jobs, "_claim_admin_trigger", claim)
+    monkeypatch.setattr(jobs, "_complete_admin_trigger", complete)
+    return rows
+
+
+def test_failed_trigger_stays_queued_and_is_not_retried_in_the_same_drain(monkeypatch):
+    rows = _fake_claims(monkeypatch, [
+        (1, "admin:sync:serializd", {"dry_run": False}),
+        (2, "admin:sync:justwatch", {}),
+        (3, "admin:sync:serializd", {"dry_run": False}),
+        (4, "admin:sync:serializd", {"dry_run": True}),
+    ])
+    calls = []
+
+    def serializd(dry_run=False):
+        calls.append(("serializd", dry_run))
+        if not dry_run:
+            raise RuntimeError("serializd down")
+        return 2
+
+    monkeypatch.setattr(jobs, "sync_serializd_ratings", serializd)
+    monkeypatch.setattr(jobs, "refresh_justwatch_availability", lambda dry_run=False: calls.append(("justwatch", dry_run)) or 5)
+    assert jobs.process_admin_triggers() == {"justwatch": 5, "serializd": 2, "failed": 1}
+    # Identical triggers 1 and 3 ran once, failed together and are both still pending
+    assert calls == [("serializd", False), ("justwatch", False), ("serializd", True)]
+    assert [r[0] for r in rows] == [1, 3]
+
+    monkeypatch.setattr(jobs, "sync_serializd_ratings", lambda dry_run=False: 1)
+    assert jobs.process_admin_triggers() == {"justwatch": 0, "serializd": 1, "failed": 0}
+    assert rows == []
+
+
+class _Conn:
+    def __init__(self):
+        self.autocommit = False
+        self.executed = []
+        self.notifies = []
+        self.polls = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        self.executed.append(sql)
+
+    def poll(self):
+        self.polls += 1
+        self.notifies.append("admin_triggers")
+
+
+class _Raw:
+    def __init__(self):
+        self.driver_connection = _Conn()
+        self.invalidated = False
+
+    def invalidate(self):
+        self.invalidated = True
+
+
+def test_listener_drains_on_start_and_on_each_wake(monkeypatch):
+    raw = _Raw()
+    stop = threading.Event()
+    drains = []
+    waits = iter([True, False, True])
+
+    def fake_select(r, w, x, timeout):
+        assert timeout == jobs.ADMIN_TRIGGER_SWEEP_S
+        ready = next(waits, None)
+        if ready is None:
+            stop.set()
+            return [], [], []
+        return (r if ready else []), [], []
+
+    monkeypatch.setattr(jobs, "_engine", lambda: type("E", (), {"raw_connection": lambda self: raw})())
+    monkeypatch.setattr(jobs, "process_admin_triggers", lambda: drains.append(1) or {})
+    monkeypatch.setattr(select, "select", fake_select)
+    jobs.listen_admin_triggers(stop)
+    conn = raw.driver_connection
+    assert conn.autocommit and conn.executed == ["LISTEN admin_triggers"]
+    # Once for rows written before LISTEN, then after each wake-up or sweep timeout
+    assert len(drains) == 5
+    assert conn.polls == 2 and conn.notifies == []
+    assert raw.invalidated
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="needs TEST_POSTGRES_URL")
+def test_claims_lock_rows_until_completed(monkeypatch):
+    schema = f"trig_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(os.environ["TEST_POSTGRES_URL"])
+    with admin.begin() as c:
+        c.execute(text(f"CREATE SCHEMA {schema}"))
+    eng = create_engine(os.environ["TEST_POSTGRES_URL"], connect_args={"options": f"-csearch_path={schema}"})
+    try:
+        with eng.begin() as c:
+            c.execute(text("CREATE TABLE events (id serial PRIMARY KEY, profile_id int, kind text, payload jsonb, created_at timestamp DEFAULT now())"))
+            for kind, payload in [("serializd", {"dry_run": False}), ("justwatch", {}), ("serializd", {"dry_run": False}), ("serializd", {"dry_run": True})]:
+                c.execute(text("INSERT INTO events (profile_id, kind, payload) VALUES (0, :k, CAST(:p AS jsonb))"), {"k": f"admin:sync:{kind}", "p": json.dumps(payload)})
+        with Session(eng) as a, Session(eng) as b:
+            ids, kind, payload = jobs._claim_admin_trigger(a)
+            assert (ids, kind, payload) == ([1, 3], "admin:sync:serializd", {"dry_run": False})
+            # A second worker skips the locked rows
+            assert jobs._claim_admin_trigger(b)[0] == [2]
+            b.rollback()
+            # A failed run rolls back: the trigger is claimable again
+            a.rollback()
+            assert jobs._claim_admin_trigger(b)[0] == [1, 3]
+            jobs._complete_admin_trigger(b, [1, 3])
+            assert jobs._claim_admin_trigger(a, skip=[2])[0] == [4]
+            a.rollback()
+            left = [r[0] for r in a.exec(text("SELECT id FROM events ORDER BY id")).all()]
+        assert left == [2, 4]
+    finally:
+        eng.dispose()
+        with admin.begin() as c:
+            c.execute(text(f"DROP SCHEMA {schema} CASCADE"))
@@ -0,0 +1,45 @@
+from app import queue
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.keys = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        return True
+
+    def delete(self, key):
+        self.keys.pop(key, None)
+
+
+class _FakeQueue:
+    def __init__(self):
+        self.connection = _FakeRedis()
+        self.jobs = []
+
+    def enqueue(self, name, kwargs=None):
+        self.jobs.append((name, kwargs))
+
+
+def test_admin_sync_coalesces_while_pending(monkeypatch):
+    q = _FakeQueue()
+    monkeypatch.setattr(queue, "get_queue", lambda name=queue.QUEUE_HIGH: q)
+    assert queue.enqueue_admin_sync("serializd", False)
+    assert queue.enqueue_admin_sync("serializd", False)
+    assert queue.enqueue_admin_sync("serializd", True)
+    assert q.jobs == [
+        ("tasks.sync_serializd", {"dry_run": False}),
+        ("tasks.sync_serializd", {"dry_run": True}),
+    ]
+    # The task clears its marker on start; the next trigger queues a fresh run
+    q.connection.delete(queue.admin_sync_pending_key("serializd", False))
+    assert queue.enqueue_admin_sync("serializd", False)
+    assert len(q.jobs) == 3
+
+
+def test_admin_sync_without_queue_falls_back(monkeypatch):
+    monkeypatch.setattr(queue, "get_queue", lambda name=queue.QUEUE_HIGH: None)
+    assert queue.enqueue_admin_sync("justwatch", False) is False
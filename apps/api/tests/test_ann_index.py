@@ -0,0 +1,62 @@
+from services.recsys import ann_index
+
+
+def test_choose_index_sizes_by_row_count(monkeypatch):
+    monkeypatch.setattr(ann_index, "ANN_INDEX_METHOD", "auto")
+    monkeypatch.setattr(ann_index, "ANN_HNSW_MIN_ROWS", 1_000_000)
+    assert ann_index.choose_index(0) == {"method": "ivfflat", "lists": 10, "default_search": 3}
+    assert ann_index.choose_index(250_000) == {"method": "ivfflat", "lists": 250, "default_search": 15}
+    assert ann_index.choose_index(4_000_000)["method"] == "hnsw"
+    assert ann_index.choose_index(4_000_000, "hnsw") == {"method": "hnsw", "m": 16, "ef_construction": 64, "default_search": 40}
+    assert ann_index.choose_index(9_000_000, "hnsw")["m"] == 24
+    # Forced ivfflat past 1M rows switches to sqrt(rows) lists
+    assert ann_index.choose_index(4_000_000, "ivfflat")["lists"] == 2000
+
+
+def test_search_candidates():
+    assert ann_index._candidates({"method": "ivfflat", "lists": 100}) == [1, 2, 4, 8, 16, 32, 64, 100]
+    assert ann_index._candidates({"method": "hnsw"})[0] == 20
+
+
+def _bench(p95s):
+    def fake(session, generation, method, values, **kw):
+        return [{"value": v, "recall_at_k": 1.0, "p50_ms": 0.0, "p95_ms": p} for v, p in zip(values, p95s)]
+    return fake
+
+
+def test_tune_search_picks_largest_value_within_target(monkeypatch):
+    params = {"method": "ivfflat", "lists": 16, "default_search": 4}
+    monkeypatch.setattr(ann_index, "benchmark", _bench([1, 2, 5, 12, 30]))
+    assert ann_index.tune_search(None, 1, params, target_ms=20) == 8
+    monkeypatch.setattr(ann_index, "benchmark", _bench([25, 40, 60, 90, 120]))
+    assert ann_index.tune_search(None, 1, params, target_ms=20) == 1
+    monkeypatch.setattr(ann_index, "benchmark", lambda *a, **k: [])
+    assert ann_index.tune_search(None, 1, params) == 4
+    assert ann_index.tune_search(None, 1, {}) == 0
+
+
+def test_maintain_rebuilds_only_on_growth_or_method_change(monkeypatch):
+    from services.recsys import embeddings
+
+    class _Session:
+        def __init__(self, row):
+            self.row = row
+
+        def exec(self, stmt, params=None):
+            return type("R", (), {"first": lambda _: self.row})()
+
+    swapped, recorded = [], []
+    rows = {"embeddings_show": 12_000, "embeddings_profile": 500}
+    monkeypatch.setattr(ann_index, "ANN_INDEX_METHOD", "auto")
+    monkeypatch.setattr(ann_index, "_count", lambda s, table, g: rows[table])
+    monkeypatch.setattr(ann_index, "_swap_index", lambda s, table, name, g, p: swapped.append((table, p["lists"])))
+    monkeypatch.setattr(ann_index, "_record", lambda s, g, p, n, search: recorded.append((p["method"], n, search)))
+    monkeypatch.setattr(ann_index, "tune_search", lambda s, g, p: 7)
+    monkeypatch.setattr(embeddings, "publish_vector_state", lambda s, g: None)
+
+    res = ann_index.maintain_indexes(_Session(("ivfflat", {"lists": 10}, 10_000)), generation=3)
+    assert not res["rebuilt"] and swapped == [] and recorded == [("ivfflat", 10_000, 7)]
+
+    rows["embeddings_show"] = 15_000
+    res = ann_index.maintain_indexes(_Session(("ivfflat", {"lists": 10}, 10_000)), generation=3)
+    assert res["rebuilt"] and swapped == [("embeddings_show", 15), ("embeddings_profile", 10)]
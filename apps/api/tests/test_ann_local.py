@@ -0,0 +1,29 @@
+import numpy as np
+
+from app.ann_local import IVFIndex
+
+
+def _clustered(n=6000, dim=384, centers=40, seed=7):
+    rng = np.random.default_rng(seed)
+    c = rng.normal(size=(centers, dim))
+    return c[rng.integers(0, centers, n)] + 0.5 * rng.normal(size=(n, dim))
+
+
+def test_ivf_recall_against_brute_force():
+    x = _clustered()
+    idx = IVFIndex.build([str(i) for i in range(len(x))], x, generation=1)
+    assert len(idx.centroids) > 1 and idx.nprobe < len(idx.centroids)
+    assert idx.recall(k=10, samples=100) >= 0.9
+
+
+def test_ivf_round_trip_and_self_neighbour(tmp_path):
+    x = _clustered(n=500)
+    idx = IVFIndex.build([f"s{i}" for i in range(len(x))], x, generation=3)
+    info = idx.save(str(tmp_path))
+    loaded = IVFIndex.load(str(tmp_path), info["generation"], info["nprobe"], mmap=True)
+    assert isinstance(loaded.mat, np.memmap)
+    assert loaded.generation == 3
+    top = loaded.search(loaded.vector("s42"), 5)
+    assert top[0][0] == "s42"
+    assert top == idx.search(idx.vector("s42"), 5)
+    assert loaded.row("missing") is None
@@ -0,0 +1,69 @@
+from app.catalog_artifact import pack_features
+
+
+def test_pack_features_round_trips_through_vocab():
+    rows = [
+        ({"genres": ["drama", "comedy"], "creators": ["A"], "episode_length": 30, "seasons": 2, "au_rating": "MA15+"}, ["violence"], ["slow"]),
+        ({"genres": ["thriller"], "episode_length": 55}, [], None),
+        ({"episode_length": 0}, [], []),
+        ({}, [], []),
+    ]
+    packed, vocab = pack_features(rows)
+    assert vocab["genres"] == ["comedy", "drama", "thriller"]
+    first, second = packed[0], packed[1]
+    assert int(first["episode_length"]) == 30 and int(first["seasons"]) == 2
+    assert int(first["age_rating"]) == 15 and int(second["age_rating"]) == -1
+    assert int(first["genre_mask"]) == 0b011 and int(second["genre_mask"]) == 0b100
+    assert first["creators"].tolist() == [0, -1, -1, -1]
+    assert int(first["warning_mask"]) == 1 and int(second["flag_mask"]) == 0
+    # Same lengths as the scorer and the eligibility index: 0 stays 0, missing is 60
+    assert packed["episode_length"][2:].tolist() == [0, 60]
+
+
+def test_masks_widen_past_64_tags():
+    import numpy as np
+    from app.catalog_artifact import mask_int
+    from app.neighbors import top_neighbors
+
+    genres = [f"g{i:03d}" for i in range(70)]
+    rows = [({"genres": genres[:68]}, [], []), ({"genres": genres[68:]}, [], []), ({"genres": ["g001", "g069"]}, [], [])]
+    packed, vocab = pack_features(rows)
+    assert packed["genre_mask"].shape == (3, 2)
+    assert mask_int(packed[1]["genre_mask"]) == (1 << 68) | (1 << 69)
+    assert {vocab["genres"][i] for i in range(70) if mask_int(packed[2]["genre_mask"]) >> i & 1} == {"g001", "g069"}
+    nbr_rows, _ = top_neighbors(np.eye(3, 4, dtype=np.float32), packed["genre_mask"], packed["episode_length"], k=2)
+    assert nbr_rows.shape == (3, 2)
+
+
+def test_requests_never_publish_and_offers_do_not_republish(tmp_path, monkeypatch):
+    import uuid
+    from sqlalchemy.pool import StaticPool
+    from sqlmodel import SQLModel, Session, create_engine
+    from app import catalog_artifact, embeddings_util
+    from app.models import Availability, OfferType, Show
+
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(eng)
+    monkeypatch.setattr(catalog_artifact, "LOCAL_ARTIFACT_DIR", str(tmp_path))
+    embeddings_util._active_gen = None
+    catalog_artifact.invalidate()
+    with Session(eng) as s:
+        s.add_all([Show(title=f"S{i}", meta={"genres": ["drama"]}) for i in range(3)])
+        s.commit()
+        assert catalog_artifact.current_artifact(s) is None
+        assert catalog_artifact.ensure_published(s) is not None
+        first = catalog_artifact.current_artifact(s)
+        assert first is not None and len(first.index.ids) == 3
+        # Offer writes are not an input of the artifact
+        s.add(Availability(show_id=uuid.UUID(str(first.index.ids[0])), platform="Stan", offer_type=OfferType.stream))
+        s.commit()
+        assert catalog_artifact.ensure_published(s) is None
+        # A new show: requests keep the loaded version until a publisher builds the next one
+        s.add(Show(title="S3", meta={"genres": ["comedy"]}))
+        s.commit()
+        catalog_artifact._current = (0.0, first)
+        assert catalog_artifact.current_artifact(s).version == first.version
+        assert catalog_artifact.ensure_published(s) is not None
+        second = catalog_artifact.current_artifact(s)
+        assert second.version != first.version and len(second.index.ids) == 4
+    catalog_artifact.invalidate()
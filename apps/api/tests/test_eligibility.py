@@ -0,0 +1,147 @@
+import importlib.util
+import json
+import os
+import pathlib
+import random
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine
+
+from app import eligibility
+from app.catalog_artifact import _age_from_meta
+from app.eligibility import SHORT_TONIGHT_MAX_LEN, EligibilityIndex
+from app.models import Availability, Show
+
+
+def _catalog(n: int, seed: int = 3):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        # 0 and a missing length are scored as 0 and 60 minutes (recs._episode_length)
+        length = rnd.choice([0, 22, 25, 30, 35, 42, 50, 60, None])
+        meta = {} if length is None else {"episode_length": length}
+        r = rnd.random()
+        if r < 0.4:
+            meta["age_rating"] = rnd.choice([0, 8, 12, 15, 18])
+        elif r < 0.7:
+            meta["au_rating"] = rnd.choice(["G", "PG", "M", "MA 15+", "R18+"])
+        warns = rnd.sample(["violence", "gore", "language", "drugs", "cliffhanger"], rnd.randint(0, 2))
+        rows.append((f"s{i:05d}", meta, warns))
+    available = {sid for sid, _, _ in rows if rnd.random() < 0.8}
+    return rows, available
+
+
+def _scan(rows, available, intent, age_limit, banned):
+    safe, viol = set(), set()
+    for sid, meta, warns in rows:
+        if sid not in available:
+            continue
+        if intent == "short_tonight" and meta.get("episode_length", 60) > SHORT_TONIGHT_MAX_LEN:
+            continue
+        age = _age_from_meta(meta)
+        if age_limit is not None and age >= 0 and age > age_limit:
+            continue
+        (viol if set(warns) & set(banned) else safe).add(sid)
+    return safe, viol
+
+
+def test_partition_matches_per_show_scan():
+    rows, available = _catalog(1500)
+    idx = EligibilityIndex(("fp",), rows, available)
+    for intent in ("default", "short_tonight", "comfort"):
+        for age_limit in (None, 8, 15):
+            for banned in ([], ["gore"], ["violence", "drugs"]):
+                safe, viol = idx.partition(intent, age_limit, banned)
+                assert (set(safe), set(viol)) == _scan(rows, available, intent, age_limit, banned)
+
+
+def test_partition_reuses_the_memoized_base(monkeypatch):
+    rows, available = _catalog(2000)
+    idx = EligibilityIndex(("fp",), rows, available)
+    first = idx.partition("short_tonight", 15, ["gore"])
+    # Only the warning postings are consulted for another boundary set
+    monkeypatch.setattr(idx, "longer_than", lambda minutes: pytest.fail("base recomputed"))
+    monkeypatch.setattr(idx, "above_age", lambda limit: pytest.fail("base recomputed"))
+    safe, viol = idx.partition("short_tonight", 15, ["violence"])
+    assert safe | viol == first[0] | first[1]
+    assert (set(safe), set(viol)) == _scan(rows, available, "short_tonight", 15, ["violence"])
+
+def test_sql_failure_falls_back_once_per_retry_window(monkeypatch):
+    eng = create_engine("sqlite://", poolclass=StaticPool)
+    SQLModel.metadata.create_all(eng, tables=[Show.__table__, Availability.__table__])
+    calls = []
+
+    def broken(*args):
+        calls.append(1)
+        raise RuntimeError("column shows.episode_length does not exist")
+
+    eligibility.invalidate()
+    monkeypatch.setattr(eligibility, "use_sql", lambda session: True)
+    monkeypatch.setattr(eligibility, "sql_candidates", broken)
+    with Session(eng) as s:
+        for _ in range(3):
+            assert eligibility.eligible_shows(s, "default", None, []) == ([], frozenset())
+        assert len(calls) == 1
+        monkeypatch.setattr(eligibility, "ELIGIBILITY_SQL_RETRY_S", -1)
+        eligibility.invalidate()
+        eligibility.eligible_shows(s, "default", None, [])
+        eligibility.eligible_shows(s, "default", None, [])
+        assert len(calls) == 3
+    eligibility.invalidate()
+
+
+def _migration_0012():
+    path = pathlib.Path(__file__).resolve().parents[3] / "infra/migrations/versions/0012_show_feature_columns.py"
+    spec = importlib.util.spec_from_file_location("m0012", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="needs TEST_POSTGRES_URL")
+def test_sql_path_matches_partition():
+    rows, available = _catalog(400)
+    rows.append(("s-huge", {"episode_length": 99999, "age_rating": 70000}, []))
+    # Float and string numbers are read as int() reads them
+    rows.append(("s-float", {"episode_length": 30.5, "age_rating": 15.0}, []))
+    rows.append(("s-string", {"episode_length": "42", "age_rating": "8"}, []))
+    available |= {"s-huge", "s-float", "s-string"}
+    ids = {sid: uuid.uuid4() for sid, _, _ in rows}
+    m = _migration_0012()
+    schema = f"elig_{uuid.uuid4().hex[:8]}"
+    eng = create_engine(os.environ["TEST_POSTGRES_URL"])
+    with eng.begin() as c:
+        c.execute(text(f"CREATE SCHEMA {schema}"))
+    eng = create_engine(os.environ["TEST_POSTGRES_URL"], connect_args={"options": f"-csearch_path={schema}"})
+    try:
+        with eng.begin() as c:
+            c.execute(text(
+                "CREATE TABLE shows (id uuid PRIMARY KEY, title text NOT NULL, year_start int, year_end int, tmdb_id int,"
+                " imdb_id text, jw_id int, metadata jsonb, warnings jsonb, flags jsonb, updated_at timestamp)"
+            ))
+            c.execute(text("CREATE TABLE availability (id serial PRIMARY KEY, show_id uuid NOT NULL)"))
+            c.execute(text(f"ALTER TABLE shows ADD COLUMN episode_length smallint GENERATED ALWAYS AS ({m._int_field('episode_length', 60)}) STORED"))
+            c.execute(text(f"ALTER TABLE shows ADD COLUMN age_rating smallint GENERATED ALWAYS AS ({m._AGE_RATING}) STORED"))
+            c.execute(
+                text("INSERT INTO shows (id, title, metadata, warnings, flags) VALUES (:id, :sid, CAST(:meta AS jsonb), CAST(:warns AS jsonb), '[]')"),
+                [{"id": ids[sid], "sid": sid, "meta": json.dumps(meta), "warns": json.dumps(warns)} for sid, meta, warns in rows],
+            )
+            c.execute(text("INSERT INTO availability (show_id) VALUES (:id)"), [{"id": ids[sid]} for sid in available])
+        idx = EligibilityIndex(("fp",), rows, available)
+        by_id = {str(v): k for k, v in ids.items()}
+        with Session(eng) as s:
+            for intent in ("default", "short_tonight"):
+                for age_limit in (None, 8, 15):
+                    for banned in ([], ["gore"], ["violence", "drugs"]):
+                        shows, viol = eligibility.sql_candidates(s, intent, age_limit, banned)
+                        got = {by_id[str(sh.id)] for sh in shows}
+                        safe, want_viol = idx.partition(intent, age_limit, banned)
+                        assert got == set(safe | want_viol)
+                        assert {by_id[v] for v in viol} == set(want_viol)
+    finally:
+        eng.dispose()
+        with create_engine(os.environ["TEST_POSTGRES_URL"]).begin() as c:
+            c.execute(text(f"DROP SCHEMA {schema} CASCADE"))
@@ -0,0 +1,157 @@
+import numpy as np
+import pytest
+from sqlalchemy import text
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from apps.api.app import cache
+from apps.api.app.embeddings_util import rebuild_profile_embedding
+from apps.api.app.models import EmbeddingProfile, EmbeddingShow, Profile, ProfileName, Rating, Show
+from services.recsys import embeddings
+
+
+def _db(n_shows=6):
+    eng = create_engine("sqlite://")
+    SQLModel.metadata.create_all(eng)
+    with Session(eng) as s:
+        for i in range(n_shows):
+            s.add(Show(title=f"Show {i}", meta={"genres": ["drama" if i % 2 else "comedy"], "creators": [f"c{i % 3}"], "episode_length": 30 + i}))
+        s.commit()
+    return eng
+
+
+def test_show_build_skips_unchanged_fingerprints(monkeypatch):
+    eng = _db()
+    with Session(eng) as s:
+        assert embeddings.build_show_embeddings(s) == 6
+        assert embeddings.build_show_embeddings(s) == 0
+        before = {r.show_id: r.emb for r in s.exec(select(EmbeddingShow)).all()}
+
+        show = s.exec(select(Show).where(Show.title == "Show 2")).one()
+        show.meta = {**show.meta, "genres": ["thriller"]}
+        s.add(show)
+        s.commit()
+        assert embeddings.build_show_embeddings(s) == 1
+        after = {r.show_id: r.emb for r in s.exec(select(EmbeddingShow)).all()}
+        assert [sid for sid in before if before[sid] != after[sid]] == [show.id]
+
+        # Bumping the embedding version invalidates every fingerprint
+        monkeypatch.setattr(embeddings, "EMB_VERSION", "tokhash384-test")
+        assert embeddings.build_show_embeddings(s) == 6
+        assert embeddings.build_show_embeddings(s, force=True) == 6
+
+
+def _profiles(s, shows):
+    names = list(ProfileName)
+    for pid in range(1, 6):
+        s.add(Profile(id=pid, user_id=1, name=names[pid % len(names)]))
+    s.commit()
+    for pid in range(1, 5):  # profile 5 has no ratings
+        for j, show in enumerate(shows):
+            if (pid + j) % 3:
+                s.add(Rating(profile_id=pid, show_id=show.id, primary=(pid * j) % 3))
+    s.commit()
+
+
+def _profile_rows(s):
+    return {r.profile_id: (np.array(r.emb), np.array(r.emb_sum), r.n_ratings) for r in s.exec(select(EmbeddingProfile)).all()}
+
+
+def test_batched_profile_build_matches_per_profile_rebuild():
+    eng = _db()
+    with Session(eng) as s:
+        embeddings.build_show_embeddings(s)
+        # One rated show has no stored vector yet: both paths fall back to token hashing
+        s.add(Show(title="Late", meta={"genres": ["crime"]}))
+        s.commit()
+        _profiles(s, s.exec(select(Show)).all())
+
+        assert embeddings.build_profile_embeddings(s) == 5
+        batched = _profile_rows(s)
+        for pid in batched:
+            rebuild_profile_embedding(s, pid, generation=1)
+        single = _profile_rows(s)
+        for pid, (emb, emb_sum, n) in batched.items():
+            assert np.allclose(emb, single[pid][0], atol=1e-5)
+            assert np.allclose(emb_sum, single[pid][1], atol=1e-5)
+            assert n == single[pid][2]
+
+        # Sharded by profile id, the union is the same
+        s.exec(EmbeddingProfile.__table__.delete())
+        s.commit()
+        assert sum(embeddings.build_profile_embeddings(s, shard=i, shards=3) for i in range(3)) == 5
+        for pid, (emb, _, n) in _profile_rows(s).items():
+            assert np.allclose(emb, batched[pid][0], atol=1e-6) and n == batched[pid][2]
+
+
+def _generations(s):
+    return dict(s.exec(text("SELECT id, status FROM embedding_generations")).all())
+
+
+def _no_publish(monkeypatch):
+    for name in ("publish_vector_state", "publish_local_index", "publish_item_neighbors", "build_generation_indexes"):
+        monkeypatch.setattr(embeddings, name, lambda *a, **k: None)
+
+
+def test_rebuild_plans_noop_in_place_or_generation(monkeypatch):
+    _no_publish(monkeypatch)
+    eng = _db(n_shows=40)
+    with Session(eng) as s:
+        s.exec(text("INSERT INTO embedding_generations (id, status, created_at) VALUES (1, 'active', CURRENT_TIMESTAMP)"))
+        s.commit()
+        shows = s.exec(select(Show)).all()
+        _profiles(s, shows[:3])
+        embeddings.build_show_embeddings(s)
+        embeddings.build_profile_embeddings(s)
+        assert embeddings.rebuild_generation(s)["mode"] == "noop"
+
+        # One changed show: upserted into the active generation, only its raters rebuilt
+        shows[0].meta = {"genres": ["western"]}
+        s.add(shows[0])
+        s.commit()
+        cache.set(cache.make_key("a@b", "ross", "default", None, None, gen=1), {"items": []})
+        res = embeddings.rebuild_generation(s)
+        assert res["mode"] == "in_place" and res["shows"] == 1 and res["generation"] == 1
+        raters = {r.profile_id for r in s.exec(select(Rating).where(Rating.show_id == shows[0].id)).all()}
+        assert res["profiles"] == len(raters) > 0
+        # Same generation number, so slates computed from the old vectors are dropped
+        assert cache.get(cache.make_key("a@b", "ross", "default", None, None, gen=1)) is None
+        batched = {p.profile_id: p.emb for p in s.exec(select(EmbeddingProfile)).all()}
+        for pid in raters:
+            rebuild_profile_embedding(s, pid)
+        rows = s.exec(select(EmbeddingProfile).execution_options(populate_existing=True)).all()
+        assert all(np.allclose(batched[p.profile_id], p.emb) for p in rows)
+        assert _generations(s) == {1: "active"}
+        assert s.exec(select(EmbeddingShow).where(EmbeddingShow.generation == 1)).all()
+
+        # A version bump changes every fingerprint: new generation, nothing carried over
+        monkeypatch.setattr(embeddings, "EMB_VERSION", "tokhash384-test")
+        res = embeddings.rebuild_generation(s)
+        assert res["mode"] == "generation" and res["shows"] == 40 and res["previous"] == 1
+        assert _generations(s) == {1: "retired", 2: "active"}
+        assert len(s.exec(select(EmbeddingShow).where(EmbeddingShow.generation == 2)).all()) == 40
+
+
+def test_generation_builds_do_not_clobber_each_other(monkeypatch):
+    _no_publish(monkeypatch)
+    eng = _db()
+    with Session(eng) as s:
+        s.exec(text("INSERT INTO embedding_generations (id, status, created_at) VALUES (1, 'active', CURRENT_TIMESTAMP)"))
+        s.commit()
+        g = embeddings.begin_generation(s)
+        embeddings.build_show_embeddings(s, generation=g)
+        # A second replica starting a rebuild leaves the running one alone
+        assert embeddings.begin_generation(s) is None
+        assert len(s.exec(select(EmbeddingShow).where(EmbeddingShow.generation == g)).all()) == 6
+
+        # ... unless it is abandoned; then the late activation must not flip anything
+        monkeypatch.setattr(embeddings, "EMB_BUILD_STALE_S", -1)
+        g2 = embeddings.begin_generation(s)
+        assert g2 == g + 1 and _generations(s)[g] == "dropped"
+        with pytest.raises(RuntimeError):
+            embeddings.activate_generation(s, g)
+        assert _generations(s)[1] == "active"
+
+        assert embeddings.activate_generation(s, g2) == 1
+        with pytest.raises(RuntimeError):
+            embeddings.activate_generation(s, g2)
+        assert _generations(s) == {1: "retired", g: "dropped", g2: "active"}
@@ -0,0 +1,58 @@
+import uuid
+from types import SimpleNamespace
+
+import sqlalchemy as sa
+from sqlmodel import Session, create_engine, select
+
+from apps.api.app.models import Event
+from services.recsys import fanout, jobs
+
+
+def test_shard_for_is_stable_and_in_range():
+    keys = [f"title-{i}" for i in range(200)]
+    first = [fanout.shard_for(k, 7) for k in keys]
+    assert first == [fanout.shard_for(k, 7) for k in keys]
+    assert set(first) == set(range(7))
+    assert all(fanout.shard_for(k, 1) == 0 for k in keys)
+
+
+def test_split_shards_partitions_in_order():
+    keys = [f"title-{i}" for i in range(50)]
+    buckets = fanout.split_shards(keys, 4)
+    assert len(buckets) == 4
+    assert sorted(k for b in buckets for k in b) == sorted(keys)
+    for i, b in enumerate(buckets):
+        assert all(fanout.shard_for(k, 4) == i for k in b)
+        assert b == [k for k in keys if k in b]
+    assert fanout.split_shards(keys, 0) == [keys]
+
+
+def test_key_range_clauses_cover_every_row_once():
+    eng = create_engine("sqlite://")
+    t = sa.Table("items", sa.MetaData(), sa.Column("id", sa.Uuid, primary_key=True))
+    t.create(eng)
+    ids = [uuid.uuid4() for _ in range(300)] + [uuid.UUID(int=0), uuid.UUID(int=(1 << 128) - 1)]
+    with eng.begin() as c:
+        c.execute(t.insert(), [{"id": i} for i in ids])
+        seen = []
+        for shard in range(5):
+            seen += c.execute(sa.select(t.c.id).where(*fanout.key_range_clauses(t.c.id, shard, 5))).scalars().all()
+    assert sorted(seen) == sorted(ids)
+    assert fanout.key_range(0, 1) == (None, None)
+
+
+def test_collect_fanout_sums_results_and_counts_failures(monkeypatch):
+    eng = create_engine("sqlite://")
+    Event.__table__.create(eng)
+    done = {"a": {"count_shows": 3, "ok": True}, "b": {"count_shows": 4}, "c": None}
+    monkeypatch.setattr(fanout, "_connection", lambda: object())
+    monkeypatch.setattr(fanout.Job, "fetch_many", lambda ids, connection: [
+        SimpleNamespace(return_value=lambda jid=jid: done[jid]) if jid != "gone" else None for jid in ids
+    ])
+    monkeypatch.setattr(jobs, "_engine", lambda: eng)
+    payload = fanout.collect_fanout("justwatch", ["a", "b", "c", "gone"])
+    assert payload["count_shows"] == 7
+    assert payload["shards"] == 4 and payload["failed_shards"] == 2
+    with Session(eng) as s:
+        ev = s.exec(select(Event)).one()
+    assert ev.kind == "admin:status:justwatch" and ev.payload["count_shows"] == 7
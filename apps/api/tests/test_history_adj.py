@@ -0,0 +1,70 @@
+import json
+from types import SimpleNamespace
+
+from sqlmodel import Session, create_engine
+from sqlalchemy import text
+
+from app import history_adj
+from app.history_adj import HistoryRecent, recent_for_profiles
+from app.vocab import VOCAB
+
+
+def _db():
+    eng = create_engine("sqlite://")
+    with eng.begin() as c:
+        c.execute(text("CREATE TABLE shows (id INTEGER PRIMARY KEY, title TEXT, metadata JSON)"))
+        c.execute(text("CREATE TABLE serializd_history (id INTEGER PRIMARY KEY, profile_ref TEXT, title_ref TEXT, show_id INTEGER, last_seen_ts TEXT)"))
+        c.execute(text("CREATE TABLE events (id INTEGER PRIMARY KEY, profile_id INTEGER, kind TEXT, payload JSON)"))
+        for i, (title, meta) in enumerate([
+            ("A", {"genres": ["drama"], "creators": ["x"]}),
+            ("B", {"genres": ["comedy"], "creators": ["y"]}),
+        ]):
+            c.execute(text("INSERT INTO shows (id, title, metadata) VALUES (:i, :t, :m)"), {"i": i, "t": title, "m": json.dumps(meta)})
+        # Son's row was resolved at ingest, so its title_ref need not match exactly
+        c.execute(text("INSERT INTO serializd_history (profile_ref, title_ref, show_id, last_seen_ts) VALUES ('Ross', 'A', NULL, '2024-01-01'), ('Son', 'b (2019)', 1, '2024-01-02')"))
+    return eng
+
+
+def test_adjacent_bits_matches_set_semantics():
+    recent = HistoryRecent([{"creators": ["x"], "genres": ["drama"]}])
+    for meta, expected in [
+        ({"creators": ["x"], "genres": []}, True),
+        ({"creators": [], "genres": ["drama", "comedy"]}, True),
+        ({"creators": ["z"], "genres": ["comedy"]}, False),
+    ]:
+        item = SimpleNamespace(id="s", meta=meta)
+        bits = VOCAB.show_bits(None, lambda: (meta["genres"], meta["creators"], [], []))
+        assert recent.is_adjacent(item) is expected
+        assert recent.adjacent_bits(bits) is expected
+    assert not HistoryRecent([])
+
+
+def test_recent_for_profiles_single_query_and_cache():
+    history_adj.invalidate()
+    eng = _db()
+    with Session(eng) as s:
+        recent = recent_for_profiles(s, [SimpleNamespace(name="Ross")])
+        assert recent.genres == {"drama"} and recent.creators == {"x"}
+        # Cached until a newer sync marker appears
+        s.exec(text("INSERT INTO serializd_history (profile_ref, title_ref, last_seen_ts) VALUES ('Ross', 'B', '2024-02-01')"))
+        assert recent_for_profiles(s, [SimpleNamespace(name="Ross")]) is recent
+        s.exec(text("INSERT INTO events (profile_id, kind, payload) VALUES (0, :k, '{}')"), params={"k": history_adj.HISTORY_STATUS_KIND})
+        history_adj._version = None  # skip the HISTORY_VERSION_CHECK_S wait
+        fresh = recent_for_profiles(s, [SimpleNamespace(name="Ross")])
+        assert fresh.genres == {"drama", "comedy"}
+        # No profile names: latest rows overall
+        assert recent_for_profiles(s, []).creators == {"x", "y"}
+    history_adj.invalidate()
+
+
+def test_duplicate_titles_resolve_to_one_show(monkeypatch):
+    eng = _db()
+    with eng.begin() as c:
+        # A remake sharing title "A": the unresolved row must not also pull in its tags
+        c.execute(text("INSERT INTO shows (id, title, metadata) VALUES (2, 'A', :m)"), {"m": json.dumps({"genres": ["horror"], "creators": ["z"]})})
+    seen = []
+    monkeypatch.setattr(history_adj, "HistoryRecent", lambda rows: seen.append(rows) or HistoryRecent(rows))
+    with Session(eng) as s:
+        recent = history_adj.load_recent(s, ["Ross"])
+    assert len(seen[0]) == 1
+    assert recent.genres == {"drama"} and recent.creators == {"x"}
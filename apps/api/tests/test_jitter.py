@@ -0,0 +1,45 @@
+import uuid
+from types import SimpleNamespace
+
+from app.ann_local import IVFIndex
+from app import jitter
+from app.jitter import jitter_for, jitter_table, stable_hash01
+
+
+def _artifact(n=300, version="g1-test"):
+    ids = [str(uuid.UUID(int=i)) for i in range(n)]
+    vecs = [[float(i % 7), 1.0, float(i % 3)] for i in range(n)]
+    return SimpleNamespace(version=version, index=IVFIndex.build(ids, vecs, generation=1))
+
+
+def test_table_reproduces_per_candidate_hash_exactly():
+    art = _artifact()
+    cands = [str(uuid.UUID(int=i)) for i in range(0, 300, 3)] + ["not-in-catalog"]
+    for seed in (None, 0, 123, 99):
+        got = jitter_for(art, seed, cands)
+        assert got == {c: stable_hash01(c, seed) for c in cands}
+
+
+def test_tables_are_cached_per_seed_and_version(monkeypatch):
+    monkeypatch.setattr(jitter, "JITTER_CACHE", 2)
+    monkeypatch.setattr(jitter, "JITTER_SEED_CACHE", 3)
+    monkeypatch.setattr(jitter, "_tables", type(jitter._tables)())
+    monkeypatch.setattr(jitter, "_seeded", type(jitter._seeded)())
+    art = _artifact(version="g1-cache")
+    a = jitter_table(art.version, art.index.ids)
+    assert jitter_table(art.version, art.index.ids) is a
+    s7 = jitter_table(art.version, art.index.ids, 7)
+    jitter_for(art, 7, [art.index.ids[0]])
+    assert jitter_table(art.version, art.index.ids, 7) is s7
+    # Many seeds only churn the seeded LRU; the seedless table stays
+    for seed in range(50):
+        jitter_for(art, seed, [art.index.ids[0]])
+    assert list(jitter._seeded) == [(47, "g1-cache"), (48, "g1-cache"), (49, "g1-cache")]
+    assert list(jitter._tables) == [art.version]
+    jitter_table("g2-cache", art.index.ids)
+    jitter_table("g3-cache", art.index.ids)
+    assert list(jitter._tables) == ["g2-cache", "g3-cache"]
+
+
+def test_no_artifact_falls_back_to_hashing():
+    assert jitter_for(None, 7, ["x", "y"]) == {"x": stable_hash01("x", 7), "y": stable_hash01("y", 7)}
@@ -0,0 +1,39 @@
+import numpy as np
+
+from app.mmr import mmr_order, mmr_select
+
+
+def _naive(rel, vecs, k, lam):
+    rel = (rel - rel.min()) / (rel.max() - rel.min())
+    chosen = []
+    for _ in range(k):
+        best, best_i = None, None
+        for i in range(len(rel)):
+            if i in chosen:
+                continue
+            red = max([0.0] + [float(vecs[i] @ vecs[j]) for j in chosen])
+            v = lam * rel[i] - (1 - lam) * red
+            if best is None or v > best:
+                best, best_i = v, i
+        chosen.append(best_i)
+    return chosen
+
+
+def _pool(n, dim=384, seed=1):
+    rng = np.random.default_rng(seed)
+    vecs = rng.normal(size=(n, dim)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    return rng.random(n), vecs
+
+
+def test_mmr_matches_naive_greedy():
+    rel, vecs = _pool(40, dim=8)
+    for lam in (0.3, 0.7, 1.0):
+        assert mmr_select(rel, vecs, 6, lam) == _naive(rel, vecs, 6, lam)
+    assert mmr_select(rel, vecs, 6, 1.0) == list(np.argsort(-rel)[:6])
+
+
+def test_mmr_avoids_near_duplicates():
+    vecs = np.asarray([[1, 0], [1, 0], [0, 1]], dtype=np.float32)
+    assert mmr_order(["a", "a2", "b"], [1.0, 0.99, 0.9], vecs, 2, 0.5) == ["a", "b", "a2"]
+
@@ -0,0 +1,52 @@
+import numpy as np
+
+from app.neighbors import _META_WEIGHT, neighbor_score, top_neighbors
+
+
+def _brute(mat, genres, length, r):
+    out = []
+    for j in range(len(mat)):
+        if j == r:
+            continue
+        g = bin(int(genres[r]) & int(genres[j])).count("1")
+        meta = min(1.0, max(0.0, 0.2 * g - 0.02 * abs(float(length[r]) - float(length[j]))))
+        out.append(((1 - _META_WEIGHT) * (1 + float(mat[r] @ mat[j])) / 2 + _META_WEIGHT * meta, j))
+    return sorted(out, key=lambda t: -t[0])
+
+
+def test_top_neighbors_match_brute_force():
+    rng = np.random.default_rng(4)
+    mat = rng.normal(size=(300, 16)).astype(np.float32)
+    mat /= np.linalg.norm(mat, axis=1, keepdims=True)
+    genres = rng.integers(0, 1 << 10, size=300).astype(np.uint64)
+    length = rng.choice([22, 30, 45, 60], size=300).astype(np.int16)
+    rows, scores = top_neighbors(mat, genres, length, k=10)
+    assert rows.shape == (300, 10)
+    for r in (0, 17, 299):
+        want = _brute(mat, genres, length, r)[:10]
+        assert np.allclose(scores[r], [s for s, _ in want], atol=1e-5)
+        assert r not in rows[r].tolist()
+        assert list(scores[r]) == sorted(scores[r], reverse=True)
+
+
+def test_top_neighbors_small_catalog():
+    mat = np.eye(2, dtype=np.float32)
+    rows, scores = top_neighbors(mat, np.zeros(2, dtype=np.uint64), np.array([30, 30]), k=50)
+    assert rows.tolist() == [[1], [0]]
+    rows, _ = top_neighbors(mat[:1], np.zeros(1, dtype=np.uint64), np.array([30]), k=50)
+    assert rows.shape == (1, 0)
+
+
+def test_neighbor_score_matches_precomputed_scores():
+    rng = np.random.default_rng(9)
+    mat = rng.normal(size=(50, 8)).astype(np.float32)
+    mat /= np.linalg.norm(mat, axis=1, keepdims=True)
+    genres = rng.integers(0, 1 << 6, size=50).astype(np.uint64)
+    length = rng.choice([22, 30, 45], size=50).astype(np.int16)
+    rows, scores = top_neighbors(mat, genres, length, k=5)
+    for j, sc in zip(rows[3].tolist(), scores[3].tolist()):
+        g = bin(int(genres[3]) & int(genres[j])).count("1")
+        assert abs(neighbor_score(float(mat[3] @ mat[j]), g, int(length[3]) - int(length[j])) - sc) < 1e-5
+    # Without vectors only the genre/length heuristic counts, clipped to [0, 1]
+    assert abs(neighbor_score(None, 3, -10) - 0.4) < 1e-9
+    assert neighbor_score(None, 0, 30) == 0.0 and neighbor_score(None, 9, 0) == 1.0
@@ -0,0 +1,71 @@
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from app import queue
+from app.models import EmbeddingProfile
+from app.routers import profiles
+from app.schemas import ProfileCreate
+
+
+class _FakeRedis:
+    def __init__(self, fail=False):
+        self.keys = {}
+        self.fail = fail
+
+    def set(self, key, value, nx=False, ex=None):
+        if self.fail:
+            raise ConnectionError("redis down")
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        return True
+
+    def delete(self, key):
+        self.keys.pop(key, None)
+
+
+class _FakeQueue:
+    def __init__(self, fail_set=False, fail_enqueue=False):
+        self.connection = _FakeRedis(fail_set)
+        self.fail_enqueue = fail_enqueue
+        self.jobs = []
+
+    def enqueue_in(self, delay, name, kwargs=None, job_id=None):
+        if self.fail_enqueue:
+            raise ConnectionError("redis down")
+        self.jobs.append(job_id)
+
+
+def test_rebuild_debounces_and_follow_up_gets_a_new_job_id(monkeypatch):
+    q = _FakeQueue()
+    monkeypatch.setattr(queue, "get_queue", lambda name=queue.QUEUE_HIGH: q)
+    assert queue.enqueue_profile_rebuild(7)
+    assert queue.enqueue_profile_rebuild(7)
+    assert len(q.jobs) == 1
+    # The running task clears the marker; a write during the rebuild schedules a follow-up
+    q.connection.delete(queue.rebuild_pending_key(7))
+    assert queue.enqueue_profile_rebuild(7)
+    assert len(q.jobs) == 2 and q.jobs[0] != q.jobs[1]
+    assert all(j.startswith("rebuild_profile_embedding:7:") for j in q.jobs)
+
+
+def test_rebuild_reports_redis_failures(monkeypatch):
+    q = _FakeQueue(fail_set=True)
+    monkeypatch.setattr(queue, "get_queue", lambda name=queue.QUEUE_HIGH: q)
+    assert queue.enqueue_profile_rebuild(7) is False
+    q = _FakeQueue(fail_enqueue=True)
+    monkeypatch.setattr(queue, "get_queue", lambda name=queue.QUEUE_HIGH: q)
+    assert queue.enqueue_profile_rebuild(7) is False
+    # The marker is released so the next write retries instead of riding along
+    assert queue.rebuild_pending_key(7) not in q.connection.keys
+
+
+def test_profiles_rebuild_inline_when_redis_fails(monkeypatch):
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(eng)
+    monkeypatch.setattr(queue, "get_queue", lambda name=queue.QUEUE_HIGH: _FakeQueue(fail_set=True))
+    monkeypatch.setattr(profiles, "invalidate_for_email", lambda email: None)
+    with Session(eng) as s:
+        out = profiles.create_or_update_profiles([ProfileCreate(name="Ross")], session=s, authorization="devtoken:demo@local.test")
+        rows = s.exec(select(EmbeddingProfile)).all()
+    assert [r.profile_id for r in rows] == [out[0].id]
@@ -0,0 +1,74 @@
+import numpy as np
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from app import embeddings_util
+from app.embeddings_util import apply_rating_delta, rebuild_profile_embedding
+from app.models import EmbeddingProfile, Profile, ProfileName, Rating, Show
+from app.routers.onboarding import OnboardingPayload, save_onboarding
+
+
+def _db():
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(eng)
+    with Session(eng) as s:
+        s.add(Profile(id=1, user_id=1, name=ProfileName.Ross))
+        for i in range(8):
+            s.add(Show(title=f"Show {i}", meta={"genres": [f"g{i % 3}"], "creators": [f"c{i}"]}))
+        s.commit()
+    return eng
+
+
+def _row(s, pid=1):
+    return s.exec(select(EmbeddingProfile).where(EmbeddingProfile.profile_id == pid).execution_options(populate_existing=True)).one()
+
+
+def test_onboarding_counts_each_seeded_rating_once():
+    eng = _db()
+    with Session(eng) as s:
+        ids = [str(sh.id) for sh in s.exec(select(Show)).all()]
+        payload = OnboardingPayload(profile_id=1, loves=ids[:3], dislikes=ids[3:5])
+        # No embedding row yet: one rebuild covers every seeded rating
+        save_onboarding(payload, session=s, authorization="Bearer devtoken:demo@local.test")
+        row = _row(s)
+        assert row.n_ratings == 5
+        first = np.array(row.emb_sum)
+        rebuild_profile_embedding(s, 1)
+        assert np.allclose(first, _row(s).emb_sum)
+        # With sums stored, a second onboarding applies deltas on top
+        save_onboarding(OnboardingPayload(profile_id=1, loves=ids[5:7]), session=s, authorization="devtoken:demo@local.test")
+        assert _row(s).n_ratings == 7
+        delta = np.array(_row(s).emb_sum)
+        rebuild_profile_embedding(s, 1)
+        assert np.allclose(delta, _row(s).emb_sum)
+
+
+def test_delta_rereads_row_under_lock(monkeypatch):
+    eng = _db()
+    with Session(eng) as a, Session(eng) as b:
+        shows = a.exec(select(Show)).all()
+        a.add(Rating(profile_id=1, show_id=shows[0].id, primary=2))
+        a.commit()
+        rebuild_profile_embedding(a, 1)
+        stale = a.get(EmbeddingProfile, (1, 1))
+        assert stale.n_ratings == 1
+
+        # Another writer lands between our read and our write
+        b.add(Rating(profile_id=1, show_id=shows[1].id, primary=1))
+        b.commit()
+        apply_rating_delta(b, 1, shows[1].id, None, 1)
+
+        seen = []
+        real_exec = a.exec
+        monkeypatch.setattr(a, "exec", lambda stmt, *args, **kw: seen.append(stmt) or real_exec(stmt, *args, **kw))
+        a.add(Rating(profile_id=1, show_id=shows[2].id, primary=0))
+        a.commit()
+        apply_rating_delta(a, 1, shows[2].id, None, 0)
+        assert any(getattr(st, "_for_update_arg", None) is not None for st in seen)
+
+        row = _row(a)
+        assert row.n_ratings == 3
+        merged = np.array(row.emb_sum)
+        rebuild_profile_embedding(a, 1)
+        assert np.allclose(merged, _row(a).emb_sum)
+    embeddings_util._active_gen = None
@@ -10,3 +10,53 @@ def test_readyz_endpoint_schema():
     body = r.json()
     assert 'status' in body and 'checks' in body
 
+
+
+def _vector_db():
+    from sqlmodel import SQLModel, create_engine
+    from sqlalchemy.pool import StaticPool
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(eng)
+    return eng
+
+
+def test_readyz_reports_cached_vector_state(monkeypatch):
+    # main.py's /readyz is a stub; exercise the ready router on its own app
+    from fastapi import FastAPI
+    from sqlmodel import Session
+    from apps.api.app import embeddings_util, vector_state
+    from apps.api.app.routers import ready
+
+    eng = _vector_db()
+    monkeypatch.setattr(ready, "get_session", lambda: iter([Session(eng)]))
+    monkeypatch.setattr(ready, "get_redis", lambda: None)
+    embeddings_util._active_gen = None
+    vector_state.invalidate()
+    api = FastAPI()
+    api.include_router(ready.router)
+    vec = TestClient(api).get('/readyz').json()['checks']['vectors']
+    assert vec['ok'] is True
+    assert {'generation', 'pgvector', 'show_vectors', 'show_index', 'sql_ann_ready'} <= set(vec)
+    assert vec['source'] == 'probe' and vec['pgvector'] is False
+    vector_state.invalidate()
+
+
+def test_vector_state_prefers_job_record_and_caches():
+    from sqlmodel import Session
+    from apps.api.app import embeddings_util, vector_state
+
+    eng = _vector_db()
+    embeddings_util._active_gen = None
+    vector_state.invalidate()
+    with Session(eng) as s:
+        job = vector_state.VectorState(generation=1, pgvector=True, show_vectors=500, profile_vectors=3,
+                                       show_index=True, checked_at="2025-01-01T00:00:00", source="job")
+        vector_state.record(s, job)
+        st = vector_state.vector_state(s)
+        assert st.source == 'job' and st.sql_ann_ready
+        # Served from the per-process cache until the TTL or generation changes
+        vector_state.record(s, vector_state.VectorState(**{**job.__dict__, "show_vectors": 1}))
+        assert vector_state.vector_state(s) is st
+        vector_state.invalidate()
+        assert vector_state.vector_state(s).show_vectors == 1
+    vector_state.invalidate()
@@ -0,0 +1,79 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.vocab import VOCAB
+from app.recs import PrefTables, ScoringContext, _apply_feedback, _bits, _compile_pref, _score_show
+
+
+def _show(i: int):
+    return SimpleNamespace(
+        id=uuid.UUID(int=i),
+        title=f"Show {i}",
+        metadata={
+            "genres": ["comedy", "drama"] if i % 2 else ["mystery"],
+            "creators": [f"c{i % 7}"],
+            "episode_length": 25 + (i % 5) * 10,
+            "seasons": 1 + i % 4,
+        },
+        flags=["funny", "slow"] if i % 3 == 0 else ["warm"],
+        warnings=[],
+    )
+
+
+PREF = {
+    "creators_like": ["c1"],
+    "creators_dislike": ["c2"],
+    "mood": {"humor": 3, "optimism": 2, "tone": 3, "pacing": 1, "complexity": 1},
+    "constraints": {"ep_length_max": 40, "avoid_dnf": True},
+}
+
+
+def _ctx(n: int):
+    # Candidates are interned before the request masks, as in recommendations_for_profiles
+    for i in range(n):
+        _bits(_show(i))
+    return ScoringContext.build(
+        intent="default",
+        seed=7,
+        liked_tags_by_profile={1: {"funny"}, 2: {"warm"}},
+        last_note_by_profile={1: "too slow but cozy", 2: ""},
+        rating_map_by_profile={1: {str(uuid.UUID(int=i)): i % 3 for i in range(0, n, 4)}, 2: {str(uuid.UUID(int=1)): 2}},
+        history_recent=None,
+        pref=PREF,
+    )
+
+
+def test_compiled_preferences_score_like_raw_preferences():
+    for i in range(40):
+        _bits(_show(i))
+    pt = _compile_pref(PREF)
+    assert isinstance(pt, PrefTables)
+    for i in range(40):
+        s = _show(i)
+        assert _score_show(s, "default", {"drama"}, {"c3"}, 0.5, pref=PREF) == _score_show(s, "default", {"drama"}, {"c3"}, 0.5, pref=pt)
+
+
+def test_context_precomputes_request_invariants():
+    ctx = _ctx(40)
+    assert VOCAB.vocabs["flag"].decode(ctx.liked_tag_mask) == {"funny", "warm"}
+    assert abs(ctx.note_nudge - (-0.12 + 0.10)) < 1e-9
+    # profile 1 rated show 0 BAD (i % 3 == 0); show 1 rated VERY GOOD by profile 2 only
+    s0, s1 = str(uuid.UUID(int=0)), str(uuid.UUID(int=1))
+    assert ctx.rating_prior[s0] < 0 and ctx.rating_prior[s1] > 0
+
+
+def test_candidate_loop_does_no_request_setup(monkeypatch):
+    from app import recs
+
+    n = 200
+    shows = [_show(i) for i in range(n)]
+    ctx = _ctx(n)
+    liked_g, liked_c = VOCAB.mask("genre", ["drama"]), VOCAB.mask("creator", ["c3"])
+    fail = lambda *a, **k: pytest.fail("request invariant rebuilt per candidate")  # noqa: E731
+    monkeypatch.setattr(recs, "_compile_pref", fail)
+    monkeypatch.setattr(recs.VOCAB, "mask", fail)
+    for s in shows:
+        sc, why, nov = _score_show(s, ctx.intent, liked_g, liked_c, 0.5, pref=ctx.pref)
+        _apply_feedback(show=s, base_score=sc, ctx=ctx)
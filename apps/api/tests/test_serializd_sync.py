@@ -0,0 +1,193 @@
+import os
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from apps.api.app import embeddings_util, queue
+from apps.api.app.embeddings_util import rebuild_profile_embedding
+from apps.api.app.models import EmbeddingProfile, Event, Profile, ProfileName, Rating, Show, User
+from services.recsys import jobs
+from services.recsys.adapters.serializd import SerializdAdapter
+from services.recsys.adapters.types import HistoryItem
+
+
+def _db():
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(eng)
+    with Session(eng) as s:
+        s.add(User(id=1, email="sz@local.test"))
+        s.add(Profile(id=1, user_id=1, name=ProfileName.Ross))
+        for i in range(4):
+            s.add(Show(title=f"Show {i}", meta={"genres": [f"g{i}"]}))
+        s.commit()
+    return eng
+
+
+def _sync(monkeypatch, eng, records):
+    marks = []
+    monkeypatch.setenv("USE_REAL_SERIALIZD", "true")
+    monkeypatch.setenv("SERIALIZD_USER", "sz@local.test")
+    monkeypatch.setattr(jobs, "_engine", lambda: eng)
+    monkeypatch.setattr(jobs, "_watermark", lambda s, source, scope: None)
+    monkeypatch.setattr(jobs, "_advance_watermark", lambda s, source, scope, ts: marks.append(ts))
+    monkeypatch.setattr(SerializdAdapter, "ratings", lambda self, since=None: records)
+    monkeypatch.setattr(queue, "get_queue", lambda name=queue.QUEUE_HIGH: None)
+    return jobs.sync_serializd_ratings(), marks
+
+
+def _rec(title, rating, day):
+    return {"title": title, "rating": rating, "updated_at": f"2024-01-{day:02d}T00:00:00Z"}
+
+
+def _ratings(s):
+    return sorted(((r.show_id, r.primary, r.source, r.note) for r in s.exec(select(Rating)).all()), key=lambda t: (str(t[0]), t[2] or ""))
+
+
+def test_sync_upserts_only_its_own_rows_and_updates_the_embedding(monkeypatch):
+    eng = _db()
+    with Session(eng) as s:
+        shows = {sh.title: sh.id for sh in s.exec(select(Show)).all()}
+        # A plain rating entered in the app (no note or tags): the sync must not take it over
+        s.add(Rating(profile_id=1, show_id=shows["Show 0"], primary=0))
+        s.commit()
+        rebuild_profile_embedding(s, 1)
+
+    n, _ = _sync(monkeypatch, eng, [_rec("Show 0", 9, 1), _rec("Show 1", 5, 2)])
+    assert n == 2
+    n, _ = _sync(monkeypatch, eng, [_rec("Show 0", 9, 1), _rec("Show 1", 2, 3)])
+    assert n == 1
+    with Session(eng) as s:
+        assert _ratings(s) == sorted([
+            (shows["Show 0"], 0, None, None),
+            (shows["Show 0"], 2, "serializd", None),
+            (shows["Show 1"], 0, "serializd", None),
+        ], key=lambda t: (str(t[0]), t[2] or ""))
+        # Deltas kept the stored sums in step with a full rebuild
+        row = s.exec(select(EmbeddingProfile).where(EmbeddingProfile.profile_id == 1)).one()
+        synced = (np.array(row.emb_sum), row.n_ratings)
+        rebuild_profile_embedding(s, 1)
+        row = s.exec(select(EmbeddingProfile).where(EmbeddingProfile.profile_id == 1).execution_options(populate_existing=True)).one()
+        assert synced[1] == row.n_ratings == 3
+        assert np.allclose(synced[0], row.emb_sum)
+    embeddings_util._active_gen = None
+
+
+def test_unresolved_records_are_parked_and_do_not_hold_the_watermark(monkeypatch):
+    eng = _db()
+    _, marks = _sync(monkeypatch, eng, [_rec("Show 0", 9, 1), _rec("Not In Catalog", 9, 2), _rec("Show 1", 9, 5)])
+    assert marks == [datetime(2024, 1, 5, tzinfo=timezone.utc)]
+    with Session(eng) as s:
+        parked = s.exec(select(Event).where(Event.kind == jobs.SERIALIZD_UNRESOLVED_KIND)).all()
+        assert [e.payload["item"]["title"] for e in parked] == ["Not In Catalog"]
+        s.add(Show(title="Not In Catalog"))
+        s.commit()
+    # The record is not re-read from Serializd; the parked copy resolves once the show exists
+    n, _ = _sync(monkeypatch, eng, [])
+    assert n == 1
+    with Session(eng) as s:
+        show_id = s.exec(select(Show.id).where(Show.title == "Not In Catalog")).one()
+        assert s.exec(select(Rating).where(Rating.show_id == show_id)).one().source == "serializd"
+        assert s.exec(select(Event).where(Event.kind == jobs.SERIALIZD_UNRESOLVED_KIND)).all() == []
+    embeddings_util._active_gen = None
+
+
+def test_history_rows_are_deduplicated_per_event():
+    ts = [datetime(2024, 1, d) for d in (1, 3, 2)]
+    rows = [
+        {"profile_ref": "Ross", "title_ref": "Show", "tmdb_id": None, "season": 1, "episode": 2, "status": "watched", "last_seen_ts": ts[0]},
+        {"profile_ref": "Ross", "title_ref": " show", "tmdb_id": None, "season": 1, "episode": 2, "status": "watched", "last_seen_ts": ts[1]},
+        {"profile_ref": "Ross", "title_ref": "SHOW ", "tmdb_id": None, "season": 1, "episode": 2, "status": "watched", "last_seen_ts": ts[2]},
+        {"profile_ref": "Ross", "title_ref": None, "tmdb_id": None, "season": 1, "episode": 2, "status": "watched", "last_seen_ts": ts[0]},
+        {"profile_ref": "Ross", "title_ref": None, "tmdb_id": None, "season": 1, "episode": 2, "status": "watched", "last_seen_ts": ts[0]},
+        {"profile_ref": "Son", "title_ref": "Show", "tmdb_id": 7, "season": None, "episode": None, "status": "watched", "last_seen_ts": ts[0]},
+    ]
+    out = jobs._dedupe_events(rows)
+    assert [r["last_seen_ts"] for r in out if r["title_ref"] and r["profile_ref"] == "Ross"] == [ts[1]]
+    # Rows without a title identity never conflict, so each is kept
+    assert len(out) == 4
+    assert jobs._event_key(rows[5]) == "tmdb:7|||watched"
+
+
+pg = pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="needs TEST_POSTGRES_URL")
+
+
+@pytest.fixture
+def pg_engine(monkeypatch):
+    schema = f"sz_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(os.environ["TEST_POSTGRES_URL"])
+    with admin.begin() as c:
+        c.execute(text(f"CREATE SCHEMA {schema}"))
+    eng = create_engine(os.environ["TEST_POSTGRES_URL"], connect_args={"options": f"-csearch_path={schema}"})
+    with eng.begin() as c:
+        c.execute(text(
+            "CREATE TABLE serializd_history (id serial PRIMARY KEY, profile_ref text, title_ref text, tmdb_id int, show_id uuid,"
+            " season int, episode int, status text, rating int, last_seen_ts timestamptz, raw jsonb)"
+        ))
+        c.execute(text(
+            "ALTER TABLE serializd_history ADD COLUMN event_key text GENERATED ALWAYS AS ("
+            "CASE WHEN tmdb_id IS NOT NULL OR title_ref IS NOT NULL THEN coalesce('tmdb:' || tmdb_id::text, 'title:' || lower(btrim(title_ref)))"
+            " || '|' || coalesce(season::text, '') || '|' || coalesce(episode::text, '') || '|' || status END) STORED"
+        ))
+        c.execute(text("CREATE UNIQUE INDEX uq_hist_profile_event ON serializd_history (profile_ref, event_key)"))
+        c.execute(text(
+            "CREATE TABLE ratings (id serial PRIMARY KEY, profile_id int, show_id uuid, \"primary\" int, nuance_tags text[],"
+            " note text, source varchar(16), created_at timestamp DEFAULT now(), updated_at timestamp DEFAULT now())"
+        ))
+        c.execute(text("CREATE TABLE shows (id uuid PRIMARY KEY, title text, year_start int, tmdb_id int, imdb_id text)"))
+        c.execute(text("CREATE TABLE events (id serial PRIMARY KEY, profile_id int, kind text, payload jsonb, created_at timestamp DEFAULT now())"))
+        c.execute(text(
+            "CREATE TABLE sync_watermarks (source varchar(32), scope text, last_seen_ts timestamptz,"
+            " updated_at timestamptz NOT NULL DEFAULT now(), PRIMARY KEY (source, scope))"
+        ))
+    monkeypatch.setattr(jobs, "_engine", lambda: eng)
+    yield eng
+    eng.dispose()
+    with admin.begin() as c:
+        c.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+
+
+@pg
+def test_history_upsert_counts_only_written_rows(monkeypatch, pg_engine):
+    def item(ep, rating, day):
+        ts = datetime(2024, 1, day, tzinfo=timezone.utc)
+        return HistoryItem(profile_ref="Ross", title_ref="Show", tmdb_id=None, season=1, episode=ep, status="watched", rating=rating, last_seen_ts=ts, raw={"updated_at": ts.isoformat()})
+
+    monkeypatch.setattr(jobs, "_watermark", lambda s, source, scope: None)
+    batches = [[item(1, 5, 1), item(2, 5, 1)], [item(1, 5, 1), item(2, 8, 2), item(3, 5, 2)]]
+    monkeypatch.setattr(SerializdAdapter, "fetch_watch_history", lambda self, since=None: batches.pop(0))
+    assert jobs.job_sync_serializd(user="Ross") == {"count": 2, "inserted": 2, "updated": 0, "dry_run": False}
+    # Unchanged episode 1 is skipped by the upsert's WHERE and not counted
+    assert jobs.job_sync_serializd(user="Ross") == {"count": 3, "inserted": 1, "updated": 1, "dry_run": False}
+    with Session(pg_engine) as s:
+        assert s.exec(text("SELECT count(*) FROM serializd_history")).one()[0] == 3
+        assert s.exec(text("SELECT last_seen_ts FROM sync_watermarks WHERE source = 'serializd_history'")).one()[0] == datetime(2024, 1, 2, tzinfo=timezone.utc)
+
+
+@pg
+def test_compaction_only_collapses_synced_ratings(monkeypatch, pg_engine):
+    rebuilt = []
+    monkeypatch.setattr(jobs, "_rebuild_profiles", lambda s, pids: rebuilt.extend(pids))
+    show, other = uuid.uuid4(), uuid.uuid4()
+    with Session(pg_engine) as s:
+        s.exec(text(
+            "INSERT INTO ratings (profile_id, show_id, \"primary\", note, source, updated_at) VALUES"
+            " (1, :a, 2, NULL, 'serializd', '2024-01-01'), (1, :a, 0, NULL, 'serializd', '2024-01-02'),"
+            " (1, :a, 1, NULL, NULL, '2024-01-01'), (1, :a, 2, NULL, NULL, '2024-01-03'), (1, :a, 1, 'loved the ending', 'serializd', '2024-01-01'),"
+            " (2, :b, 2, NULL, NULL, '2024-01-01'), (2, :b, 1, NULL, 'serializd', '2024-01-02')"
+        ), params={"a": show, "b": other})
+        s.commit()
+    assert jobs.job_compact_serializd(dry_run=True)["ratings"] == 1
+    assert jobs.job_compact_serializd()["ratings"] == 1
+    assert rebuilt == [1]
+    with Session(pg_engine) as s:
+        left = s.exec(text("SELECT profile_id, \"primary\", note, source FROM ratings ORDER BY id")).all()
+    # App ratings survive beside the synced ones, however old, and whatever their score
+    assert [tuple(r) for r in left] == [
+        (1, 0, None, "serializd"), (1, 1, None, None), (1, 2, None, None), (1, 1, "loved the ending", "serializd"),
+        (2, 2, None, None), (2, 1, None, "serializd"),
+    ]
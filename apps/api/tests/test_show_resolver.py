@@ -0,0 +1,43 @@
+from app.show_resolver import ShowResolver, normalize_title
+
+
+ROWS = [
+    ("s1", "The Office (US)", 2005, 2316, "tt0386676"),
+    ("s2", "The Office", 2001, 2996, "tt0290978"),
+    ("s3", "Law & Order", 1990, None, None),
+    ("s4", "Dark", 2017, 70523, None),
+    ("s5", "Dark", 1992, None, None),
+    ("s6", "Slow Horses", 2022, None, None),
+]
+
+
+def test_normalize_title():
+    assert normalize_title("The Office (US)") == "office us"
+    assert normalize_title("Law & Order") == "law and order"
+    assert normalize_title("  Amélie!! ") == "amelie"
+
+
+def test_resolution_order():
+    r = ShowResolver(ROWS)
+    # Identifiers win over titles
+    assert r.resolve(title="Something Else", tmdb_id=2996) == "s2"
+    assert r.resolve(title="Something Else", imdb_id="TT0386676") == "s1"
+    # (title, year), including a year suffix on the title
+    assert r.resolve(title="Dark", year=1992) == "s5"
+    assert r.resolve(title="Dark (2017)") == "s4"
+    assert r.resolve(title="the office", year=2001) == "s2"
+    # Title only, nearest year among duplicates
+    assert r.resolve(title="law and order") == "s3"
+    assert r.resolve(title="Dark", year=2019) == "s4"
+    # Fuzzy fallback for small spelling differences only
+    assert r.resolve(title="Slow Horse") == "s6"
+    assert r.resolve(title="Fast Horses Racing") is None
+    assert r.resolve(title="") is None
+    assert r.stats == {"tmdb": 1, "imdb": 1, "title_year": 3, "title": 2, "fuzzy": 1, "unresolved": 2}
+
+
+def test_bulk_resolution_in_memory():
+    rows = [(f"id{i}", f"Show Number {i}", 2000 + i % 20, None, None) for i in range(5000)]
+    r = ShowResolver(rows)
+    assert [r.resolve(title=f"show number {i}") for i in range(0, 5000, 7)] == [f"id{i}" for i in range(0, 5000, 7)]
+    assert r.resolve(title="Show Numbr 4999") == "id4999"
@@ -1,9 +1,41 @@
+import random
+
 from fastapi.testclient import TestClient
 from app.main import app
+from app.substitutes import SubstituteIndex, best_among, genre_length_sim
 
 client = TestClient(app)
 
 
+def _feats(n: int, rnd: random.Random):
+    return [(rnd.getrandbits(12) & rnd.getrandbits(12) & rnd.getrandbits(12), rnd.choice([20, 22, 25, 30, 42, 45, 50, 60])) for _ in range(n)]
+
+
+def _brute(feats, genres, length, exclude):
+    pool = [i for i in range(len(feats)) if i not in exclude]
+    return max(pool, key=lambda i: genre_length_sim(genres, length, *feats[i]), default=None)
+
+
+def test_best_matches_full_scan_including_ties():
+    rnd = random.Random(11)
+    for _ in range(300):
+        feats = _feats(rnd.randint(0, 60), rnd)
+        idx = SubstituteIndex(feats)
+        genres, length = rnd.getrandbits(12) & rnd.getrandbits(12), rnd.choice([21, 25, 35, 44, 90])
+        exclude = {i for i in range(len(feats)) if rnd.random() < 0.2}
+        assert idx.best(genres, length, exclude) == _brute(feats, genres, length, exclude)
+
+
+def test_best_among_matches_index_restricted_to_neighbours():
+    rnd = random.Random(5)
+    for _ in range(300):
+        feats = _feats(rnd.randint(1, 60), rnd)
+        near = {i for i in range(len(feats)) if rnd.random() < 0.3}
+        genres, length = rnd.getrandbits(12) & rnd.getrandbits(12), rnd.choice([21, 25, 35, 44, 90])
+        want = SubstituteIndex(feats).best(genres, length, set(range(len(feats))) - near)
+        assert best_among(genres, length, ((i, *feats[i]) for i in near)) == want
+
+
 def _auth():
     return client.post("/auth/magic", json={"email": "demo@local.test"}).json()["token"]
 
@@ -0,0 +1,13 @@
+import math
+
+from app.embeddings_util import _vec_for_token, token_hash_raw
+
+
+def test_token_vectors_are_memoized_and_normalized():
+    _vec_for_token.cache_clear()
+    v = _vec_for_token("genre:drama")
+    assert _vec_for_token("genre:drama") is v
+    assert _vec_for_token.cache_info().hits >= 1
+    assert abs(math.sqrt(sum(x * x for x in v)) - 1.0) < 1e-9
+    raw = token_hash_raw("genre:drama")
+    assert len(raw) == 384 and all(-1.0 <= x <= 1.0 for x in raw)
@@ -0,0 +1,22 @@
+import random
+import uuid
+from types import SimpleNamespace
+
+from app.recs import Scored, _comfort_key, _discovery_key, _top_k
+
+
+def _pool(n: int, seed: int = 5):
+    rnd = random.Random(seed)
+    # coarse scores/novelty so ties on both and only the id breaks them
+    return [
+        Scored(show=SimpleNamespace(id=uuid.UUID(int=rnd.getrandbits(64))), score=rnd.choice([0.5, 0.75, 1.0]), why=[], novelty=rnd.choice([0.2, 0.4]))
+        for _ in range(n)
+    ]
+
+
+def test_top_k_matches_full_sort():
+    pool = _pool(500)
+    for key in (_comfort_key, _discovery_key):
+        for k in (0, 1, 6, 16, 499, 500, 800):
+            assert _top_k(pool, k, key) == sorted(pool, key=key)[:k]
+
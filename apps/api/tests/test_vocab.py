@@ -0,0 +1,75 @@
+import sys
+import uuid
+from types import SimpleNamespace
+
+from app.vocab import TagVocabulary, overlap
+from app.recs import _boundary_violates, _familiarity
+
+
+def _show(i: int):
+    return SimpleNamespace(
+        id=uuid.UUID(int=i),
+        metadata={"genres": [f"g{i % 11}", f"g{i % 5}"], "creators": [f"c{i % 13}"]},
+        flags=["funny"] if i % 2 else ["slow", "warm"],
+        warnings=[f"w{i % 6}"] if i % 3 else [],
+    )
+
+
+def test_vocab_masks_round_trip():
+    v = TagVocabulary()
+    m = v.intern("genre", ["drama", "comedy", "drama"])
+    assert v.vocabs["genre"].decode(m) == {"drama", "comedy"}
+    assert overlap(m, v.mask("genre", ["comedy", "mystery"])) == 1
+    assert v.mask("genre", []) == 0
+
+
+def test_request_values_do_not_grow_the_vocabulary():
+    v = TagVocabulary()
+    v.show_bits(None, lambda: (["drama"], ["c1"], ["funny"], ["gore"]))
+    for i in range(1000):
+        v.mask("creator", [f"user-typed-{i}"])
+    assert v.mask("creator", ["c1", "nobody"]) == v.intern("creator", ["c1"])
+    assert [len(x) for x in v.vocabs.values()] == [1, 1, 1, 1]
+
+
+def test_show_bits_memoized_per_key():
+    v = TagVocabulary(max_shows=2)
+    calls = []
+
+    def load():
+        calls.append(1)
+        return ["a"], ["b"], ["c"], ["d"]
+
+    assert v.show_bits(("1", None), load) == v.show_bits(("1", None), load)
+    assert len(calls) == 1
+    v.show_bits(("2", None), load)
+    v.show_bits(("3", None), load)
+    v.show_bits(("1", None), load)  # evicted, reloaded
+    assert len(calls) == 4
+
+
+def test_bitset_scoring_matches_set_semantics():
+    liked_g = {"g1", "g3", "g7"}
+    liked_c = {"c2", "c5"}
+    boundaries = {"w1": True, "w4": True, "w2": False}
+    banned = {k for k, v in boundaries.items() if v}
+    for i in range(200):
+        s = _show(i)
+        g, c = set(s.metadata["genres"]), set(s.metadata["creators"])
+        want = min(1.0, 0.15 * len(g & liked_g) + 0.3 * len(c & liked_c))
+        assert _familiarity(s, liked_g, liked_c) == want
+        assert _boundary_violates(s, boundaries) == bool(set(s.warnings) & banned)
+
+
+def test_bitset_overlap_matches_sets_in_less_memory():
+    n = 5000
+    v = TagVocabulary()
+    tag_sets = [{f"t{(i * 7 + j) % 97}" for j in range(6)} for i in range(n)]
+    liked = {f"t{j}" for j in range(0, 97, 5)}
+    masks = [v.intern("flag", ts) for ts in tag_sets]
+    liked_m = v.mask("flag", liked)
+    assert [len(ts & liked) for ts in tag_sets] == [overlap(m, liked_m) for m in masks]
+
+    mem_set = sum(sys.getsizeof(ts) + sum(sys.getsizeof(t) for t in ts) for ts in tag_sets)
+    mem_bits = sum(sys.getsizeof(m) for m in masks)
+    assert mem_bits < mem_set
@@ -0,0 +1,25 @@
+"""add metadata fingerprint to embeddings_show
+
+Revision ID: 0008_embedding_fingerprints
+Revises: 0007_add_season_to_offers
+Create Date: 2025-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008_embedding_fingerprints'
+down_revision = '0007_add_season_to_offers'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Fingerprint of the tokenized show metadata the embedding was built from;
+    # the nightly rebuild only recomputes rows whose fingerprint changed.
+    op.add_column('embeddings_show', sa.Column('fingerprint', sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('embeddings_show', 'fingerprint')
@@ -0,0 +1,28 @@
+"""store running rating-weighted sums on embeddings_profile
+
+Revision ID: 0009_profile_embedding_sums
+Revises: 0008_embedding_fingerprints
+Create Date: 2025-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '0009_profile_embedding_sums'
+down_revision = '0008_embedding_fingerprints'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Unnormalised sum of weighted show vectors plus rating count; rating writes
+    # apply an O(dim) delta and re-normalise into emb/emb_v.
+    op.add_column('embeddings_profile', sa.Column('emb_sum', postgresql.ARRAY(sa.Float), nullable=True))
+    op.add_column('embeddings_profile', sa.Column('n_ratings', sa.Integer, server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('embeddings_profile', 'n_ratings')
+    op.drop_column('embeddings_profile', 'emb_sum')
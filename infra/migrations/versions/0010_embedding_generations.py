@@ -0,0 +1,53 @@
+"""blue-green embedding generations
+
+Revision ID: 0010_embedding_generations
+Revises: 0009_profile_embedding_sums
+Create Date: 2025-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0010_embedding_generations'
+down_revision = '0009_profile_embedding_sums'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Each rebuild writes a new generation alongside the active one; readers filter on
+    # the single 'active' row here, so cutover is one pointer update.
+    op.create_table(
+        'embedding_generations',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('status', sa.String(16), nullable=False, server_default='building'),  # building|active|retired|dropped
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('activated_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_embedding_generations_active ON embedding_generations (status) WHERE status = 'active'")
+    op.execute("INSERT INTO embedding_generations (id, status, activated_at) VALUES (1, 'active', now())")
+    op.execute("SELECT setval(pg_get_serial_sequence('embedding_generations', 'id'), 1)")
+
+    for table, key in (('embeddings_show', 'show_id'), ('embeddings_profile', 'profile_id')):
+        op.add_column(table, sa.Column('generation', sa.Integer, server_default='1', nullable=False))
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_pkey")
+        op.create_primary_key(f"{table}_pkey", table, [key, 'generation'])
+
+    # ANN indexes become per-generation partial indexes, built before cutover.
+    op.execute("DROP INDEX IF EXISTS ix_embeddings_show_emb_v_ivfflat")
+    op.execute("DROP INDEX IF EXISTS ix_embeddings_profile_emb_v_ivfflat")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_show_emb_v_g1 ON embeddings_show USING ivfflat (emb_v) WITH (lists = 100) WHERE generation = 1")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_profile_emb_v_g1 ON embeddings_profile USING ivfflat (emb_v) WITH (lists = 100) WHERE generation = 1")
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM embeddings_show WHERE generation <> (SELECT id FROM embedding_generations WHERE status = 'active')")
+    op.execute("DELETE FROM embeddings_profile WHERE generation <> (SELECT id FROM embedding_generations WHERE status = 'active')")
+    for table, key in (('embeddings_show', 'show_id'), ('embeddings_profile', 'profile_id')):
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_pkey")
+        op.create_primary_key(f"{table}_pkey", table, [key])
+        op.drop_column(table, 'generation')
+    op.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_show_emb_v_ivfflat ON embeddings_show USING ivfflat (emb_v) WITH (lists = 100)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_profile_emb_v_ivfflat ON embeddings_profile USING ivfflat (emb_v) WITH (lists = 100)")
+    op.drop_table('embedding_generations')
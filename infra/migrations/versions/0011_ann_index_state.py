@@ -0,0 +1,33 @@
+"""record ANN index parameters per embedding generation
+
+Revision ID: 0011_ann_index_state
+Revises: 0010_embedding_generations
+Create Date: 2025-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '0011_ann_index_state'
+down_revision = '0010_embedding_generations'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Written by the index job: what the show index was built with, at what size,
+    # and the per-query probes / ef_search it tuned against the latency target.
+    op.add_column('embedding_generations', sa.Column('index_method', sa.String(16), nullable=True))
+    op.add_column('embedding_generations', sa.Column('index_params', postgresql.JSONB, nullable=True))
+    op.add_column('embedding_generations', sa.Column('index_rows', sa.Integer, nullable=True))
+    op.add_column('embedding_generations', sa.Column('search_param', sa.Integer, nullable=True))
+    op.execute("UPDATE embedding_generations SET index_method = 'ivfflat', index_params = '{\"lists\": 100}' WHERE status IN ('active', 'retired')")
+
+
+def downgrade() -> None:
+    op.drop_column('embedding_generations', 'search_param')
+    op.drop_column('embedding_generations', 'index_rows')
+    op.drop_column('embedding_generations', 'index_params')
+    op.drop_column('embedding_generations', 'index_method')
@@ -0,0 +1,66 @@
+"""generated, indexed show feature columns for candidate filtering
+
+Revision ID: 0012_show_feature_columns
+Revises: 0011_ann_index_state
+Create Date: 2025-10-19
+"""
+
+from alembic import op
+
+
+revision = '0012_show_feature_columns'
+down_revision = '0011_ann_index_state'
+branch_labels = None
+depends_on = None
+
+
+def _is_int(key: str) -> str:
+    # What int() accepts: any JSON number (42.5 -> 42) or a string of digits
+    return f"(jsonb_typeof(metadata->'{key}') = 'number' OR metadata->>'{key}' ~ '^[0-9]+$')"
+
+
+def _smallint(key: str) -> str:
+    # Truncated like int() and clamped through numeric: an out-of-range value must not fail the row write
+    return f"GREATEST(LEAST(trunc((metadata->>'{key}')::numeric), 32767), -32768)::smallint"
+
+
+def _int_field(key: str, default: int) -> str:
+    return f"CASE WHEN {_is_int(key)} THEN {_smallint(key)} ELSE {default} END"
+
+
+# Same mapping as app.recs._age_rating: numeric age_rating, else the AU classification
+_AGE_RATING = f"""
+    CASE
+        WHEN {_is_int('age_rating')} THEN {_smallint('age_rating')}
+        ELSE CASE upper(replace(coalesce(metadata->>'au_rating', ''), ' ', ''))
+            WHEN 'G' THEN 0 WHEN 'PG' THEN 8
+            WHEN 'M' THEN 15 WHEN 'MA15+' THEN 15 WHEN 'MA15' THEN 15
+            WHEN 'R18+' THEN 18 WHEN 'R18' THEN 18
+        END
+    END
+"""
+
+
+def upgrade() -> None:
+    # Candidate eligibility is pushed into Postgres for large catalogs (app/eligibility.py):
+    # stored generated columns extracted from metadata, B-tree indexes on them and a GIN
+    # index on warnings for `?|` boundary checks. Availability is an EXISTS semi-join on
+    # ix_availability_show_id.
+    op.execute(f"ALTER TABLE shows ADD COLUMN episode_length smallint GENERATED ALWAYS AS ({_int_field('episode_length', 60)}) STORED")
+    op.execute(f"ALTER TABLE shows ADD COLUMN seasons smallint GENERATED ALWAYS AS ({_int_field('seasons', 1)}) STORED")
+    op.execute(f"ALTER TABLE shows ADD COLUMN age_rating smallint GENERATED ALWAYS AS ({_AGE_RATING}) STORED")
+    op.create_index('ix_shows_episode_length', 'shows', ['episode_length'])
+    op.create_index('ix_shows_age_rating', 'shows', ['age_rating'])
+    op.execute("CREATE INDEX IF NOT EXISTS ix_shows_warnings_gin ON shows USING GIN (warnings)")
+    # No query filters on the whole metadata document; the columns above replace it.
+    op.execute("DROP INDEX IF EXISTS ix_shows_metadata_gin")
+
+
+def downgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS ix_shows_metadata_gin ON shows USING GIN (metadata)")
+    op.execute("DROP INDEX IF EXISTS ix_shows_warnings_gin")
+    op.drop_index('ix_shows_age_rating', table_name='shows')
+    op.drop_index('ix_shows_episode_length', table_name='shows')
+    op.drop_column('shows', 'age_rating')
+    op.drop_column('shows', 'seasons')
+    op.drop_column('shows', 'episode_length')
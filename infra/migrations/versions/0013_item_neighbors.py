@@ -0,0 +1,36 @@
+"""item-to-item neighbour table for like_id anchors
+
+Revision ID: 0013_item_neighbors
+Revises: 0012_show_feature_columns
+Create Date: 2025-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '0013_item_neighbors'
+down_revision = '0012_show_feature_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Materialised from the catalog artifact after each generation cutover; rows of
+    # retired generations are dropped with their embeddings.
+    op.create_table(
+        'item_neighbors',
+        sa.Column('show_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('shows.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('generation', sa.Integer, nullable=False),
+        sa.Column('rank', sa.SmallInteger, nullable=False),
+        sa.Column('neighbor_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('shows.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('score', sa.Float, nullable=False),
+        sa.PrimaryKeyConstraint('show_id', 'generation', 'rank'),
+    )
+    op.create_index('ix_item_neighbors_generation', 'item_neighbors', ['generation'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_item_neighbors_generation', table_name='item_neighbors')
+    op.drop_table('item_neighbors')
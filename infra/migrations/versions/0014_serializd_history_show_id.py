@@ -0,0 +1,35 @@
+"""resolved show id on serializd history rows
+
+Revision ID: 0014_serializd_history_show_id
+Revises: 0013_item_neighbors
+Create Date: 2025-10-20
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = '0014_serializd_history_show_id'
+down_revision = '0013_item_neighbors'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Filled at ingest by the in-memory ShowResolver (apps/api/app/show_resolver.py);
+    # existing rows are backfilled by exact title, which is what readers joined on before.
+    op.add_column(
+        'serializd_history',
+        sa.Column('show_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('shows.id', ondelete='SET NULL'), nullable=True),
+    )
+    op.execute(
+        "UPDATE serializd_history sh SET show_id = s.id FROM shows s "
+        "WHERE sh.show_id IS NULL AND s.title = sh.title_ref"
+    )
+    op.create_index('ix_hist_show', 'serializd_history', ['show_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_hist_show', table_name='serializd_history')
+    op.drop_column('serializd_history', 'show_id')
@@ -0,0 +1,56 @@
+"""natural key on serializd history and per-source sync watermarks
+
+Revision ID: 0015_serializd_incremental_sync
+Revises: 0014_serializd_history_show_id
+Create Date: 2025-10-20
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0015_serializd_incremental_sync'
+down_revision = '0014_serializd_history_show_id'
+branch_labels = None
+depends_on = None
+
+
+# One row per distinct watch event: the source's identity for the title (tmdb id, else the
+# trimmed lowercased title), season, episode and status. Syncs upsert on (profile_ref, event_key).
+# Rows with no title identity at all get NULL and are left out of the unique index.
+_EVENT_KEY = """
+    CASE WHEN tmdb_id IS NOT NULL OR title_ref IS NOT NULL THEN
+        coalesce('tmdb:' || tmdb_id::text, 'title:' || lower(btrim(title_ref)))
+        || '|' || coalesce(season::text, '') || '|' || coalesce(episode::text, '') || '|' || status
+    END
+"""
+
+
+def upgrade() -> None:
+    op.execute(f"ALTER TABLE serializd_history ADD COLUMN event_key text GENERATED ALWAYS AS ({_EVENT_KEY}) STORED")
+    # Every sync so far re-inserted the full history: keep the latest row per event
+    op.execute(
+        "DELETE FROM serializd_history a USING serializd_history b "
+        "WHERE a.profile_ref = b.profile_ref AND a.event_key = b.event_key "
+        "AND (a.last_seen_ts, a.id) < (b.last_seen_ts, b.id)"
+    )
+    op.create_index('uq_hist_profile_event', 'serializd_history', ['profile_ref', 'event_key'], unique=True)
+    # Nothing looks history up by tmdb_id (titles resolve to show_id at ingest)
+    op.drop_index('ix_hist_tmdb', table_name='serializd_history')
+
+    # Incremental sync state: the newest source timestamp applied per (source, scope)
+    op.create_table(
+        'sync_watermarks',
+        sa.Column('source', sa.String(32), nullable=False),
+        sa.Column('scope', sa.Text, nullable=False),
+        sa.Column('last_seen_ts', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.PrimaryKeyConstraint('source', 'scope'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sync_watermarks')
+    op.create_index('ix_hist_tmdb', 'serializd_history', ['tmdb_id'])
+    op.drop_index('uq_hist_profile_event', table_name='serializd_history')
+    op.drop_column('serializd_history', 'event_key')
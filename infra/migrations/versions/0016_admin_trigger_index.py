@@ -0,0 +1,24 @@
+"""partial index for claiming pending admin sync triggers
+
+Revision ID: 0016_admin_trigger_index
+Revises: 0015_serializd_incremental_sync
+Create Date: 2025-10-20
+"""
+
+from alembic import op
+
+
+revision = '0016_admin_trigger_index'
+down_revision = '0015_serializd_incremental_sync'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The worker claims `admin:sync:*` rows (FOR UPDATE SKIP LOCKED) when NOTIFY wakes it;
+    # this keeps that an index probe over the few pending rows, not a scan of `events`.
+    op.execute("CREATE INDEX IF NOT EXISTS ix_events_admin_sync ON events (id) WHERE kind LIKE 'admin:sync:%'")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_events_admin_sync")
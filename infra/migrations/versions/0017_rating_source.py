@@ -0,0 +1,27 @@
+"""source marker on ratings written by the Serializd sync
+
+Revision ID: 0017_rating_source
+Revises: 0016_admin_trigger_index
+Create Date: 2025-10-21
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0017_rating_source'
+down_revision = '0016_admin_trigger_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NULL = entered in the app. The Serializd sync only ever updates rows it marked itself,
+    # one per (profile, show); rows written before this revision stay unmarked.
+    op.add_column('ratings', sa.Column('source', sa.String(16), nullable=True))
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_ratings_source_show ON ratings (profile_id, show_id, source) WHERE source IS NOT NULL")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS uq_ratings_source_show")
+    op.drop_column('ratings', 'source')
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""MMR diversification cost: a pool of N scored candidates into a slate of K
+(apps/api/app/mmr.py).
+
+    PYTHONPATH=. python scripts/bench_mmr.py [pool] [slate]
+
+Prints timings only; nothing is asserted (test_mmr covers the greedy selection).
+"""
+import sys
+import time
+
+import numpy as np
+
+from apps.api.app.mmr import mmr_select
+
+
+def main(n: int = 200, k: int = 6, lam: float = 0.7, reps: int = 200) -> None:
+    rng = np.random.default_rng(1)
+    vecs = rng.normal(size=(n, 384)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    rel = rng.random(n)
+    mmr_select(rel, vecs, k, lam)
+    start = time.perf_counter()
+    for _ in range(reps):
+        mmr_select(rel, vecs, k, lam)
+    print(f"mmr {n} -> {k} (lambda {lam}): {(time.perf_counter() - start) / reps * 1e3:.3f} ms per slate")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
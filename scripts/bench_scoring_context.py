@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Per-candidate scoring cost with a request-scoped ScoringContext (compiled once) against
+passing the raw onboarding preferences, which are compiled again for every candidate.
+
+    PYTHONPATH=. python scripts/bench_scoring_context.py [n_candidates]
+
+Prints timings only; nothing is asserted (the tests cover equivalence).
+"""
+import sys
+import time
+import uuid
+from types import SimpleNamespace
+
+from apps.api.app.recs import ScoringContext, _apply_feedback, _bits, _score_show
+from apps.api.app.vocab import VOCAB
+
+PREF = {
+    "creators_like": ["c1"],
+    "creators_dislike": ["c2"],
+    "mood": {"humor": 3, "optimism": 2, "tone": 3, "pacing": 1, "complexity": 1},
+    "constraints": {"ep_length_max": 40, "avoid_dnf": True},
+}
+
+
+def _show(i: int):
+    return SimpleNamespace(
+        id=uuid.UUID(int=i),
+        title=f"Show {i}",
+        metadata={
+            "genres": ["comedy", "drama"] if i % 2 else ["mystery"],
+            "creators": [f"c{i % 7}"],
+            "episode_length": 25 + (i % 5) * 10,
+            "seasons": 1 + i % 4,
+        },
+        flags=["funny", "slow"] if i % 3 == 0 else ["warm"],
+        warnings=[],
+    )
+
+
+def main(n: int = 2000) -> None:
+    shows = [_show(i) for i in range(n)]
+    for s in shows:
+        _bits(s)
+    liked_g, liked_c = VOCAB.mask("genre", ["drama"]), VOCAB.mask("creator", ["c3"])
+
+    start = time.perf_counter()
+    ctx = ScoringContext.build(
+        intent="default",
+        seed=7,
+        liked_tags_by_profile={1: {"funny"}, 2: {"warm"}},
+        last_note_by_profile={1: "too slow but cozy", 2: ""},
+        rating_map_by_profile={1: {str(uuid.UUID(int=i)): i % 3 for i in range(0, n, 4)}, 2: {str(uuid.UUID(int=1)): 2}},
+        history_recent=None,
+        pref=PREF,
+        candidate_ids=[str(s.id) for s in shows],
+    )
+    t_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for s in shows:
+        sc, _, _ = _score_show(s, ctx.intent, liked_g, liked_c, 0.5, pref=ctx.pref)
+        _apply_feedback(show=s, base_score=sc, ctx=ctx)
+    t_ctx = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for s in shows:
+        sc, _, _ = _score_show(s, ctx.intent, liked_g, liked_c, 0.5, pref=PREF)
+        _apply_feedback(show=s, base_score=sc, ctx=ctx)
+    t_raw = time.perf_counter() - start
+
+    print(f"scoring context build ({n} candidates): {t_build * 1e3:.2f} ms")
+    print(f"per candidate, compiled context: {t_ctx / n * 1e6:.1f} us")
+    print(f"per candidate, raw preferences:  {t_raw / n * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Speed and memory of tag-set overlap and boundary checks: Python sets of strings against
+interned bitsets (apps/api/app/vocab.py).
+
+    PYTHONPATH=. python scripts/bench_vocab.py [n_shows]
+
+Prints timings and sizes only; nothing is asserted (test_vocab covers equivalence).
+"""
+import sys
+import time
+
+from apps.api.app.vocab import TagVocabulary, overlap
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - start
+
+
+def main(n: int = 20000) -> None:
+    v = TagVocabulary()
+    tag_sets = [{f"t{(i * 7 + j) % 97}" for j in range(6)} for i in range(n)]
+    warn_sets = [{f"w{(i * 3 + j) % 23}" for j in range(i % 3)} for i in range(n)]
+    liked = {f"t{j}" for j in range(0, 97, 5)}
+    banned = {"w1", "w7", "w19"}
+    tag_masks = [v.intern("flag", ts) for ts in tag_sets]
+    warn_masks = [v.intern("warning", ws) for ws in warn_sets]
+    liked_m, banned_m = v.mask("flag", liked), v.mask("warning", banned)
+
+    _, t_set = _timed(lambda: [len(ts & liked) for ts in tag_sets])
+    _, t_bits = _timed(lambda: [overlap(m, liked_m) for m in tag_masks])
+    _, b_set = _timed(lambda: [bool(ws & banned) for ws in warn_sets])
+    _, b_bits = _timed(lambda: [bool(m & banned_m) for m in warn_masks])
+    mem_set = sum(sys.getsizeof(ts) + sum(sys.getsizeof(t) for t in ts) for ts in tag_sets)
+    mem_bits = sum(sys.getsizeof(m) for m in tag_masks)
+
+    print(f"overlap of {n} shows: sets {t_set * 1e3:.2f} ms, bitsets {t_bits * 1e3:.2f} ms")
+    print(f"boundary check of {n} shows: sets {b_set * 1e3:.2f} ms, bitsets {b_bits * 1e3:.2f} ms")
+    print(f"per-show tags: sets {mem_set / n:.0f} B, bitsets {mem_bits / n:.0f} B")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -18,18 +18,24 @@ class SerializdAdapter:
     def _headers(self) -> Dict[str, str]:
         return {"Authorization": f"Bearer {self.token}"} if self.token else {}
 
-    def ratings(self) -> List[Dict[str, Any]]:
+    def ratings(self, since: datetime | None = None) -> List[Dict[str, Any]]:
+        """Rating records, only those changed after `since` when given (records without a
+        timestamp are always kept; callers upsert them idempotently)."""
         if not self.enabled or not (self.user and self.token):
             return []
         try:
             # Placeholder endpoint; replace with Serializd API if available
-            r = with_backoff(lambda: requests.get(f"https://api.serializd.com/users/{self.user}/ratings", headers=self._headers(), timeout=10))
+            params = {"since": since.isoformat()} if since else None
+            r = with_backoff(lambda: requests.get(f"https://api.serializd.com/users/{self.user}/ratings", headers=self._headers(), params=params, timeout=10))
             if isinstance(r, requests.Response):
                 r.raise_for_status()
                 data = r.json()
             else:
                 data = r
-            return data if isinstance(data, list) else []
+            data = data if isinstance(data, list) else []
+            if since is not None:
+                data = [d for d in data if (ts := self.item_ts(d)) is None or ts > since]
+            return data
         except Exception:
             try:
                 from apps.api.app.metrics import ADAPTER_ERRORS  # type: ignore
@@ -38,12 +44,12 @@ class SerializdAdapter:
                 pass
             return []
 
-    def fetch_watch_history(self) -> List[HistoryItem]:
+    def fetch_watch_history(self, since: datetime | None = None) -> List[HistoryItem]:
         """Normalize ratings into HistoryItems (best-effort)"""
         out: List[HistoryItem] = []
         if not self.enabled or not (self.user and self.token):
             return out
-        data = self.ratings()
+        data = self.ratings(since)
         now = datetime.now(timezone.utc)
         for item in data:
             title = (item.get("title") or "").strip()
@@ -56,11 +62,25 @@ class SerializdAdapter:
                 episode=None,
                 status="watched",
                 rating=int(rating) if isinstance(rating, int) else None,
-                last_seen_ts=now,
+                last_seen_ts=self.item_ts(item) or now,
                 raw=item,
             ))
         return out
 
+    @staticmethod
+    def item_ts(item: Dict[str, Any]) -> datetime | None:
+        """When the record last changed, from the first timestamp field present (UTC if naive)."""
+        for key in ("updated_at", "rated_at", "watched_at", "date"):
+            v = item.get(key)
+            if not isinstance(v, str) or not v:
+                continue
+            try:
+                ts = datetime.fromisoformat(v.replace("Z", "+00:00"))
+            except ValueError:
+                continue
+            return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+        return None
+
     @staticmethod
     def to_internal_rating(item: Dict[str, Any]) -> Dict[str, Any]:
         """Map a Serializd rating record to our internal shape.
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import time
+
+from sqlmodel import Session
+from sqlalchemy import text
+
+
+# "auto" picks ivfflat for small catalogs and HNSW past ANN_HNSW_MIN_ROWS.
+ANN_INDEX_METHOD = os.getenv("ANN_INDEX_METHOD", "auto")
+ANN_HNSW_MIN_ROWS = int(os.getenv("ANN_HNSW_MIN_ROWS", "1000000"))
+# Rebuild the active generation's index once the catalog outgrows its build size by this factor.
+ANN_REBUILD_GROWTH = float(os.getenv("ANN_REBUILD_GROWTH", "1.5"))
+# Per-query probes / ef_search are the largest value whose p95 stays under this budget.
+ANN_LATENCY_TARGET_MS = float(os.getenv("ANN_LATENCY_TARGET_MS", "20"))
+ANN_BENCH_K = int(os.getenv("ANN_BENCH_K", "50"))
+ANN_BENCH_SAMPLES = int(os.getenv("ANN_BENCH_SAMPLES", "20"))
+
+_TABLES = (("embeddings_show", "show"), ("embeddings_profile", "profile"))
+
+
+def index_name(kind: str, generation: int) -> str:
+    return f"ix_embeddings_{kind}_emb_v_g{int(generation)}"
+
+
+def choose_index(rows: int, method: str | None = None) -> dict:
+    """Index parameters for a table of `rows` vectors, per the pgvector sizing guidance:
+    ivfflat lists = rows/1000 up to 1M rows and sqrt(rows) beyond; HNSW m/ef_construction
+    step up with size. `default_search` is the starting probes / ef_search before tuning.
+    """
+    rows = max(0, int(rows))
+    method = (method or ANN_INDEX_METHOD).lower()
+    if method == "auto":
+        method = "hnsw" if rows >= ANN_HNSW_MIN_ROWS else "ivfflat"
+    if method == "hnsw":
+        m, efc = (16, 64) if rows < 5_000_000 else (24, 128)
+        return {"method": "hnsw", "m": m, "ef_construction": efc, "default_search": 40}
+    lists = max(10, rows // 1000) if rows <= 1_000_000 else int(math.sqrt(rows))
+    return {"method": "ivfflat", "lists": lists, "default_search": max(1, int(math.sqrt(lists)))}
+
+
+def _create_sql(table: str, name: str, generation: int, params: dict) -> str:
+    if params["method"] == "hnsw":
+        opts = f"m = {int(params['m'])}, ef_construction = {int(params['ef_construction'])}"
+    else:
+        opts = f"lists = {int(params['lists'])}"
+    return (
+        f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING {params['method']} (emb_v) "
+        f"WITH ({opts}) WHERE generation = {int(generation)}"
+    )
+
+
+def _count(session: Session, table: str, generation: int) -> int:
+    return int(session.exec(
+        text(f"SELECT COUNT(*) FROM {table} WHERE generation = :g AND emb_v IS NOT NULL"),
+        params={"g": int(generation)},
+    ).first()[0] or 0)
+
+
+def _record(session: Session, generation: int, params: dict, rows: int, search: int) -> None:
+    session.exec(text(
+        "UPDATE embedding_generations SET index_method = :m, index_params = CAST(:p AS jsonb), "
+        "index_rows = :n, search_param = :s WHERE id = :g"
+    ), params={
+        "g": int(generation),
+        "m": params["method"],
+        "p": json.dumps({k: v for k, v in params.items() if k not in ("method", "default_search")}),
+        "n": int(rows),
+        "s": int(search),
+    })
+    session.commit()
+
+
+def build_indexes(session: Session, generation: int) -> dict:
+    """Create the partial ANN indexes for a generation that is not serving yet, sized
+    from its row counts, then tune and record the show index's search setting."""
+    g = int(generation)
+    show_params: dict = {}
+    show_rows = 0
+    for table, kind in _TABLES:
+        rows = _count(session, table, g)
+        params = choose_index(rows)
+        session.exec(text(_create_sql(table, index_name(kind, g), g, params)))
+        if kind == "show":
+            show_params, show_rows = params, rows
+    session.exec(text("ANALYZE embeddings_show"))
+    session.exec(text("ANALYZE embeddings_profile"))
+    session.commit()
+    search = tune_search(session, g, show_params)
+    _record(session, g, show_params, show_rows, search)
+    return {"generation": g, "rows": show_rows, "search": search, **show_params}
+
+
+def _swap_index(session: Session, table: str, name: str, generation: int, params: dict) -> None:
+    """Build the replacement concurrently under a temporary name, then swap it in, so the
+    serving generation keeps its old index for reads and accepts writes throughout."""
+    tmp = f"{name}_next"
+    eng = session.get_bind()
+    with eng.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {tmp}"))
+        conn.execute(text(_create_sql(table, tmp, generation, params).replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)))
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        conn.execute(text(f"ALTER INDEX {tmp} RENAME TO {name}"))
+        conn.execute(text(f"ANALYZE {table}"))
+
+
+def maintain_indexes(session: Session, generation: int | None = None, force: bool = False) -> dict:
+    """Rebuild the active generation's ANN indexes when the catalog has grown past
+    ANN_REBUILD_GROWTH × the build size or the size now calls for another method,
+    and re-tune probes / ef_search either way."""
+    from .embeddings import active_generation, publish_vector_state
+    logger = logging.getLogger("jobs.ann_index")
+    g = int(generation) if generation is not None else active_generation(session)
+    row = session.exec(
+        text("SELECT index_method, index_params, index_rows FROM embedding_generations WHERE id = :g"),
+        params={"g": g},
+    ).first()
+    built_method, built_params, built_rows = row if row else (None, None, None)
+    rows = _count(session, "embeddings_show", g)
+    params = choose_index(rows)
+    stale = force or built_method != params["method"] or not built_rows or rows >= built_rows * ANN_REBUILD_GROWTH
+    if stale:
+        # The profile index is resized alongside the show index.
+        for table, kind in _TABLES:
+            _swap_index(session, table, index_name(kind, g), g, choose_index(_count(session, table, g)))
+    else:
+        params = {"method": built_method, **(built_params or {})}
+        params["default_search"] = choose_index(built_rows, built_method)["default_search"]
+        rows = built_rows
+    search = tune_search(session, g, params)
+    _record(session, g, params, rows, search)
+    publish_vector_state(session, g)
+    logger.info("ann index g%s: method=%s rows=%s rebuilt=%s search=%s", g, params["method"], rows, stale, search)
+    return {"generation": g, "rows": rows, "rebuilt": stale, "search": search, **params}
+
+
+# --- Probe tuning and recall benchmark ---------------------------------------
+
+def search_guc(method: str) -> str:
+    return "hnsw.ef_search" if method == "hnsw" else "ivfflat.probes"
+
+
+def _candidates(params: dict) -> list[int]:
+    if params.get("method") == "hnsw":
+        return [20, 40, 64, 100, 160, 256, 400]
+    lists = int(params.get("lists") or 100)
+    vals = {1, lists}
+    v = 2
+    while v < lists:
+        vals.add(v)
+        v *= 2
+    return sorted(vals)
+
+
+_KNN = text(
+    "SELECT show_id FROM embeddings_show WHERE generation = :g AND emb_v IS NOT NULL "
+    "ORDER BY emb_v <-> CAST(:q AS vector) LIMIT :k"
+)
+
+
+def _sample_queries(session: Session, generation: int, n: int) -> list[str]:
+    """Query vectors shaped like production traffic: stored profile vectors, else show vectors."""
+    rows = session.exec(text(
+        "SELECT emb_v::text FROM embeddings_profile WHERE generation = :g AND emb_v IS NOT NULL "
+        "ORDER BY random() LIMIT :n"
+    ), params={"g": generation, "n": n}).all()
+    if not rows:
+        rows = session.exec(text(
+            "SELECT emb_v::text FROM embeddings_show WHERE generation = :g AND emb_v IS NOT NULL "
+            "ORDER BY random() LIMIT :n"
+        ), params={"g": generation, "n": n}).all()
+    return [r[0] for r in rows]
+
+
+def _exact(session: Session, generation: int, q: str, k: int) -> set[str]:
+    session.exec(text("SELECT set_config('enable_indexscan', 'off', true)"))
+    ids = {str(r[0]) for r in session.exec(_KNN, params={"g": generation, "q": q, "k": k}).all()}
+    session.rollback()
+    return ids
+
+
+def benchmark(
+    session: Session,
+    generation: int,
+    method: str,
+    values: list[int],
+    k: int = ANN_BENCH_K,
+    samples: int = ANN_BENCH_SAMPLES,
+) -> list[dict]:
+    """recall@k against exact (index-free) search and query latency for each probes /
+    ef_search value, over a sample of stored profile vectors."""
+    queries = _sample_queries(session, generation, samples)
+    if not queries:
+        return []
+    truth = [_exact(session, generation, q, k) for q in queries]
+    guc = search_guc(method)
+    out: list[dict] = []
+    for val in values:
+        lat: list[float] = []
+        recall: list[float] = []
+        for q, exact in zip(queries, truth):
+            session.exec(text("SELECT set_config(:guc, :val, true)"), params={"guc": guc, "val": str(int(val))})
+            t0 = time.perf_counter()
+            got = {str(r[0]) for r in session.exec(_KNN, params={"g": generation, "q": q, "k": k}).all()}
+            lat.append((time.perf_counter() - t0) * 1000.0)
+            recall.append(len(got & exact) / max(1, len(exact)))
+            session.rollback()
+        lat.sort()
+        out.append({
+            "value": int(val),
+            "recall_at_k": round(sum(recall) / len(recall), 4),
+            "p50_ms": round(lat[len(lat) // 2], 3),
+            "p95_ms": round(lat[min(len(lat) - 1, int(len(lat) * 0.95))], 3),
+        })
+    return out
+
+
+def tune_search(session: Session, generation: int, params: dict, target_ms: float = ANN_LATENCY_TARGET_MS) -> int:
+    """Largest probes / ef_search whose p95 fits the latency target (recall only grows
+    with it); the smallest candidate if none does, the default if there is nothing to measure."""
+    if not params:
+        return 0
+    results = benchmark(session, generation, params["method"], _candidates(params))
+    if not results:
+        return int(params["default_search"])
+    within = [r for r in results if r["p95_ms"] <= target_ms]
+    return (within[-1] if within else results[0])["value"]
+
+
+if __name__ == "__main__":
+    from sqlmodel import create_engine
+    from .tasks import _engine_url
+    from .embeddings import active_generation
+
+    with Session(create_engine(_engine_url())) as s:
+        g = active_generation(s)
+        rows = _count(s, "embeddings_show", g)
+        p = choose_index(rows)
+        print(json.dumps({"generation": g, "rows": rows, "index": p}))
+        for r in benchmark(s, g, p["method"], _candidates(p)):
+            print(json.dumps(r))
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+from sqlmodel import Session
+from sqlalchemy import text
+
+from apps.api.app.cf_model import (  # type: ignore
+    CF_K,
+    CF_MODEL_DIR,
+    HISTORY_WEIGHT,
+    RATING_WEIGHTS,
+    build_csr,
+    item_item_topk,
+    read_current,
+)
+
+
+# Nightly item-item CF job. Interactions are streamed from the DB keeping at most
+# CF_MAX_USER_ITEMS (most recent) per user, so the co-rating expansion is bounded by
+# users x CF_MAX_USER_ITEMS^2 however large `ratings` grows; only co-rated item pairs are
+# accumulated, in blocks bounded by CF_BLOCK_PAIRS (apps/api/app/cf_model.py).
+CF_MAX_USER_ITEMS = int(os.getenv("CF_MAX_USER_ITEMS", "500"))
+CF_USE_HISTORY = os.getenv("CF_USE_HISTORY", "true").lower() == "true"
+_FETCH = 10000
+
+logger = logging.getLogger("recsys.cf")
+
+
+def _stream(session: Session, sql: str):
+    res = session.connection().execution_options(stream_results=True).execute(text(sql))
+    while True:
+        chunk = res.fetchmany(_FETCH)
+        if not chunk:
+            break
+        yield from chunk
+
+
+def load_interactions(session: Session, use_history: bool = CF_USE_HISTORY):
+    """(user idx, item idx, weight) arrays plus the item id list, capped per user."""
+    user_ix: dict[str, int] = {}
+    item_ix: dict[str, int] = {}
+    users: list[int] = []
+    items: list[int] = []
+    weights: list[float] = []
+    last = None
+    kept = 0
+
+    def add(user: str, show_id, w: float) -> None:
+        nonlocal last, kept
+        if user != last:
+            last, kept = user, 0
+        if kept >= CF_MAX_USER_ITEMS:
+            return
+        kept += 1
+        users.append(user_ix.setdefault(user, len(user_ix)))
+        items.append(item_ix.setdefault(str(show_id), len(item_ix)))
+        weights.append(w)
+
+    for pid, sid, primary in _stream(session, "SELECT profile_id, show_id, \"primary\" FROM ratings ORDER BY profile_id, updated_at DESC"):
+        add(f"p:{pid}", sid, RATING_WEIGHTS.get(int(primary), 0.0))
+    if use_history:
+        try:
+            sql = (
+                "SELECT sh.profile_ref, COALESCE(sh.show_id, s.id) FROM serializd_history sh"
+                " LEFT JOIN shows s ON sh.show_id IS NULL AND s.title = sh.title_ref"
+                " WHERE COALESCE(sh.show_id, s.id) IS NOT NULL"
+                " ORDER BY sh.profile_ref, sh.last_seen_ts DESC"
+            )
+            for ref, sid in _stream(session, sql):
+                add(f"sz:{ref}", sid, HISTORY_WEIGHT)
+        except Exception:
+            session.rollback()
+    return (
+        np.asarray(users, dtype=np.int32),
+        np.asarray(items, dtype=np.int32),
+        np.asarray(weights, dtype=np.float32),
+        len(user_ix),
+        list(item_ix),
+    )
+
+
+def publish(item_ids: list[str], nbr, sim, root: str = CF_MODEL_DIR, stats: dict | None = None) -> dict:
+    """Write a new model version, then flip CURRENT to it (keeps the previous one)."""
+    ids = np.asarray(item_ids, dtype=str)
+    sorted_rows = np.argsort(ids, kind="stable")
+    version = f"cf-{int(time.time() * 1000)}"
+    tmp = os.path.join(root, f".{version}.tmp")
+    os.makedirs(tmp, exist_ok=True)
+    for name, arr in (("ids", ids), ("ids_sorted", ids[sorted_rows]), ("sorted_rows", sorted_rows), ("nbr", nbr), ("sim", sim)):
+        np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(arr))
+    manifest = {"version": version, "items": len(item_ids), "k": int(nbr.shape[1]), **(stats or {})}
+    with open(os.path.join(tmp, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(root, version))
+    previous = read_current(root)
+    cur_tmp = os.path.join(root, f".CURRENT.{os.getpid()}")
+    with open(cur_tmp, "w") as f:
+        f.write(version)
+    os.replace(cur_tmp, os.path.join(root, "CURRENT"))
+    for name in os.listdir(root):
+        if name not in (version, previous, "CURRENT") and not name.startswith("."):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    return manifest
+
+
+def build_cf_model(session: Session, k: int = CF_K, root: str = CF_MODEL_DIR) -> dict:
+    started = time.time()
+    users, items, weights, n_users, item_ids = load_interactions(session)
+    indptr, indices, data = build_csr(users, items, weights, n_users, len(item_ids))
+    nbr, sim = item_item_topk(indptr, indices, data, len(item_ids), k=k)
+    stats = {"users": n_users, "interactions": int(len(data)), "seconds": round(time.time() - started, 2)}
+    manifest = publish(item_ids, nbr, sim, root=root, stats=stats)
+    logger.info("cf model published: %s", manifest)
+    return manifest
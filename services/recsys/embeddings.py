@@ -2,9 +2,14 @@ from __future__ import annotations
 
 import hashlib
 import math
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
 from typing import Iterable, List
 
+import numpy as np
 from sqlmodel import Session, select
+from sqlalchemy import text
 
 
 def _tokens_from_metadata(meta: dict | None) -> list[str]:
@@ -53,66 +58,426 @@ def _combine(vecs: list[list[float]]) -> list[float]:
     return [x / norm for x in out]
 
 
-def build_show_embeddings(session: Session) -> int:
-    from apps.api.app.models import Show  # type: ignore
-    n = 0
-    shows = session.exec(select(Show)).all()
-    for s in shows:
-        toks = _tokens_from_metadata(s.metadata)
-        vecs = [_vec_for_token(t) for t in toks]
-        emb = _combine(vecs)
-        # upsert into embeddings_show (emb_v)
-        session.exec(
-            """
-            INSERT INTO embeddings_show (show_id, emb)
-            VALUES (:sid, :arr)
-            ON CONFLICT (show_id) DO UPDATE SET emb = EXCLUDED.emb
-            """,
-            {"sid": str(s.id), "arr": emb},
-        )
-        # Also set emb_v from the array for pgvector usage
-        session.exec(
-            """
-            UPDATE embeddings_show SET emb_v = :vec::vector WHERE show_id = :sid
-            """,
-            {"sid": str(s.id), "vec": "[" + ",".join(str(x) for x in emb) + "]"},
-        )
-        n += 1
+# Bump when tokenization or the token→vector hash changes so every row is rebuilt once.
+EMB_VERSION = "tokhash384-v1"
+WRITE_BATCH = 500
+COPY_BATCH = 5000
+
+
+def _fingerprint(toks: list[str]) -> str:
+    h = hashlib.sha1(EMB_VERSION.encode())
+    for t in sorted(toks):
+        h.update(b"\x1f" + t.encode())
+    return h.hexdigest()
+
+
+def _vec_literal(emb: list[float]) -> str:
+    return "[" + ",".join(str(x) for x in emb) + "]"
+
+
+_UPSERT_SHOW = text(
+    """
+    INSERT INTO embeddings_show (show_id, generation, emb, emb_v, fingerprint)
+    VALUES (:sid, :gen, :arr, CAST(:vec AS vector), :fp)
+    ON CONFLICT (show_id, generation) DO UPDATE
+    SET emb = EXCLUDED.emb, emb_v = EXCLUDED.emb_v, fingerprint = EXCLUDED.fingerprint
+    """
+)
+
+# Unchanged rows are carried into a new generation without recomputing them.
+_COPY_SHOWS = text(
+    """
+    INSERT INTO embeddings_show (show_id, generation, emb, emb_v, fingerprint)
+    SELECT show_id, :gen, emb, emb_v, fingerprint
+    FROM embeddings_show
+    WHERE generation = :base AND show_id = ANY(CAST(:ids AS uuid[]))
+    ON CONFLICT (show_id, generation) DO NOTHING
+    """
+)
+
+
+def _is_pg(session: Session) -> bool:
+    return session.get_bind().dialect.name == "postgresql"
+
+
+def _upsert_shows(session: Session, batch: list[dict]) -> None:
+    if _is_pg(session):
+        session.exec(_UPSERT_SHOW, params=batch)
+        return
+    # SQLite (dev/tests): no pgvector column, plain row upserts
+    from apps.api.app.models import EmbeddingShow  # type: ignore
+    for r in batch:
+        session.merge(EmbeddingShow(show_id=uuid.UUID(r["sid"]), generation=r["gen"], emb=r["arr"], fingerprint=r["fp"]))
+
+
+def _carry_shows(session: Session, gen: int, base: int, ids: list[str]) -> None:
+    if _is_pg(session):
+        session.exec(_COPY_SHOWS, params={"gen": gen, "base": base, "ids": ids})
+        return
+    from sqlalchemy import literal
+    from apps.api.app.models import EmbeddingShow  # type: ignore
+    t = EmbeddingShow.__table__
+    sel = select(t.c.show_id, literal(gen), t.c.emb, t.c.fingerprint).where(
+        t.c.generation == base, t.c.show_id.in_([uuid.UUID(x) for x in ids])
+    )
+    session.exec(t.insert().from_select(["show_id", "generation", "emb", "fingerprint"], sel))
+
+
+def _changed_shows(session: Session, base: int, shard: int, shards: int, force: bool):
+    """(show_id, tokens, fingerprint, changed) per show in the shard, against `base`'s fingerprints."""
+    from apps.api.app.models import EmbeddingShow, Show  # type: ignore
+    from .fanout import key_range_clauses
+    known: dict[str, str | None] = {}
+    if not force:
+        rows = session.exec(
+            select(EmbeddingShow.show_id, EmbeddingShow.fingerprint)
+            .where(EmbeddingShow.generation == base, *key_range_clauses(EmbeddingShow.show_id, shard, shards))
+        ).all()
+        for sid, fp in rows:
+            known[str(sid)] = fp
+    for sid, meta in session.exec(select(Show.id, Show.meta).where(*key_range_clauses(Show.id, shard, shards))).all():
+        sid = str(sid)
+        toks = _tokens_from_metadata(meta)
+        fp = _fingerprint(toks)
+        yield sid, toks, fp, known.get(sid) != fp
+
+
+def _build_shows(session: Session, shard: int, shards: int, force: bool, generation: int | None) -> list[str]:
+    base = active_generation(session)
+    gen = base if generation is None else generation
+    batch: list[dict] = []
+    carry: list[str] = []
+    done: list[str] = []
+    for sid, toks, fp, changed in _changed_shows(session, base, shard, shards, force):
+        if not changed:
+            if gen != base:
+                carry.append(sid)
+            continue
+        emb = _combine([_vec_for_token(t) for t in toks])
+        batch.append({"sid": sid, "gen": gen, "arr": emb, "vec": _vec_literal(emb), "fp": fp})
+        if len(batch) >= WRITE_BATCH:
+            _upsert_shows(session, batch)
+            session.commit()
+            done += [r["sid"] for r in batch]
+            batch = []
+    if batch:
+        _upsert_shows(session, batch)
+        done += [r["sid"] for r in batch]
+    for lo in range(0, len(carry), COPY_BATCH):
+        _carry_shows(session, gen, base, carry[lo:lo + COPY_BATCH])
     session.commit()
-    return n
-
-
-def build_profile_embeddings(session: Session) -> int:
-    from apps.api.app.models import Profile, Rating, Show  # type: ignore
-    profiles = session.exec(select(Profile)).all()
-    built = 0
-    for p in profiles:
-        ratings = session.exec(select(Rating).where(Rating.profile_id == p.id)).all()
-        vecs: list[list[float]] = []
-        for r in ratings:
-            s = session.exec(select(Show).where(Show.id == r.show_id)).first()
-            if not s:
-                continue
-            toks = _tokens_from_metadata(s.metadata)
-            v = _combine([_vec_for_token(t) for t in toks])
-            weight = 2.0 if r.primary == 2 else (1.0 if r.primary == 1 else -1.0)
-            vecs.append([x * weight for x in v])
-        emb = _combine(vecs) if vecs else [0.0] * 384
-        session.exec(
-            """
-            INSERT INTO embeddings_profile (profile_id, emb)
-            VALUES (:pid, :arr)
-            ON CONFLICT (profile_id) DO UPDATE SET emb = EXCLUDED.emb
-            """,
-            {"pid": p.id, "arr": emb},
-        )
-        session.exec(
-            """
-            UPDATE embeddings_profile SET emb_v = :vec::vector WHERE profile_id = :pid
-            """,
-            {"pid": p.id, "vec": "[" + ",".join(str(x) for x in emb) + "]"},
-        )
-        built += 1
+    return done
+
+
+def build_show_embeddings(session: Session, shard: int = 0, shards: int = 1, force: bool = False, generation: int | None = None) -> int:
+    """Build show embeddings into `generation` (default: the active one, in place).
+
+    Rows whose metadata fingerprint matches the active generation are copied (or left
+    alone in place); only new or changed shows are recomputed. With shards > 1 only shows
+    in the shard's id range are read. Returns the number of rows recomputed.
+    """
+    return len(_build_shows(session, shard, shards, force, generation))
+
+
+DIM = 384
+RATING_WEIGHTS = {2: 2.0, 1: 1.0, 0: -1.0}
+PROFILE_WRITE_BATCH = 5000
+_MATMUL_CHUNK = 100_000
+
+# One statement per batch: pgvector parses each literal once, emb is derived from emb_v.
+_UPSERT_PROFILES = text(
+    """
+    INSERT INTO embeddings_profile (profile_id, generation, emb, emb_v, emb_sum, n_ratings)
+    SELECT t.pid, :gen, CAST(CAST(t.vec AS vector) AS real[]), CAST(t.vec AS vector),
+           CAST(t.sum AS float8[]), t.n
+    FROM unnest(CAST(:pids AS integer[]), CAST(:vecs AS text[]), CAST(:sums AS text[]), CAST(:counts AS integer[]))
+         AS t(pid, vec, sum, n)
+    ON CONFLICT (profile_id, generation) DO UPDATE
+    SET emb = EXCLUDED.emb, emb_v = EXCLUDED.emb_v, emb_sum = EXCLUDED.emb_sum, n_ratings = EXCLUDED.n_ratings
+    """
+)
+
+
+def _show_matrix(session: Session, show_ids: set[str], generation: int) -> tuple[dict[str, int], np.ndarray]:
+    """Embedding matrix for the given shows, computing token vectors for rows not yet in embeddings_show."""
+    from apps.api.app.models import EmbeddingShow, Show  # type: ignore
+    index: dict[str, int] = {}
+    rows: list[list[float]] = []
+    for sid, emb in session.exec(select(EmbeddingShow.show_id, EmbeddingShow.emb).where(EmbeddingShow.generation == generation)).all():
+        sid = str(sid)
+        if sid in show_ids and emb:
+            index[sid] = len(rows)
+            rows.append(emb)
+    missing = show_ids - index.keys()
+    if missing:
+        for sid, meta in session.exec(select(Show.id, Show.meta)).all():
+            sid = str(sid)
+            if sid in missing:
+                index[sid] = len(rows)
+                rows.append(_combine([_vec_for_token(t) for t in _tokens_from_metadata(meta)]))
+    mat = np.asarray(rows, dtype=np.float32) if rows else np.zeros((0, DIM), dtype=np.float32)
+    return index, mat
+
+
+def build_profile_embeddings(session: Session, shard: int = 0, shards: int = 1, generation: int | None = None,
+                             profile_ids: Iterable[int] | None = None) -> int:
+    """Rebuild profile embeddings as normalize(W @ E) in one pass, into `generation`
+    (default: the active one, in place).
+
+    W is the sparse profile x show rating-weight matrix (VERY GOOD=2, ACCEPTABLE=1, BAD=-1)
+    and E the show embedding matrix of the same generation. With shards > 1 only profiles
+    with id % shards == shard are handled, with `profile_ids` only those profiles.
+    Returns the number of profiles written.
+    """
+    from apps.api.app.models import Profile, Rating  # type: ignore
+    q = select(Profile.id)
+    rq = select(Rating.profile_id, Rating.show_id, Rating.primary)
+    if shards > 1:
+        q = q.where(Profile.id % shards == shard)
+        rq = rq.where(Rating.profile_id % shards == shard)
+    if profile_ids is not None:
+        wanted = sorted({int(p) for p in profile_ids})
+        q = q.where(Profile.id.in_(wanted))
+        rq = rq.where(Rating.profile_id.in_(wanted))
+    pids = [int(pid) for pid in session.exec(q).all()]
+    if not pids:
+        return 0
+    ratings = session.exec(rq).all()
+    prow = {pid: i for i, pid in enumerate(pids)}
+    gen = active_generation(session) if generation is None else generation
+    sidx, emat = _show_matrix(session, {str(sid) for _, sid, _ in ratings}, gen)
+
+    r_prof: list[int] = []
+    r_show: list[int] = []
+    r_w: list[float] = []
+    for pid, sid, primary in ratings:
+        j = sidx.get(str(sid))
+        i = prow.get(int(pid))
+        if j is None or i is None:
+            continue
+        r_prof.append(i)
+        r_show.append(j)
+        r_w.append(RATING_WEIGHTS.get(int(primary), -1.0))
+    out = np.zeros((len(pids), DIM), dtype=np.float64)
+    rp = np.asarray(r_prof, dtype=np.int64)
+    rs = np.asarray(r_show, dtype=np.int64)
+    rw = np.asarray(r_w, dtype=np.float64)
+    # Sparse W @ E as a scatter-add of weighted rows, chunked to bound the temporary.
+    for lo in range(0, len(rp), _MATMUL_CHUNK):
+        hi = lo + _MATMUL_CHUNK
+        np.add.at(out, rp[lo:hi], emat[rs[lo:hi]] * rw[lo:hi, None])
+    # Keep the unnormalised sums and counts so rating writes can apply O(dim) deltas.
+    sums = out.copy()
+    counts = np.bincount(rp, minlength=len(pids)) if len(rp) else np.zeros(len(pids), dtype=np.int64)
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    out /= norms
+
+    if not _is_pg(session):
+        from apps.api.app.models import EmbeddingProfile  # type: ignore
+        for i, pid in enumerate(pids):
+            session.merge(EmbeddingProfile(profile_id=pid, generation=gen, emb=out[i].tolist(), emb_sum=sums[i].tolist(), n_ratings=int(counts[i])))
+        session.commit()
+        return len(pids)
+    for lo in range(0, len(pids), PROFILE_WRITE_BATCH):
+        hi = lo + PROFILE_WRITE_BATCH
+        session.exec(_UPSERT_PROFILES, params={
+            "gen": gen,
+            "pids": pids[lo:hi],
+            "vecs": [_vec_literal(v) for v in out[lo:hi].tolist()],
+            "sums": ["{" + ",".join(str(x) for x in v) + "}" for v in sums[lo:hi].tolist()],
+            "counts": [int(c) for c in counts[lo:hi]],
+        })
+        session.commit()
     session.commit()
-    return built
+    return len(pids)
+
+
+# --- Blue-green generations ---------------------------------------------------
+# A rebuild writes generation G next to the active one, builds G's ANN indexes, then
+# flips embedding_generations.status in one transaction. The previous generation is kept
+# (for rollback and in-flight readers) until the next cutover.
+
+def active_generation(session: Session) -> int:
+    row = session.exec(text("SELECT id FROM embedding_generations WHERE status = 'active'")).first()
+    return int(row[0]) if row else 1
+
+
+# A new generation is only worth its O(catalog) copy + index build when much of the catalog
+# changed (an EMB_VERSION bump changes every fingerprint). Smaller changes are upserted into
+# the active generation in short batches, and only the profiles that rated them are rebuilt.
+EMB_INPLACE_MAX_FRACTION = float(os.getenv("EMB_INPLACE_MAX_FRACTION", "0.05"))
+# A 'building' generation older than this is an abandoned run and may be dropped.
+EMB_BUILD_STALE_S = int(os.getenv("EMB_BUILD_STALE_S", str(6 * 3600)))
+# pg_advisory_xact_lock key serialising generation status changes across worker replicas.
+_GENERATION_LOCK = 0x656D6267
+
+
+def _lock_generations(session: Session) -> None:
+    if _is_pg(session):
+        session.exec(text("SELECT pg_advisory_xact_lock(:k)"), params={"k": _GENERATION_LOCK})
+
+
+def plan_rebuild(session: Session, force: bool = False) -> dict:
+    """How the next rebuild should run: 'noop', 'in_place' or 'generation'."""
+    if force:
+        return {"mode": "generation", "changed": None, "total": None}
+    base = active_generation(session)
+    total = changed = 0
+    for _, _, _, ch in _changed_shows(session, base, 0, 1, False):
+        total += 1
+        changed += ch
+    if changed == 0:
+        mode = "noop"
+    elif changed <= EMB_INPLACE_MAX_FRACTION * total:
+        mode = "in_place"
+    else:
+        mode = "generation"
+    return {"mode": mode, "changed": changed, "total": total}
+
+
+def update_in_place(session: Session) -> dict:
+    """Upsert changed shows into the active generation and rebuild the profiles that rated them.
+
+    The one exception to the atomic cutover: readers of the active generation can see new
+    show vectors next to old profile vectors until the single batched profile pass commits.
+    Plans only choose this for small changes (EMB_INPLACE_MAX_FRACTION). The generation
+    number does not move, so the generation-keyed rec cache is invalidated explicitly.
+    """
+    from apps.api.app.cache import invalidate_all  # type: ignore
+    from apps.api.app.models import Rating  # type: ignore
+    gen = active_generation(session)
+    ids = _build_shows(session, 0, 1, False, None)
+    pids: set[int] = set()
+    for lo in range(0, len(ids), COPY_BATCH):
+        chunk = [uuid.UUID(x) for x in ids[lo:lo + COPY_BATCH]]
+        pids.update(int(p) for p in session.exec(select(Rating.profile_id).where(Rating.show_id.in_(chunk)).distinct()).all())
+    if pids:
+        build_profile_embeddings(session, generation=gen, profile_ids=pids)
+    if ids:
+        publish_local_index(session, gen)
+        publish_item_neighbors(session, gen)
+        invalidate_all()
+    return {"generation": gen, "shows": len(ids), "profiles": len(pids)}
+
+
+def begin_generation(session: Session) -> int | None:
+    """Open a new 'building' generation, or return None while another build is in progress.
+
+    Only builds idle for EMB_BUILD_STALE_S are treated as abandoned and dropped; the check and
+    insert run under an advisory lock so concurrent replicas cannot both start (or drop) one.
+    """
+    _lock_generations(session)
+    cutoff = datetime.utcnow() - timedelta(seconds=EMB_BUILD_STALE_S)
+    building = session.exec(text("SELECT id, created_at FROM embedding_generations WHERE status = 'building'")).all()
+    if any(_as_utc(ts) >= cutoff for _, ts in building):
+        session.rollback()
+        return None
+    for g, _ in building:
+        _drop_generation(session, int(g), commit=False)
+    gen = session.exec(text("INSERT INTO embedding_generations (status, created_at) VALUES ('building', CURRENT_TIMESTAMP) RETURNING id")).first()[0]
+    session.commit()
+    return int(gen)
+
+
+def _as_utc(ts) -> datetime:
+    """Naive UTC datetime from a timestamptz (Postgres) or ISO string (SQLite)."""
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo is not None else ts
+
+
+def build_generation_indexes(session: Session, generation: int) -> dict:
+    """ANN indexes sized from the generation's row counts, with tuned search settings."""
+    from .ann_index import build_indexes
+    return build_indexes(session, generation)
+
+
+def _drop_generation(session: Session, generation: int, commit: bool = True) -> None:
+    g = int(generation)
+    session.exec(text(f"DROP INDEX IF EXISTS ix_embeddings_show_emb_v_g{g}"))
+    session.exec(text(f"DROP INDEX IF EXISTS ix_embeddings_profile_emb_v_g{g}"))
+    session.exec(text("DELETE FROM embeddings_show WHERE generation = :g"), params={"g": g})
+    session.exec(text("DELETE FROM embeddings_profile WHERE generation = :g"), params={"g": g})
+    session.exec(text("DELETE FROM item_neighbors WHERE generation = :g"), params={"g": g})
+    session.exec(text("UPDATE embedding_generations SET status = 'dropped' WHERE id = :g"), params={"g": g})
+    if commit:
+        session.commit()
+
+
+def activate_generation(session: Session, generation: int) -> int:
+    """Atomically make `generation` the active one. Returns the generation it replaced.
+
+    Raises RuntimeError, changing nothing, if `generation` is no longer 'building' (dropped as
+    abandoned, or already activated by another run).
+    """
+    from apps.api.app.embeddings_util import rebuild_profile_embedding  # type: ignore
+    g = int(generation)
+    row = session.exec(text("SELECT status, created_at FROM embedding_generations WHERE id = :g"), params={"g": g}).first()
+    if row is None or row[0] != "building":
+        raise RuntimeError(f"embedding generation {g} is not building")
+    # Ratings written while G was building were applied to the active rows only when G had
+    # no row yet; recompute those profiles into G before readers switch over.
+    late = session.exec(text("SELECT DISTINCT profile_id FROM ratings WHERE created_at >= :ts OR updated_at >= :ts"), params={"ts": row[1]}).all()
+    for (pid,) in late:
+        rebuild_profile_embedding(session, int(pid), generation=g)
+    _lock_generations(session)
+    prev = active_generation(session)
+    session.exec(text("UPDATE embedding_generations SET status = 'retired' WHERE status = 'active'"))
+    claimed = session.exec(
+        text("UPDATE embedding_generations SET status = 'active', activated_at = CURRENT_TIMESTAMP WHERE id = :g AND status = 'building'"),
+        params={"g": g},
+    )
+    if claimed.rowcount == 0:
+        session.rollback()
+        raise RuntimeError(f"embedding generation {g} is not building")
+    session.commit()
+    # Keep only the generation just replaced; older ones are dropped.
+    old = session.exec(text("SELECT id FROM embedding_generations WHERE status = 'retired' AND id <> :prev"), params={"prev": prev}).all()
+    for (og,) in old:
+        _drop_generation(session, int(og))
+    publish_vector_state(session, g)
+    publish_local_index(session, g)
+    publish_item_neighbors(session, g)
+    return prev
+
+
+def publish_vector_state(session: Session, generation: int) -> None:
+    """Record vector capability for the API's cached state (see apps/api/app/vector_state.py)."""
+    from apps.api.app.vector_state import probe, record  # type: ignore
+    record(session, probe(session, generation, source="job"))
+
+
+def publish_local_index(session: Session, generation: int) -> dict | None:
+    """Publish the memory-mapped catalog artifact (embeddings, IVF index, packed features)."""
+    from apps.api.app import catalog_artifact  # type: ignore
+    if catalog_artifact.np is None:
+        return None
+    return catalog_artifact.publish(session, generation)
+
+
+def publish_item_neighbors(session: Session, generation: int) -> int:
+    """Materialise the artifact's item-to-item neighbours into `item_neighbors`."""
+    from apps.api.app import catalog_artifact, neighbors  # type: ignore
+    art = catalog_artifact.current_artifact(session)
+    if art is None or art.generation != int(generation):
+        return 0
+    return neighbors.materialize(session, art)
+
 
+def rebuild_generation(session: Session, force: bool = False, plan: dict | None = None) -> dict:
+    """Inline rebuild per plan_rebuild(): nothing, an in-place update, or a blue-green
+    generation (new generation, shows, profiles, indexes, cutover)."""
+    plan = plan or plan_rebuild(session, force=force)
+    if plan["mode"] == "noop":
+        return {"mode": "noop", "generation": active_generation(session), "shows": 0, "profiles": 0}
+    if plan["mode"] == "in_place":
+        return {"mode": "in_place", **update_in_place(session)}
+    gen = begin_generation(session)
+    if gen is None:
+        return {"mode": "skipped", "generation": active_generation(session), "shows": 0, "profiles": 0}
+    cs = build_show_embeddings(session, generation=gen, force=force)
+    cp = build_profile_embeddings(session, generation=gen)
+    build_generation_indexes(session, gen)
+    prev = activate_generation(session, gen)
+    return {"mode": "generation", "generation": gen, "previous": prev, "shows": cs, "profiles": cp}
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import os
+import uuid
+import zlib
+import logging
+from datetime import datetime
+from typing import Callable, Iterable, Sequence
+
+try:
+    from redis import Redis
+except ImportError:  # pragma: no cover - optional dependency
+    Redis = None  # type: ignore
+
+from rq import Queue, Retry, get_current_job
+from rq.job import Dependency, Job
+
+
+DEFAULT_SHARDS = int(os.getenv("FANOUT_SHARDS", "4"))
+SHARD_RETRIES = int(os.getenv("FANOUT_SHARD_RETRIES", "3"))
+# Shards are bulk work: they go to the low-priority queue behind user-facing jobs.
+QUEUE_NAME = "recs-low"
+
+
+def shard_for(key: str, shards: int) -> int:
+    """Stable shard index for a key (crc32; unlike hash() it is identical across processes)."""
+    if shards <= 1:
+        return 0
+    return zlib.crc32(str(key).encode()) % shards
+
+
+def split_shards(keys: Iterable[str], shards: int) -> list[list[str]]:
+    """Partition keys into `shards` buckets by stable hash, preserving input order within a bucket."""
+    n = max(1, int(shards))
+    out: list[list[str]] = [[] for _ in range(n)]
+    for k in keys:
+        out[shard_for(k, n)].append(k)
+    return out
+
+
+def key_range(shard: int, shards: int) -> tuple[uuid.UUID | None, uuid.UUID | None]:
+    """Contiguous [lo, hi) slice of the UUID space for a shard, so children can filter
+    `id >= lo AND id < hi` in SQL (and use the primary key) instead of loading every
+    row to hash it. Bounds are None at the open ends; (None, None) when unsharded."""
+    if shards <= 1:
+        return None, None
+    step = (1 << 128) // shards
+    lo = uuid.UUID(int=shard * step) if shard > 0 else None
+    hi = uuid.UUID(int=(shard + 1) * step) if shard < shards - 1 else None
+    return lo, hi
+
+
+def key_range_clauses(column, shard: int, shards: int) -> list:
+    """WHERE clauses restricting a UUID `column` to a shard's key_range()."""
+    lo, hi = key_range(shard, shards)
+    out = []
+    if lo is not None:
+        out.append(column >= lo)
+    if hi is not None:
+        out.append(column < hi)
+    return out
+
+
+def _connection():
+    """Reuse the running job's Redis connection, else connect from REDIS_URL."""
+    job = get_current_job()
+    if job is not None:
+        return job.connection
+    if Redis is None:
+        return None
+    try:
+        conn = Redis.from_url(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+        conn.ping()
+        return conn
+    except Exception:
+        return None
+
+
+def _retry() -> Retry | None:
+    if SHARD_RETRIES <= 0:
+        return None
+    return Retry(max=SHARD_RETRIES, interval=[10, 30, 60])
+
+
+def enqueue_fanout(
+    status_kind: str,
+    children: Sequence[tuple[Callable, dict]],
+    *,
+    depends_on: Sequence[Job] | None = None,
+    queue: Queue | None = None,
+) -> dict | None:
+    """Enqueue child jobs in parallel plus a collector that depends on all of them.
+
+    Each child is retried on its own; the collector runs even if some shards
+    ultimately fail and records the aggregate under `admin:status:<status_kind>`.
+    Returns None when no queue is reachable so callers can run inline instead.
+    """
+    if queue is None:
+        conn = _connection()
+        if conn is None:
+            return None
+        queue = Queue(QUEUE_NAME, connection=conn)
+    jobs: list[Job] = []
+    for fn, kwargs in children:
+        jobs.append(queue.enqueue(
+            fn,
+            kwargs=kwargs,
+            retry=_retry(),
+            depends_on=Dependency(jobs=list(depends_on), allow_failure=True) if depends_on else None,
+        ))
+    collector = queue.enqueue(
+        collect_fanout,
+        kwargs={"status_kind": status_kind, "child_ids": [j.id for j in jobs]},
+        depends_on=Dependency(jobs=jobs, allow_failure=True),
+    )
+    return {"queued": True, "shards": len(jobs), "child_ids": [j.id for j in jobs], "collector_id": collector.id, "jobs": jobs}
+
+
+def enqueue_after(fn: Callable, kwargs: dict, depends_on: Sequence[Job]) -> Job:
+    """Enqueue a follow-up that runs only if every job in `depends_on` succeeded."""
+    queue = Queue(QUEUE_NAME, connection=depends_on[0].connection)
+    return queue.enqueue(fn, kwargs=kwargs, depends_on=Dependency(jobs=list(depends_on)))
+
+
+def _sum_numeric(dicts: Iterable[dict]) -> dict:
+    out: dict[str, float] = {}
+    for d in dicts:
+        for k, v in (d or {}).items():
+            if isinstance(v, bool) or not isinstance(v, (int, float)):
+                continue
+            out[k] = out.get(k, 0) + v
+    return out
+
+
+def collect_fanout(status_kind: str, child_ids: list[str]) -> dict:
+    """Aggregate child job results into one `admin:status:<status_kind>` event."""
+    logger = logging.getLogger("jobs.fanout")
+    from apps.api.app.models import Event  # type: ignore
+    from sqlmodel import Session
+    from .jobs import _engine
+
+    conn = _connection()
+    results: list[dict] = []
+    failed: list[str] = []
+    if conn is not None:
+        for jid, job in zip(child_ids, Job.fetch_many(child_ids, connection=conn)):
+            res = job.return_value() if job is not None else None
+            if isinstance(res, dict):
+                results.append(res)
+            else:
+                failed.append(jid)
+    payload = _sum_numeric(results)
+    payload.update({
+        "shards": len(child_ids),
+        "failed_shards": len(failed),
+        "timestamp": datetime.utcnow().isoformat(),
+    })
+    with Session(_engine()) as s:
+        s.add(Event(profile_id=0, kind=f"admin:status:{status_kind}", payload=payload))
+        s.commit()
+    logger.info("fan-out %s complete: shards=%s failed=%s", status_kind, len(child_ids), len(failed))
+    return payload
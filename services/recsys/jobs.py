@@ -1,13 +1,14 @@
 from __future__ import annotations
 
+import json
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 from typing import Iterable
 
 from sqlmodel import create_engine, Session, select
 from sqlalchemy.dialects.postgresql import insert as pg_insert
-from sqlalchemy import text
+from sqlalchemy import column, func, literal_column, or_, table, text
 
 from .adapters.justwatch import JustWatchAdapter
 from .adapters.serializd import SerializdAdapter
@@ -44,9 +45,10 @@ def _engine():
     return create_engine(f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{db}")
 
 
-def refresh_justwatch_availability(dry_run: bool = False) -> int:
+def refresh_justwatch_availability(dry_run: bool = False, shard: int = 0, shards: int = 1) -> int:
     """Fetch AU availability for shows and upsert availability rows.
-    Returns number of shows updated.
+    With shards > 1 only shows in the shard's id range are refreshed and the status
+    event is left to the fan-out collector. Returns number of shows updated.
     """
     logger = logging.getLogger("jobs.justwatch")
     if os.getenv("USE_REAL_JUSTWATCH", "false").lower() != "true":
@@ -58,8 +60,9 @@ def refresh_justwatch_availability(dry_run: bool = False) -> int:
     n = 0
     updated_rows = 0
     logger.info("Starting JustWatch availability refresh…")
+    from .fanout import key_range_clauses
     with Session(eng) as s:
-        shows = s.exec(select(Show)).all()
+        shows = s.exec(select(Show).where(*key_range_clauses(Show.id, shard, shards))).all()
         for show in shows:
             offers = jw.availability(jw_id=show.jw_id, title=show.title, year=show.year_start)
             if not offers:
@@ -93,27 +96,88 @@ def refresh_justwatch_availability(dry_run: bool = False) -> int:
                 s.commit()
             n += 1
         # record status event
-        if not dry_run:
+        if not dry_run and shards <= 1:
             s.add(Event(profile_id=0, kind="admin:status:justwatch", payload={"count_shows": n, "count_rows": updated_rows, "timestamp": datetime.utcnow().isoformat()}))
             s.commit()
     logger.info("JustWatch refresh complete: shows=%s rows=%s", n, updated_rows)
     return n
 
 
-def sync_serializd_ratings(dry_run: bool = False) -> int:
+def job_refresh_justwatch_shard(shard: int, shards: int, dry_run: bool = False) -> dict:
+    return {"count_shows": refresh_justwatch_availability(dry_run=dry_run, shard=shard, shards=shards)}
+
+
+def job_refresh_justwatch_fanout(shards: int | None = None, dry_run: bool = False) -> dict:
+    """Nightly availability refresh as parallel RQ jobs over show id ranges; a collector
+    records `admin:status:justwatch`. Falls back to one inline refresh when no queue is reachable.
+    """
+    from .fanout import DEFAULT_SHARDS, enqueue_fanout
+    if os.getenv("USE_REAL_JUSTWATCH", "false").lower() != "true":
+        return {"count_shows": 0, "skipped": True}
+    n = int(shards or DEFAULT_SHARDS)
+    res = enqueue_fanout("justwatch", [(job_refresh_justwatch_shard, {"shard": i, "shards": n, "dry_run": dry_run}) for i in range(n)])
+    if res is None:
+        return {"count_shows": refresh_justwatch_availability(dry_run=dry_run)}
+    return {"queued": True, "shards": res["shards"], "collector_id": res["collector_id"]}
+
+
+# Serializd syncs are incremental: each run asks for records changed after the stored
+# watermark (minus SERIALIZD_WATERMARK_OVERLAP_S for clock skew) and upserts them, so
+# re-delivered records are no-ops. full=True ignores the watermark.
+SERIALIZD_WATERMARK_OVERLAP_S = int(os.getenv("SERIALIZD_WATERMARK_OVERLAP_S", "3600"))
+SERIALIZD_BATCH = int(os.getenv("SERIALIZD_BATCH", "1000"))
+
+
+def _watermark(s: Session, source: str, scope: str) -> datetime | None:
+    try:
+        row = s.exec(text("SELECT last_seen_ts FROM sync_watermarks WHERE source = :source AND scope = :scope"), params={"source": source, "scope": scope}).first()
+    except Exception:
+        # Table not migrated yet: behave as a full sync
+        s.rollback()
+        return None
+    if not row or row[0] is None:
+        return None
+    return row[0] - timedelta(seconds=SERIALIZD_WATERMARK_OVERLAP_S)
+
+
+def _advance_watermark(s: Session, source: str, scope: str, ts: datetime | None) -> None:
+    """Move the watermark forward to `ts` (never back); committed with the caller's writes."""
+    if ts is None:
+        return
+    s.exec(text(
+        """
+        INSERT INTO sync_watermarks (source, scope, last_seen_ts, updated_at)
+        VALUES (:source, :scope, :ts, now())
+        ON CONFLICT (source, scope) DO UPDATE
+        SET last_seen_ts = GREATEST(sync_watermarks.last_seen_ts, EXCLUDED.last_seen_ts), updated_at = now()
+        """
+    ), params={"source": source, "scope": scope, "ts": ts})
+
+
+# Serializd ratings whose show is not in the catalog yet are parked as events (one per record
+# identity) and retried against the resolver on every later sync, so the watermark can move
+# past them.
+SERIALIZD_UNRESOLVED_KIND = "serializd:unresolved_rating"
+
+
+def _rating_identity(rec: dict) -> str:
+    return json.dumps([rec.get("tmdb_id"), rec.get("imdb_id"), (rec.get("title") or "").strip().casefold(), rec.get("year")])
+
+
+def sync_serializd_ratings(dry_run: bool = False, full: bool = False) -> int:
     """Pull ratings from Serializd and upsert to ratings table for the configured user.
-    Returns number of ratings upserted.
+    One Serializd-synced rating (source="serializd") is kept per (profile, show): changed
+    ratings update it in place and ratings entered in the app are never touched. Writes are
+    folded into the profile embedding. Returns number of ratings inserted or changed.
     """
     logger = logging.getLogger("jobs.serializd")
     if os.getenv("USE_REAL_SERIALIZD", "false").lower() != "true":
         logger.info("USE_REAL_SERIALIZD disabled; skipping")
         return 0
-    from apps.api.app.models import User, Profile, Rating, Show, Event  # type: ignore
+    from apps.api.app.models import User, Profile, Rating, Event  # type: ignore
+    from apps.api.app.show_resolver import ShowResolver  # type: ignore
     eng = _engine()
     sz = SerializdAdapter()
-    data = sz.ratings()
-    if not data:
-        return 0
     email = os.getenv("SERIALIZD_USER") or ""
     upserted = 0
     logger.info("Starting Serializd ratings sync…")
@@ -125,58 +189,203 @@ def sync_serializd_ratings(dry_run: bool = False) -> int:
         profile = s.exec(select(Profile).where(Profile.user_id == user.id, Profile.name == "Ross")).first() or s.exec(select(Profile).where(Profile.user_id == user.id)).first()
         if not profile:
             return 0
-        for item in data:
+        data = sz.ratings(since=None if full else _watermark(s, "serializd_ratings", email))
+        parked = {
+            e.payload.get("identity"): e
+            for e in s.exec(select(Event).where(Event.profile_id == profile.id, Event.kind == SERIALIZD_UNRESOLVED_KIND).order_by(Event.id)).all()
+        }
+        if not data and not parked:
+            return 0
+        resolver = ShowResolver.load(s)
+        # This profile's synced ratings, loaded once
+        existing = {
+            r.show_id: r
+            for r in s.exec(select(Rating).where(Rating.profile_id == profile.id, Rating.source == "serializd")).all()
+        }
+        changes: list[tuple] = []  # (show_id, old primary, new primary) for the embedding
+        newest = None
+        # Parked records first: a fresher copy of the same record in `data` wins
+        items = [(e.payload.get("item") or {}, False) for e in parked.values()] + [(item, True) for item in data or []]
+        for item, fresh in items:
             # map serializd record to internal schema
             rec = SerializdAdapter.to_internal_rating(item)
             title = (rec.get("title") or "").strip()
-            year = rec.get("year")
-            if not title:
-                continue
-            # try exact title then fallback ilike
-            show = s.exec(select(Show).where(Show.title == title)).first() or s.exec(select(Show).where(Show.title.ilike(title))).first()
-            if not show:
+            identity = _rating_identity(rec)
+            if fresh:
+                ts = SerializdAdapter.item_ts(item)
+                newest = ts if newest is None or (ts is not None and ts > newest) else newest
+            show_id = resolver.resolve(title=title, year=rec.get("year"), tmdb_id=rec.get("tmdb_id"), imdb_id=rec.get("imdb_id"))
+            if show_id is None:
+                if fresh and not dry_run:
+                    ev = parked.get(identity) or Event(profile_id=profile.id, kind=SERIALIZD_UNRESOLVED_KIND)
+                    ev.payload = {"identity": identity, "item": item}
+                    parked[identity] = ev
+                    s.add(ev)
                 continue
+            if not dry_run and identity in parked:
+                s.delete(parked.pop(identity))
             primary = int(rec.get("rating", 1) or 1)
             primary = 2 if primary >= 7 else (1 if primary >= 4 else 0)
+            r = existing.get(show_id)
+            if r is not None and r.primary == primary:
+                continue
             if not dry_run:
-                r = Rating(profile_id=profile.id, show_id=show.id, primary=primary)
+                changes.append((show_id, r.primary if r is not None else None, primary))
+                if r is None:
+                    r = existing[show_id] = Rating(profile_id=profile.id, show_id=show_id, primary=primary, source="serializd")
+                else:
+                    r.primary = primary
+                    r.updated_at = datetime.utcnow()
                 s.add(r)
             upserted += 1
+        logger.info("Serializd resolution: %s (parked unresolved: %s)", resolver.stats, len(parked))
         if not dry_run:
+            _advance_watermark(s, "serializd_ratings", email, newest)
             s.commit()
+            _apply_synced_ratings(s, profile.id, changes, email)
             s.add(Event(profile_id=profile.id, kind="admin:status:serializd", payload={"count_ratings": upserted, "timestamp": datetime.utcnow().isoformat()}))
             s.commit()
     logger.info("Serializd sync complete: ratings=%s", upserted)
     return upserted
 
 
+def _apply_synced_ratings(s: Session, profile_id: int, changes: list[tuple], email: str | None = None) -> None:
+    """Fold committed rating changes into the profile embedding (queued rebuild if the deltas
+    fail) and drop the user's cached recommendations."""
+    if not changes:
+        return
+    from apps.api.app.embeddings_util import apply_rating_deltas  # type: ignore
+    try:
+        apply_rating_deltas(s, profile_id, changes)
+    except Exception:
+        s.rollback()
+        _rebuild_profiles(s, [profile_id])
+    if email:
+        try:
+            from apps.api.app.cache import invalidate_for_email  # type: ignore
+            invalidate_for_email(email)
+        except Exception:
+            pass
+
+
+def _rebuild_profiles(s: Session, profile_ids: Iterable[int]) -> None:
+    """Queue a full embedding rebuild per profile; inline when Redis is unavailable."""
+    from apps.api.app.embeddings_util import rebuild_profile_embedding  # type: ignore
+    from apps.api.app.queue import enqueue_profile_rebuild  # type: ignore
+    for pid in sorted(set(profile_ids)):
+        if not enqueue_profile_rebuild(pid):
+            try:
+                rebuild_profile_embedding(s, pid)
+            except Exception:
+                s.rollback()
+
+
+# Fallback sweep for the admin trigger listener: NOTIFY wakes it immediately, the sweep only
+# catches rows written while no listener was connected.
+ADMIN_TRIGGER_SWEEP_S = float(os.getenv("ADMIN_TRIGGER_SWEEP_S", "300"))
+
+
+def _claim_admin_trigger(s: Session, skip: Iterable[int] = ()) -> tuple[list[int], str, dict] | None:
+    """Lock the oldest pending `admin:sync:*` event not in `skip`, plus identical ones queued
+    behind it, so each trigger runs once however many workers are draining. The rows stay
+    locked, not deleted, until _complete_admin_trigger commits; a rollback (failed run or
+    dead worker) leaves them pending for the next sweep."""
+    row = s.exec(text(
+        """
+        SELECT id, kind, payload FROM events
+        WHERE kind LIKE 'admin:sync:%' AND NOT (id = ANY(:skip))
+        ORDER BY id LIMIT 1 FOR UPDATE SKIP LOCKED
+        """
+    ), params={"skip": list(skip)}).first()
+    if not row:
+        s.rollback()
+        return None
+    first, kind, payload = row[0], row[1], row[2] or {}
+    dupes = s.exec(text(
+        "SELECT id, payload FROM events WHERE kind LIKE 'admin:sync:%' AND kind = :kind AND id <> :id AND NOT (id = ANY(:skip)) FOR UPDATE SKIP LOCKED"
+    ), params={"kind": kind, "id": first, "skip": list(skip)}).all()
+    return [first] + [i for i, p in dupes if (p or {}) == payload], kind, payload
+
+
+def _complete_admin_trigger(s: Session, ids: list[int]) -> None:
+    s.exec(text("DELETE FROM events WHERE id = ANY(:ids)"), params={"ids": ids})
+    s.commit()
+
+
 def process_admin_triggers() -> dict:
-    """Poll the events table for admin sync triggers and process them.
-    Deletes processed events. Returns a summary dict with counts.
+    """Claim and run pending admin sync triggers until none are left.
+    Safe to call from several workers at once. A trigger whose run fails stays queued and is
+    retried by a later drain, not this one. Returns a summary dict with counts.
     """
-    from apps.api.app.models import Event  # type: ignore
+    logger = logging.getLogger("jobs.admin_triggers")
     eng = _engine()
-    summary = {"justwatch": 0, "serializd": 0}
+    summary = {"justwatch": 0, "serializd": 0, "failed": 0}
+    failed: list[int] = []
     with Session(eng) as s:
-        events = s.exec(select(Event).where(Event.kind.like("admin:sync:%"))).all()
-        for ev in events:
-            kind = ev.kind or ""
+        while (claimed := _claim_admin_trigger(s, failed)) is not None:
+            ids, kind, payload = claimed
+            dry_run = bool(payload.get("dry_run"))
             try:
                 if kind == "admin:sync:justwatch":
-                    summary["justwatch"] += refresh_justwatch_availability()
+                    summary["justwatch"] += refresh_justwatch_availability(dry_run=dry_run)
                 elif kind == "admin:sync:serializd":
-                    summary["serializd"] += sync_serializd_ratings()
-            finally:
-                # delete event regardless to avoid reprocessing
-                s.delete(ev)
-                s.commit()
+                    summary["serializd"] += sync_serializd_ratings(dry_run=dry_run)
+                _complete_admin_trigger(s, ids)
+            except Exception:
+                logger.exception("admin trigger %s failed; left queued", kind)
+                s.rollback()
+                failed.extend(ids)
+                summary["failed"] += 1
     return summary
 
 
+def listen_admin_triggers(stop=None) -> None:
+    """Block on LISTEN for /admin/sync notifications and drain triggers as they arrive.
+    Reconnects on errors; `stop` (a threading.Event) ends the loop."""
+    import select as _select
+    import time
+    from apps.api.app.queue import ADMIN_TRIGGER_CHANNEL  # type: ignore
+    logger = logging.getLogger("jobs.admin_triggers")
+    eng = _engine()
+    while stop is None or not stop.is_set():
+        try:
+            raw = eng.raw_connection()
+            try:
+                conn = raw.driver_connection
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {ADMIN_TRIGGER_CHANNEL}")
+                # Rows written before LISTEN took effect
+                process_admin_triggers()
+                while stop is None or not stop.is_set():
+                    ready, _, _ = _select.select([conn], [], [], ADMIN_TRIGGER_SWEEP_S)
+                    if ready:
+                        conn.poll()
+                        conn.notifies.clear()
+                    process_admin_triggers()
+            finally:
+                # Never hand a LISTENing autocommit connection back to the pool
+                raw.invalidate()
+        except Exception:
+            logger.exception("admin trigger listener failed; reconnecting")
+            time.sleep(5)
+
+
+def _default_title_refs(s: Session) -> list[str]:
+    """All show titles, used as title refs when a refresh is not given an explicit list."""
+    try:
+        from apps.api.app.models import Show  # type: ignore
+        shows = s.exec(select(Show.title)).all()
+        refs = [t for (t,) in shows] if shows and isinstance(shows[0], tuple) else [getattr(x, 'title', x) for x in shows]
+        return [r for r in refs if r]
+    except Exception:
+        return []
+
+
 @_counted("refresh_offers")
-def job_refresh_offers(region: str = "AU", title_refs: list[str] | None = None, dry_run: bool = False) -> dict:
+def job_refresh_offers(region: str = "AU", title_refs: list[str] | None = None, dry_run: bool = False, cap: int | None = 200) -> dict:
     """Fetch and upsert normalized offers into justwatch_offers.
     title_refs: list of title references (jw_id or internal ref).
+    cap: max refs handled by this job; shard children pass None to process their whole shard.
     """
     logger = logging.getLogger("jobs.offers")
     eng = _engine()
@@ -187,14 +396,9 @@ def job_refresh_offers(region: str = "AU", title_refs: list[str] | None = None,
         refs = title_refs or []
         if not refs:
             # Default to using existing show titles
-            try:
-                from apps.api.app.models import Show  # type: ignore
-                shows = s.exec(select(Show.title)).all()
-                refs = [t for (t,) in shows] if shows and isinstance(shows[0], tuple) else [getattr(x, 'title', None) for x in shows]
-                refs = [r for r in refs if r]
-            except Exception:
-                refs = []
-        for ref in refs[:200]:  # cap batch
+            refs = _default_title_refs(s)
+        refs = refs[:cap] if cap else refs
+        for ref in refs:
             offs = jw.fetch_offers(str(ref), region)
             total += len(offs)
             if not offs or dry_run:
@@ -224,12 +428,31 @@ def job_refresh_offers(region: str = "AU", title_refs: list[str] | None = None,
                 updated += 1
             s.commit()
     logger.info("offers refresh: total_offers=%s updated_rows=%s", total, updated)
-    return {"count": total, "updated": updated, "dry_run": dry_run}
+    return {"count": total, "updated": updated, "dry_run": dry_run, "count_shows": len(refs), "count_rows": updated}
+
+
+def job_refresh_offers_fanout(region: str = "AU", title_refs: list[str] | None = None, shards: int | None = None, dry_run: bool = False) -> dict:
+    """Split an offers refresh into title-ref hash shards and enqueue them as parallel RQ jobs.
+    A collector job aggregates shard counts into `admin:status:justwatch`.
+    Falls back to a single inline refresh when no queue is reachable.
+    """
+    from .fanout import DEFAULT_SHARDS, enqueue_fanout, split_shards
+    refs = list(title_refs or [])
+    if not refs:
+        with Session(_engine()) as s:
+            refs = _default_title_refs(s)
+    buckets = [b for b in split_shards(refs, shards or DEFAULT_SHARDS) if b]
+    children = [(job_refresh_offers, {"region": region, "title_refs": b, "dry_run": dry_run, "cap": None}) for b in buckets]
+    res = enqueue_fanout("justwatch", children) if children else None
+    if res is None:
+        return job_refresh_offers(region=region, title_refs=refs, dry_run=dry_run, cap=None)
+    return {"queued": True, "count": len(refs), "shards": res["shards"], "collector_id": res["collector_id"]}
 
 
 @_counted("sync_serializd")
-def job_sync_serializd(user: str | None = None, token: str | None = None, dry_run: bool = False) -> dict:
-    """Fetch ratings/history from Serializd and insert into serializd_history."""
+def job_sync_serializd(user: str | None = None, token: str | None = None, dry_run: bool = False, full: bool = False) -> dict:
+    """Fetch ratings/history from Serializd changed since the last sync and upsert them into
+    serializd_history on (profile_ref, event_key), one row per distinct watch event."""
     logger = logging.getLogger("jobs.serializd_history")
     eng = _engine()
     sz = SerializdAdapter()
@@ -237,33 +460,146 @@ def job_sync_serializd(user: str | None = None, token: str | None = None, dry_ru
         sz.user = user
     if token:
         sz.token = token
-    items = sz.fetch_watch_history()
-    total = len(items)
-    inserted = 0
-    if not items or dry_run:
-        return {"count": total, "inserted": 0, "dry_run": dry_run}
+    scope = sz.user or ""
+    from apps.api.app.show_resolver import ShowResolver  # type: ignore
     with Session(eng) as s:
+        items = sz.fetch_watch_history(since=None if full else _watermark(s, "serializd_history", scope))
+        total = len(items)
+        if not items or dry_run:
+            return {"count": total, "inserted": 0, "dry_run": dry_run}
+        # One shows query, then every row resolves in memory
+        resolver = ShowResolver.load(s)
+        rows = []
+        newest = None
         for it in items:
-            s.exec(text(
-                """
-                INSERT INTO serializd_history (profile_ref, title_ref, tmdb_id, season, episode, status, rating, last_seen_ts, raw)
-                VALUES (:profile_ref, :title_ref, :tmdb_id, :season, :episode, :status, :rating, :last_seen_ts, :raw)
-                """
-            ), {
+            rec = SerializdAdapter.to_internal_rating(it.raw or {})
+            ts = SerializdAdapter.item_ts(it.raw or {})
+            newest = ts if newest is None or (ts is not None and ts > newest) else newest
+            rows.append({
                 "profile_ref": it.profile_ref,
                 "title_ref": it.title_ref,
                 "tmdb_id": it.tmdb_id,
+                "show_id": resolver.resolve(title=it.title_ref, year=rec.get("year"), tmdb_id=it.tmdb_id, imdb_id=rec.get("imdb_id")),
                 "season": it.season,
                 "episode": it.episode,
                 "status": it.status,
                 "rating": it.rating,
                 "last_seen_ts": it.last_seen_ts,
-                "raw": it.raw,
+                "raw": json.dumps(it.raw) if it.raw is not None else None,
             })
-            inserted += 1
+        # Re-delivered events only rewrite their row when something changed; RETURNING reports
+        # the rows actually written (xmax = 0: inserted, else updated), not the skipped ones
+        inserted = updated = 0
+        rows = _dedupe_events(rows)
+        for i in range(0, len(rows), SERIALIZD_BATCH):
+            for (is_new,) in s.exec(_history_upsert(rows[i:i + SERIALIZD_BATCH])).all():
+                if is_new:
+                    inserted += 1
+                else:
+                    updated += 1
+        logger.info("serializd resolution: %s", resolver.stats)
+        _advance_watermark(s, "serializd_history", scope, newest)
         s.commit()
-    logger.info("serializd sync: total=%s inserted=%s", total, inserted)
-    return {"count": total, "inserted": inserted, "dry_run": dry_run}
+        # Marker read by apps/api/app/history_adj.py to drop cached recent-history adjacency
+        from apps.api.app.models import Event  # type: ignore
+        s.add(Event(profile_id=0, kind="admin:status:serializd_history", payload={"inserted": inserted, "updated": updated, "timestamp": datetime.utcnow().isoformat()}))
+        s.commit()
+    try:
+        from apps.api.app.history_adj import invalidate  # type: ignore
+        invalidate()
+    except Exception:
+        pass
+    logger.info("serializd sync: total=%s inserted=%s updated=%s", total, inserted, updated)
+    return {"count": total, "inserted": inserted, "updated": updated, "dry_run": dry_run}
+
+
+_HISTORY = table(
+    "serializd_history",
+    *(column(c) for c in ("profile_ref", "title_ref", "tmdb_id", "show_id", "season", "episode", "status", "rating", "last_seen_ts", "raw", "event_key")),
+)
+
+
+def _event_key(row: dict) -> str | None:
+    """Python twin of serializd_history.event_key (migration 0015)."""
+    if (row.get("tmdb_id") is None and row.get("title_ref") is None) or row.get("status") is None:
+        return None
+    ident = f"tmdb:{row['tmdb_id']}" if row.get("tmdb_id") is not None else f"title:{row['title_ref'].strip(' ').lower()}"
+    part = lambda v: "" if v is None else str(v)  # noqa: E731
+    return f"{ident}|{part(row.get('season'))}|{part(row.get('episode'))}|{row.get('status')}"
+
+
+def _dedupe_events(rows: list[dict]) -> list[dict]:
+    """One row per (profile_ref, event_key), the latest seen: a multi-row upsert may not
+    touch the same row twice."""
+    out: dict = {}
+    for i, r in enumerate(rows):
+        ek = _event_key(r)
+        key = (r["profile_ref"], ek) if ek is not None else i
+        prev = out.get(key)
+        if prev is None or (r["last_seen_ts"] is not None and (prev["last_seen_ts"] is None or r["last_seen_ts"] >= prev["last_seen_ts"])):
+            out[key] = r
+    return list(out.values())
+
+
+def _history_upsert(rows: list[dict]):
+    """Multi-row upsert of serializd_history on (profile_ref, event_key), returning one
+    `inserted` flag per row written."""
+    stmt = pg_insert(_HISTORY).values(rows)
+    new, cur = stmt.excluded, _HISTORY.c
+    show_id = func.coalesce(new.show_id, cur.show_id)
+    return stmt.on_conflict_do_update(
+        index_elements=["profile_ref", "event_key"],
+        set_={
+            "title_ref": new.title_ref,
+            "show_id": show_id,
+            "rating": new.rating,
+            "last_seen_ts": func.greatest(cur.last_seen_ts, new.last_seen_ts),
+            "raw": new.raw,
+        },
+        where=or_(
+            cur.rating.is_distinct_from(new.rating),
+            cur.show_id.is_distinct_from(show_id),
+            cur.last_seen_ts < new.last_seen_ts,
+        ),
+    ).returning(literal_column("xmax = 0"))
+
+
+@_counted("compact_serializd")
+def job_compact_serializd(dry_run: bool = False) -> dict:
+    """Collapse duplicate Serializd rows left by earlier full re-syncs or title variants.
+    History: rows resolved to the same show with the same season/episode/status keep the
+    latest. Ratings: repeated Serializd-synced ratings (same profile and show, no note or
+    tags, whatever the score) keep the latest and affected profiles get an embedding
+    rebuild; ratings entered in the app (source NULL) are never touched."""
+    logger = logging.getLogger("jobs.serializd_compact")
+    history_sql = """
+        FROM serializd_history a USING serializd_history b
+        WHERE a.profile_ref = b.profile_ref AND a.show_id = b.show_id
+          AND a.season IS NOT DISTINCT FROM b.season AND a.episode IS NOT DISTINCT FROM b.episode
+          AND a.status = b.status
+          AND (a.last_seen_ts, a.id) < (b.last_seen_ts, b.id)
+    """
+    ratings_sql = """
+        FROM ratings a USING ratings b
+        WHERE a.profile_id = b.profile_id AND a.show_id = b.show_id
+          AND a.source = 'serializd' AND b.source = 'serializd'
+          AND a.note IS NULL AND b.note IS NULL AND a.nuance_tags IS NULL AND b.nuance_tags IS NULL
+          AND (a.updated_at, a.id) < (b.updated_at, b.id)
+    """
+    eng = _engine()
+    with Session(eng) as s:
+        if dry_run:
+            history = s.exec(text(f"SELECT COUNT(DISTINCT a.id) {history_sql}")).first()[0]
+            ratings = s.exec(text(f"SELECT COUNT(DISTINCT a.id) {ratings_sql}")).first()[0]
+        else:
+            history = s.exec(text(f"DELETE {history_sql}")).rowcount
+            profiles = [pid for (pid,) in s.exec(text(f"DELETE {ratings_sql} RETURNING a.profile_id")).all()]
+            ratings = len(profiles)
+            s.commit()
+            # Removed ratings were part of the stored sums: rebuild those profiles
+            _rebuild_profiles(s, profiles)
+    logger.info("serializd compaction: history=%s ratings=%s dry_run=%s", history, ratings, dry_run)
+    return {"history": int(history or 0), "ratings": int(ratings or 0), "dry_run": dry_run}
 
 
 def job_daily_refresh_top_titles(region: str = "AU", limit: int | None = None, dry_run: bool = True) -> dict:
@@ -296,4 +632,4 @@ def job_daily_refresh_top_titles(region: str = "AU", limit: int | None = None, d
                 continue
     if dry_run:
         return {"region": region, "count": len(title_refs), "title_refs_sample": title_refs[:10]}
-    return job_refresh_offers(region=region, title_refs=title_refs, dry_run=False)
+    return job_refresh_offers_fanout(region=region, title_refs=title_refs, dry_run=False)
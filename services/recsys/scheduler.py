@@ -22,7 +22,7 @@ def next_run(now: datetime) -> datetime:
 
 def main():
     r = Redis.from_url(REDIS_URL)
-    q = Queue("recs", connection=r)
+    q = Queue("recs-low", connection=r)  # bulk work: low-priority queue
     while True:
         now = datetime.now()
         nr = next_run(now)
@@ -1,9 +1,18 @@
 from __future__ import annotations
 
+from rq import get_current_job
 from sqlmodel import create_engine, Session
 
-from .jobs import refresh_justwatch_availability, sync_serializd_ratings, job_daily_refresh_top_titles
-from .embeddings import build_show_embeddings, build_profile_embeddings
+from .jobs import refresh_justwatch_availability, sync_serializd_ratings, job_compact_serializd, job_daily_refresh_top_titles, job_refresh_offers_fanout
+from .embeddings import (
+    activate_generation,
+    begin_generation,
+    build_generation_indexes,
+    build_profile_embeddings,
+    build_show_embeddings,
+    plan_rebuild,
+    rebuild_generation,
+)
 
 
 def _engine_url() -> str:
@@ -18,6 +27,14 @@ def _engine_url() -> str:
 
 def rebuild_profile_embedding(profile_id: int) -> dict:
     from apps.api.app.embeddings_util import rebuild_profile_embedding as _rebuild  # type: ignore
+    from apps.api.app.queue import rebuild_pending_key  # type: ignore
+    # Clear the debounce marker first so writes landing mid-rebuild schedule a follow-up.
+    job = get_current_job()
+    if job is not None:
+        try:
+            job.connection.delete(rebuild_pending_key(profile_id))
+        except Exception:
+            pass
     eng = create_engine(_engine_url())
     with Session(eng) as s:
         _rebuild(s, profile_id)
@@ -27,20 +44,126 @@ def rebuild_profile_embedding(profile_id: int) -> dict:
 def rebuild_all_embeddings() -> dict:
     eng = create_engine(_engine_url())
     with Session(eng) as s:
-        cs = build_show_embeddings(s)
-        cp = build_profile_embeddings(s)
-    return {"ok": True, "shows": cs, "profiles": cp}
+        res = rebuild_generation(s)
+    return {"ok": True, **res}
+
+
+def rebuild_show_embeddings_shard(*, shard: int, shards: int, generation: int | None = None) -> dict:
+    eng = create_engine(_engine_url())
+    with Session(eng) as s:
+        cs = build_show_embeddings(s, shard=shard, shards=shards, generation=generation)
+    return {"ok": True, "shows": cs}
+
+
+def rebuild_profile_embeddings_shard(*, shard: int, shards: int, generation: int | None = None) -> dict:
+    eng = create_engine(_engine_url())
+    with Session(eng) as s:
+        cp = build_profile_embeddings(s, shard=shard, shards=shards, generation=generation)
+    return {"ok": True, "profiles": cp}
+
+
+def activate_embeddings_generation(*, generation: int) -> dict:
+    eng = create_engine(_engine_url())
+    with Session(eng) as s:
+        build_generation_indexes(s, generation)
+        prev = activate_generation(s, generation)
+    return {"ok": True, "generation": generation, "previous": prev}
+
+
+def maintain_ann_indexes(*, force: bool = False) -> dict:
+    from .ann_index import maintain_indexes
+    eng = create_engine(_engine_url())
+    with Session(eng) as s:
+        res = maintain_indexes(s, force=force)
+    return {"ok": True, **res}
+
+
+def materialize_item_neighbors() -> dict:
+    from apps.api.app.embeddings_util import active_generation  # type: ignore
+    from .embeddings import publish_item_neighbors
+    eng = create_engine(_engine_url())
+    with Session(eng) as s:
+        gen = active_generation(s)
+        n = publish_item_neighbors(s, gen)
+    return {"ok": True, "generation": gen, "rows": n}
+
+
+def build_cf_model() -> dict:
+    from .cf import build_cf_model as _build
+    eng = create_engine(_engine_url())
+    with Session(eng) as s:
+        res = _build(s)
+    return {"ok": True, **res}
+
+
+def rebuild_all_embeddings_fanout(*, shards: int | None = None) -> dict:
+    """Shard the embedding rebuild across workers into a new generation: show shards,
+    then profile shards, then index build + cutover once every profile shard succeeded.
+    Runs inline when plan_rebuild() says nothing or only a few shows changed."""
+    from .fanout import DEFAULT_SHARDS, enqueue_after, enqueue_fanout
+    n = int(shards or DEFAULT_SHARDS)
+    eng = create_engine(_engine_url())
+    with Session(eng) as s:
+        plan = plan_rebuild(s)
+        if plan["mode"] != "generation":
+            return {"ok": True, **rebuild_generation(s, plan=plan)}
+        gen = begin_generation(s)
+    if gen is None:
+        return {"ok": True, "mode": "skipped"}
+    show_stage = enqueue_fanout("embeddings_show", [(rebuild_show_embeddings_shard, {"shard": i, "shards": n, "generation": gen}) for i in range(n)])
+    if show_stage is None:
+        with Session(eng) as s:
+            cs = build_show_embeddings(s, generation=gen)
+            cp = build_profile_embeddings(s, generation=gen)
+            build_generation_indexes(s, gen)
+            prev = activate_generation(s, gen)
+        return {"ok": True, "generation": gen, "previous": prev, "shows": cs, "profiles": cp}
+    prof_stage = enqueue_fanout(
+        "embeddings_profile",
+        [(rebuild_profile_embeddings_shard, {"shard": i, "shards": n, "generation": gen}) for i in range(n)],
+        depends_on=show_stage["jobs"],
+    )
+    cutover = enqueue_after(activate_embeddings_generation, {"generation": gen}, prof_stage["jobs"])
+    return {
+        "ok": True,
+        "queued": True,
+        "generation": gen,
+        "shards": n,
+        "collector_ids": [show_stage["collector_id"], prof_stage["collector_id"]],
+        "cutover_id": cutover.id,
+    }
+
+
+def refresh_offers_fanout(*, region: str = "AU", title_refs: list[str] | None = None, shards: int | None = None, dry_run: bool = False) -> dict:
+    return job_refresh_offers_fanout(region=region, title_refs=title_refs, shards=shards, dry_run=dry_run)
+
+
+def _clear_admin_sync_marker(source: str, dry_run: bool) -> None:
+    # Cleared on start so a trigger landing mid-run queues a follow-up (see app.queue)
+    from apps.api.app.queue import admin_sync_pending_key  # type: ignore
+    job = get_current_job()
+    if job is not None:
+        try:
+            job.connection.delete(admin_sync_pending_key(source, dry_run))
+        except Exception:
+            pass
 
 
 def sync_justwatch(*, dry_run: bool = False) -> dict:
+    _clear_admin_sync_marker("justwatch", dry_run)
     n = refresh_justwatch_availability(dry_run=dry_run)
     return {"ok": True, "shows_updated": n}
 
 
-def sync_serializd(*, dry_run: bool = False) -> dict:
-    n = sync_serializd_ratings(dry_run=dry_run)
+def sync_serializd(*, dry_run: bool = False, full: bool = False) -> dict:
+    _clear_admin_sync_marker("serializd", dry_run)
+    n = sync_serializd_ratings(dry_run=dry_run, full=full)
     return {"ok": True, "ratings_upserted": n}
 
 
+def compact_serializd(*, dry_run: bool = False) -> dict:
+    return {"ok": True, **job_compact_serializd(dry_run=dry_run)}
+
+
 def daily_refresh_top_titles(*, region: str = "AU", limit: int | None = None, dry_run: bool = False) -> dict:
     return job_daily_refresh_top_titles(region=region, limit=limit, dry_run=dry_run)
@@ -3,13 +3,15 @@ from __future__ import annotations
 import os
 import time
 import logging
+import threading
 from apscheduler.schedulers.background import BackgroundScheduler
 from sqlmodel import create_engine
 from redis import Redis
 from rq import Worker, Queue, Connection
 
-from .jobs import refresh_justwatch_availability, sync_serializd_ratings, process_admin_triggers
-from .embeddings import build_show_embeddings, build_profile_embeddings
+from .jobs import refresh_justwatch_availability, sync_serializd_ratings, listen_admin_triggers, job_compact_serializd, job_refresh_justwatch_fanout
+from .tasks import rebuild_all_embeddings_fanout
+from .embeddings import rebuild_generation
 from sqlmodel import Session
 
 
@@ -24,21 +26,32 @@ def main():
     create_engine(url)  # ensure DB reachable
 
     scheduler = BackgroundScheduler()
-    # nightly at 03:15 local time
-    scheduler.add_job(refresh_justwatch_availability, 'cron', hour=3, minute=15, id='jw_refresh')
+    # nightly at 03:15 local time; sharded across workers (inline when Redis is down)
+    scheduler.add_job(job_refresh_justwatch_fanout, 'cron', hour=3, minute=15, id='jw_refresh')
     scheduler.add_job(sync_serializd_ratings, 'cron', hour=3, minute=30, id='sz_sync')
+    # weekly: collapse duplicate Serializd history/rating rows
+    scheduler.add_job(job_compact_serializd, 'cron', day_of_week='sun', hour=4, minute=15, id='sz_compact')
     scheduler.start()
-    # poll admin triggers every minute
-    scheduler.add_job(process_admin_triggers, 'interval', minutes=1, id='admin_triggers')
-    # nightly embedding rebuild at 03:45
+    # admin triggers without Redis: LISTEN/NOTIFY on the events table (see app.queue)
+    threading.Thread(target=listen_admin_triggers, name='admin_triggers', daemon=True).start()
+    # nightly embedding rebuild at 03:45: show shards -> profile shards -> cutover
     def _rebuild_embeddings():
-        from sqlmodel import Session as _S
-        eng = create_engine(url)
-        with _S(eng) as s:
-            cs = build_show_embeddings(s)
-            cp = build_profile_embeddings(s)
-            print(f"Embeddings rebuilt: shows={cs} profiles={cp}")
+        print(f"Embeddings rebuild: {rebuild_all_embeddings_fanout()}")
     scheduler.add_job(_rebuild_embeddings, 'cron', hour=3, minute=45, id='embeddings_rebuild')
+    # ANN index upkeep: resize on catalog growth and re-tune probes against the latency target
+    def _maintain_ann():
+        from sqlmodel import Session as _S
+        from .ann_index import maintain_indexes
+        with _S(create_engine(url)) as s:
+            print(f"ANN index maintenance: {maintain_indexes(s)}")
+    scheduler.add_job(_maintain_ann, 'cron', hour=4, minute=30, id='ann_index_maintain')
+    # Item-item collaborative filtering model from ratings + Serializd history
+    def _build_cf():
+        from sqlmodel import Session as _S
+        from .cf import build_cf_model
+        with _S(create_engine(url)) as s:
+            print(f"CF model: {build_cf_model(s)}")
+    scheduler.add_job(_build_cf, 'cron', hour=4, minute=0, id='cf_model_build')
 
     # dev: run once at startup if flags enabled
     try:
@@ -46,8 +59,8 @@ def main():
         sz = sync_serializd_ratings()
         # initial embeddings
         with Session(create_engine(url)) as s:
-            cs = build_show_embeddings(s)
-            cp = build_profile_embeddings(s)
+            res = rebuild_generation(s)
+            cs, cp = res["shows"], res["profiles"]
         print(f"Initial ingest complete: JW={jw}, Serializd={sz}, Emb(shows)={cs}, Emb(profiles)={cp}")
     except Exception as e:
         print(f"Initial ingest error: {e}")
@@ -58,7 +71,9 @@ def main():
         redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
         conn = Redis.from_url(redis_url)
         with Connection(conn):
-            w = Worker([Queue('recs')])
+            # Queue names in priority order; e.g. WORKER_QUEUES=recs-low for a bulk-only replica.
+            names = [n.strip() for n in os.getenv("WORKER_QUEUES", "recs,recs-low").split(",") if n.strip()]
+            w = Worker([Queue(n) for n in names])
             # Run worker loop in foreground; scheduler runs in background
             w.work(with_scheduler=True)
     except KeyboardInterrupt: